@@ -0,0 +1,207 @@
+import os
+import sys
+import time
+import bisect
+import argparse
+from collections import deque
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import metrics
+
+
+class AdaptiveSampler:
+    def __init__(self, min_interval=0.25, max_interval=3.0, backoff=1.5, burst_switches=3,
+                 burst_seconds=30.0, clock=time.monotonic):
+        """
+        Chooses the next foreground-app sampling interval from what the samples saw.
+
+        A switch drops the interval to min_interval; every unchanged sample
+        multiplies it by backoff, up to max_interval, so a long focused session
+        costs a sample every few seconds instead of one a second. While switching is
+        bursty (burst_switches or more within burst_seconds) the interval stays
+        at min_interval so short visits are not missed.
+
+        A switch is detected somewhere between the previous sample and the one
+        that saw it, so the gap between them bounds the detection latency; half
+        the gap is its expected value. Both are reported.
+
+        Args:
+            min_interval: Seconds between samples right after a switch or during a burst
+            max_interval: Longest gap between samples while the app is stable
+            backoff: Factor the interval grows by per unchanged sample
+            burst_switches: Switches within burst_seconds that count as a burst
+            clock: Monotonic clock, injectable for simulated time
+        """
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.backoff = max(1.0, backoff)
+        self.burst_switches = burst_switches
+        self.burst_seconds = burst_seconds
+        self.clock = clock
+        self.interval = min_interval
+        self.recent_switches = deque()
+        self.started = None
+        self.last_sample = None
+        self.samples = 0
+        self.switches = 0
+        self.burst_samples = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        metrics.REGISTRY.gauge("task_switch_sample_interval_seconds", "Current foreground-app sampling interval",
+                               callback=lambda: self.interval)
+        self.samples_counter = metrics.REGISTRY.counter("task_switch_samples_total", "Foreground-app samples taken")
+
+    def observe(self, switched, now=None):
+        """Record one sample (and whether it saw a switch); returns the interval until the next one"""
+        now = self.clock() if now is None else now
+        if self.started is None:
+            self.started = now
+        gap = now - self.last_sample if self.last_sample is not None else 0.0
+        self.last_sample = now
+        self.samples += 1
+        self.samples_counter.inc()
+
+        if switched:
+            self.switches += 1
+            self.latency_total += gap / 2
+            self.latency_max = max(self.latency_max, gap)
+            self.recent_switches.append(now)
+        while self.recent_switches and self.recent_switches[0] < now - self.burst_seconds:
+            self.recent_switches.popleft()
+
+        if switched or len(self.recent_switches) >= self.burst_switches:
+            if not switched:
+                self.burst_samples += 1
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+        return self.interval
+
+    def report(self, reference_interval=1.0):
+        """Samples taken against a fixed reference_interval poller, and detection latency bounds"""
+        elapsed = (self.last_sample - self.started) if self.samples else 0.0
+        fixed_samples = elapsed / reference_interval if reference_interval else 0.0
+        return {
+            "samples": self.samples,
+            "switches": self.switches,
+            "burst_samples": self.burst_samples,
+            "mean_interval_s": elapsed / (self.samples - 1) if self.samples > 1 else 0.0,
+            "fixed_samples": int(fixed_samples),
+            "samples_saved": 1 - self.samples / fixed_samples if fixed_samples else 0.0,
+            "mean_latency_s": self.latency_total / self.switches if self.switches else 0.0,
+            "max_latency_bound_s": self.latency_max,
+            "interval_s": self.interval,
+        }
+
+
+class FixedSampler:
+    def __init__(self, interval=1.0):
+        """The fixed-rate poller, with AdaptiveSampler's interface for comparisons"""
+        self.interval = interval
+
+    def observe(self, switched, now=None):
+        return self.interval
+
+
+def simulate(changes, sampler, start=None, end=None):
+    """
+    Sample a known timeline of foreground-app changes with a sampler on a
+    simulated clock and measure what it costs and what it misses.
+
+    Args:
+        changes: (epoch, app) pairs, oldest first; each app stays in front until the next change
+        sampler: AdaptiveSampler or FixedSampler
+    Returns:
+        dict with samples taken, switches detected, visits never seen (and
+        their total time), and detection latency from the true switch time
+    """
+    if not changes:
+        return {}
+    times = [epoch for epoch, _ in changes]
+    now = times[0] if start is None else start
+    end = times[-1] if end is None else end
+    first = now
+    seen = None
+    samples = 0
+    latencies = []
+    sampled = set()
+    while now <= end:
+        index = bisect.bisect_right(times, now) - 1
+        app = changes[index][1] if index >= 0 else None
+        samples += 1
+        sampled.add(index)
+        switched = seen is not None and app != seen
+        if switched:
+            latencies.append(now - times[index])
+        seen = app
+        now += sampler.observe(switched, now)
+
+    # A visit is missed when no sample fell inside it (repeats of the same app are not visits)
+    missed = missed_time = visits = 0
+    for index in range(1, len(changes)):
+        if changes[index][1] == changes[index - 1][1] or times[index] < first:
+            continue
+        visits += 1
+        if index not in sampled:
+            missed += 1
+            missed_time += (times[index + 1] if index + 1 < len(times) else end) - times[index]
+    latencies.sort()
+    return {
+        "samples": samples,
+        "samples_per_hour": samples / ((end - first) / 3600) if end > first else 0.0,
+        "visits": visits,
+        "detected": len(latencies),
+        "missed_visits": missed,
+        "missed_time_s": missed_time,
+        "mean_latency_s": sum(latencies) / len(latencies) if latencies else 0.0,
+        "p95_latency_s": latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0,
+        "max_latency_s": latencies[-1] if latencies else 0.0,
+    }
+
+
+def log_changes(path, start=None, end=None):
+    """(epoch, app) changes from a switch log (any format) or a replay timeline file"""
+    is_timeline = False
+    if os.path.isfile(path) and not path.endswith('.db'):
+        with open(path, 'rb') as f:
+            # Switch logs start with their header row
+            is_timeline = not f.readline().startswith(b"id")
+    if is_timeline:
+        from window_monitor import ReplayBackend
+        return ReplayBackend.read_timeline(path)
+    from report import iter_entries
+    return [(epoch, row[3]) for epoch, row in iter_entries(path, start, end)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare fixed and adaptive foreground-app sampling on a recorded timeline")
+    parser.add_argument("timeline", help="A switch log (CSV/TSV/.db/.col/partitioned) or a replay timeline file")
+    parser.add_argument("--from", dest="start", help="Only switches after this date/time")
+    parser.add_argument("--to", dest="end", help="Only switches up to this date/time")
+    parser.add_argument("--fixed", type=float, nargs="*", default=[1.0], help="Fixed intervals to compare against")
+    parser.add_argument("--min-interval", type=float, default=0.25)
+    parser.add_argument("--max-interval", type=float, nargs="*", default=[3.0],
+                        help="One or more maximum intervals to try")
+    parser.add_argument("--backoff", type=float, default=1.5)
+    args = parser.parse_args()
+
+    from report import parse_time
+    changes = log_changes(args.timeline, parse_time(args.start), parse_time(args.end))
+    if len(changes) < 2:
+        print("Timeline needs at least two changes")
+        return
+    candidates = [(f"fixed {interval:g}s", FixedSampler(interval)) for interval in args.fixed]
+    candidates += [(f"adaptive {args.min_interval:g}-{maximum:g}s",
+                    AdaptiveSampler(args.min_interval, maximum, args.backoff)) for maximum in args.max_interval]
+    print(f"{len(changes)} changes over {(changes[-1][0] - changes[0][0]) / 3600:.1f}h")
+    print(f"{'Sampler':<22} {'Samples':>9} {'Per hour':>9} {'Missed':>7} {'Missed time':>12} "
+          f"{'Latency':>8} {'p95':>7} {'Max':>7}")
+    for name, sampler in candidates:
+        result = simulate(changes, sampler)
+        print(f"{name:<22} {result['samples']:>9} {result['samples_per_hour']:>9.0f} "
+              f"{result['missed_visits']:>7} {result['missed_time_s']:>11.0f}s "
+              f"{result['mean_latency_s']:>7.2f}s {result['p95_latency_s']:>6.2f}s {result['max_latency_s']:>6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
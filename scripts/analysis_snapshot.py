@@ -0,0 +1,82 @@
+import time
+import threading
+from bisect import bisect_right
+
+
+class AnalysisSnapshot:
+    def __init__(self, task_tracker, stats_storage):
+        """
+        Shared cache of recent windows and historical statistics for one tick.
+
+        The analyzer and the desktop color both ask for the same history within
+        seconds of each other. Results are kept until TaskTracker appends a new
+        switch (its version changes), so nothing is recomputed in between.
+        """
+        self.task_tracker = task_tracker
+        self.stats_storage = stats_storage
+        self.lock = threading.Lock()
+        self.version = None
+        # Widest recent window loaded for this version: (minutes, times, rows)
+        self.recent = None
+        self.statistics = None
+        self.range_statistics = None
+        self.counters = {
+            "recent": {"hits": 0, "misses": 0},
+            "statistics": {"hits": 0, "misses": 0},
+            "range_statistics": {"hits": 0, "misses": 0},
+        }
+
+    def invalidate_if_stale(self):
+        version = self.task_tracker.version
+        if version != self.version:
+            self.version = version
+            self.recent = None
+            self.statistics = None
+            self.range_statistics = None
+
+    def read_recent_switches(self, minutes=1, now=None):
+        """Switches in the last X minutes, cut from the widest window cached for this version"""
+        now = time.time() if now is None else now
+        with self.lock:
+            self.invalidate_if_stale()
+            if self.recent is not None and self.recent[0] >= minutes:
+                self.counters["recent"]["hits"] += 1
+                _, times, rows = self.recent
+            else:
+                self.counters["recent"]["misses"] += 1
+                times, rows = self.task_tracker.recent.window_entries(minutes, now)
+                self.recent = (minutes, times, rows)
+            # Time keeps moving between writes, so trim to the requested window
+            return rows[bisect_right(times, now - minutes * 60):]
+
+    def calculate_statistics(self):
+        """Historical statistics, recomputed only after a new switch was recorded"""
+        with self.lock:
+            self.invalidate_if_stale()
+            if self.statistics is not None:
+                self.counters["statistics"]["hits"] += 1
+                return self.statistics
+            self.counters["statistics"]["misses"] += 1
+            self.statistics = self.stats_storage.calculate_statistics()
+            return self.statistics
+
+    def statistics_between(self, start, end):
+        """
+        Statistics for (start, end], recomputed only after a new switch was
+        recorded; the range slides with the clock, but without a new switch only
+        its oldest edge changes
+        """
+        with self.lock:
+            self.invalidate_if_stale()
+            if self.range_statistics is not None and self.range_statistics[0] == end - start:
+                self.counters["range_statistics"]["hits"] += 1
+                return self.range_statistics[1]
+            self.counters["range_statistics"]["misses"] += 1
+            statistics = self.stats_storage.statistics_between(start, end)
+            self.range_statistics = (end - start, statistics)
+            return statistics
+
+    def report(self):
+        """Hit/miss counters per cached value"""
+        with self.lock:
+            return {name: dict(counts) for name, counts in self.counters.items()}
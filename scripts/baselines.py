@@ -0,0 +1,162 @@
+import os
+import json
+import datetime
+import threading
+from running_stats import DurationAggregate
+from switch_log import read_rows_since
+
+HOURS_PER_WEEK = 7 * 24
+# Sketch size per bucket; 168 of them are checkpointed together
+BUCKET_SKETCH_K = 64
+DAY_NAMES = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+
+def hour_of_week(when):
+    """Bucket index 0..167 for a datetime: Monday 00:00-00:59 is 0"""
+    return when.weekday() * 24 + when.hour
+
+
+def bucket_label(bucket):
+    return f"{DAY_NAMES[bucket // 24]} {bucket % 24:02d}:00"
+
+
+class HourOfWeekBaselines:
+    def __init__(self, base_dir="~/task_switch", switch_log=None, min_count=30, checkpoint_every=100):
+        """
+        Session duration statistics bucketed by hour of the week (168 buckets),
+        so a check at 9am Monday is compared with earlier Monday mornings rather
+        than with one global mean.
+
+        Buckets are DurationAggregates folded in as new rows appear in the switch log
+        and checkpointed with the log offset they cover, like StatsStorage.
+
+        Args:
+            base_dir: Directory whose data/ holds hour_of_week_baselines.json
+                      (None keeps everything in memory, e.g. for replays)
+            switch_log: The tracker's switch log to read new rows from (any storage
+                        format). Defaults to reading task_tracker_data.csv directly.
+            min_count: Buckets with fewer sessions than this are not trusted;
+                       statistics_at returns {} for them so callers fall back
+                       to the global statistics
+            checkpoint_every: Save the checkpoint after this many new rows
+        """
+        self.switch_log = switch_log
+        self.checkpoint_path = None
+        self.source_path = switch_log.data_path if switch_log else None
+        if base_dir is not None:
+            self.data_dir = os.path.join(os.path.expanduser(base_dir), "data")
+            os.makedirs(self.data_dir, exist_ok=True)
+            self.checkpoint_path = os.path.join(self.data_dir, "hour_of_week_baselines.json")
+            self.source_path = self.source_path or os.path.join(self.data_dir, "task_tracker_data.csv")
+        self.min_count = min_count
+        self.checkpoint_every = max(1, checkpoint_every)
+        self.lock = threading.RLock()
+        self.buckets = [DurationAggregate(BUCKET_SKETCH_K) for _ in range(HOURS_PER_WEEK)]
+        self.offset = 0
+        self.since_checkpoint = 0
+        self.load_checkpoint()
+
+    def load_checkpoint(self):
+        if self.checkpoint_path is None:
+            return
+        try:
+            with open(self.checkpoint_path, 'r') as f:
+                state = json.load(f)
+            if state.get("source", self.source_path) != self.source_path:
+                print(f"Baseline checkpoint is for {state['source']}, rebuilding")
+                return
+            if len(state["buckets"]) != HOURS_PER_WEEK:
+                raise ValueError("wrong number of buckets")
+            if any("sketch" not in bucket for bucket in state["buckets"]):
+                print("Baseline checkpoint predates the quantile sketches, rebuilding")
+                return
+            self.buckets = [DurationAggregate.from_dict(bucket) for bucket in state["buckets"]]
+            self.offset = state["offset"]
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Ignoring unreadable baseline checkpoint {self.checkpoint_path}: {e}")
+            self.buckets = [DurationAggregate(BUCKET_SKETCH_K) for _ in range(HOURS_PER_WEEK)]
+            self.offset = 0
+
+    def save_checkpoint(self):
+        if self.checkpoint_path is None:
+            return
+        state = {"source": self.source_path, "offset": self.offset,
+                 "buckets": [bucket.to_dict() for bucket in self.buckets]}
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.checkpoint_path)
+        self.since_checkpoint = 0
+
+    def read_since(self, offset):
+        if self.switch_log is not None:
+            return self.switch_log.read_since(offset)
+        if self.source_path is None:
+            return [], offset
+        return read_rows_since(self.source_path, offset)
+
+    def update(self):
+        """Fold rows appended since the last call into their buckets"""
+        with self.lock:
+            added = 0
+            while True:
+                rows, self.offset = self.read_since(self.offset)
+                if not rows:
+                    break
+                for row in rows:
+                    added += self.add(row)
+            self.since_checkpoint += added
+            if self.since_checkpoint >= self.checkpoint_every:
+                self.save_checkpoint()
+            return added
+
+    def add(self, row):
+        """Fold one switch log row into its bucket; returns 1, or 0 for a malformed row"""
+        try:
+            when = datetime.datetime.fromisoformat(row[1])
+            duration = int(row[4])
+        except (ValueError, IndexError, TypeError):
+            return 0
+        with self.lock:
+            self.buckets[hour_of_week(when)].add(duration)
+        return 1
+
+    def statistics_at(self, when=None):
+        """
+        Statistics for the hour-of-week bucket `when` falls in (default now),
+        with the same keys as StatsStorage.calculate_statistics plus "bucket".
+        Returns {} when the bucket has fewer than min_count sessions.
+        """
+        when = when or datetime.datetime.now()
+        if not isinstance(when, datetime.datetime):
+            when = datetime.datetime.fromtimestamp(when)
+        bucket = hour_of_week(when)
+        with self.lock:
+            self.update()
+            aggregate = self.buckets[bucket]
+            if aggregate.count < max(1, self.min_count):
+                return {}
+            return {
+                "timestamp": when.strftime('%Y-%m-%d %H:%M:%S'),
+                "bucket": bucket_label(bucket),
+                "count": aggregate.count,
+                "mean": aggregate.mean,
+                "median": aggregate.quantile(0.5),
+                "std": aggregate.std(),
+                "min": aggregate.min,
+                "max": aggregate.max,
+            }
+
+    def table(self):
+        """(label, count, mean) for every bucket, Monday 00:00 first"""
+        with self.lock:
+            self.update()
+            return [(bucket_label(i), bucket.count, bucket.mean if bucket.count else None)
+                    for i, bucket in enumerate(self.buckets)]
+
+    def close(self):
+        with self.lock:
+            self.update()
+            self.save_checkpoint()
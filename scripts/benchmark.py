@@ -0,0 +1,252 @@
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import datetime
+import tempfile
+import subprocess
+import contextlib
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import color_change
+from synthetic_log import write_log
+from task_tracker import TaskTracker
+from stats_storage import StatsStorage
+from switch_analyzer import TaskSwitchAnalyzer
+from color_change import DesktopColor, PaletteRenderer
+from analysis_snapshot import AnalysisSnapshot
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+
+# Runs in a fresh interpreter so imports are measured cold; prints one JSON line
+STARTUP_PROBE = """
+import time
+started = time.perf_counter()
+import sys, json, threading
+sys.path.insert(0, {scripts!r})
+import cli
+imported = time.perf_counter()
+args = cli.parse_args(["run", "--base-dir", {base_dir!r}, "--backend", "replay",
+                       "--timeline", {timeline!r}, "--no-color", "--no-flow"])
+service = cli.build_service(args)
+built = time.perf_counter()
+first_sample = threading.Event()
+sample = service.window_monitor.get_active_window
+def get_active_window():
+    app = sample()
+    first_sample.set()
+    return app
+service.window_monitor.get_active_window = get_active_window
+service.start()
+first_sample.wait(30)
+sampled = time.perf_counter()
+heavy = [name for name in ("pandas", "numpy", "PIL.Image", "pystray", "http.server") if name in sys.modules]
+service.close()
+print(json.dumps({{"import_ms": (imported - started) * 1000, "build_ms": (built - imported) * 1000,
+                  "first_sample_ms": (sampled - started) * 1000, "heavy_modules": heavy}}))
+"""
+
+
+def timed(fn, repeat):
+    """Run fn `repeat` times with its prints silenced; return per-call timings in ms"""
+    timings = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def summarize(size, op, timings):
+    ordered = sorted(timings)
+    return {
+        "size": size,
+        "op": op,
+        "runs": len(ordered),
+        "min_ms": ordered[0],
+        "median_ms": ordered[len(ordered) // 2],
+        "mean_ms": sum(ordered) / len(ordered),
+        "max_ms": ordered[-1],
+    }
+
+
+def prepare_log(data_dir, storage, csv_path):
+    """Convert the synthetic CSV into the storage format under test, where TaskTracker will look for it"""
+    if storage == "columnar":
+        from columnar_log import convert_to_columnar
+        convert_to_columnar(csv_path, os.path.join(data_dir, "task_tracker_data.col"))
+    elif storage == "partitioned":
+        from partitioned_log import migrate_monolithic
+        migrate_monolithic(csv_path, os.path.join(data_dir, "task_tracker_data"))
+    elif storage == "sqlite":
+        from sqlite_log import import_csv
+        import_csv(csv_path, os.path.join(data_dir, "task_tracker_data.db"))
+
+
+def run_size(size, args):
+    """Benchmark every hot path against a synthetic log with `size` rows"""
+    base_dir = tempfile.mkdtemp(prefix=f"task_switch_bench_{size}_")
+    results = []
+    try:
+        data_path = os.path.join(base_dir, "data", "task_tracker_data.csv")
+        write_log(data_path, size, app_count=args.apps, mean_session=args.mean_session, seed=args.seed)
+        prepare_log(os.path.dirname(data_path), args.storage, data_path)
+
+        holder = {}
+
+        def start_tracker():
+            holder["tracker"] = TaskTracker(base_dir=base_dir, storage=args.storage,
+                                            journal=args.journal, fsync=args.journal)
+        results.append(summarize(size, "tracker_startup", timed(start_tracker, 1)))
+        tracker = holder["tracker"]
+
+        results.append(summarize(size, "record_app_switch",
+                                 timed(lambda: tracker.record_app_switch("Code", "Slack"), args.writes)))
+
+        stats = StatsStorage(base_dir=base_dir, switch_log=tracker.switch_log)
+        results.append(summarize(size, "calculate_statistics_cold", timed(stats.calculate_statistics, 1)))
+        results.append(summarize(size, "calculate_statistics", timed(stats.calculate_statistics, args.repeat)))
+        stats.close()
+
+        def warm_start():
+            StatsStorage(base_dir=base_dir, switch_log=tracker.switch_log).calculate_statistics()
+        # Restart from the latest snapshot; should stay flat as the log grows
+        results.append(summarize(size, "calculate_statistics_warm_start", timed(warm_start, args.repeat)))
+
+        analyzer = TaskSwitchAnalyzer(tracker, stats)
+        results.append(summarize(size, "read_recent_switches_1m",
+                                 timed(lambda: analyzer.read_recent_switches(1), args.repeat)))
+        results.append(summarize(size, "read_recent_switches_10m",
+                                 timed(lambda: analyzer.read_recent_switches(10), args.repeat)))
+        results.append(summarize(size, "check_excessive_task_switching",
+                                 timed(analyzer.check_excessive_task_switching, args.repeat)))
+
+        renderer = PaletteRenderer(cache_dir=os.path.join(base_dir, "cache", "colors"))
+        desktop_color = DesktopColor(analyzer, stats, renderer=renderer)
+        results.append(summarize(size, "update_color_based_on_behavior",
+                                 timed(desktop_color.update_color_based_on_behavior, args.repeat)))
+
+        # Both consumers sharing one snapshot, as TrackingService runs them
+        snapshot = AnalysisSnapshot(tracker, stats)
+        shared_analyzer = TaskSwitchAnalyzer(tracker, stats, snapshot=snapshot)
+        shared_color = DesktopColor(shared_analyzer, stats, renderer=renderer)
+
+        def tick():
+            shared_analyzer.check_excessive_task_switching()
+            shared_color.update_color_based_on_behavior()
+        results.append(summarize(size, "analysis_tick_with_snapshot", timed(tick, args.repeat)))
+        tracker.close()
+    finally:
+        shutil.rmtree(base_dir, ignore_errors=True)
+    return results
+
+
+def run_startup(args):
+    """Time imports, component construction and the first sample of the headless CLI in fresh processes"""
+    base_dir = tempfile.mkdtemp(prefix="task_switch_bench_startup_")
+    timings = {"startup_import": [], "startup_build": [], "startup_first_sample": [], "startup_process": []}
+    heavy = []
+    try:
+        timeline = os.path.join(base_dir, "timeline.csv")
+        with open(timeline, 'w') as f:
+            f.write("0,Code\n1,Slack\n")
+        probe = STARTUP_PROBE.format(scripts=os.path.dirname(os.path.abspath(__file__)),
+                                     base_dir=base_dir, timeline=timeline)
+        for _ in range(args.startup):
+            start = time.perf_counter()
+            out = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True).stdout
+            timings["startup_process"].append((time.perf_counter() - start) * 1000)
+            result = json.loads(out.strip().splitlines()[-1])
+            timings["startup_import"].append(result["import_ms"])
+            timings["startup_build"].append(result["build_ms"])
+            timings["startup_first_sample"].append(result["first_sample_ms"])
+            heavy = result["heavy_modules"]
+    finally:
+        shutil.rmtree(base_dir, ignore_errors=True)
+    if heavy:
+        print(f"Modules imported before the first sample that should be lazy: {', '.join(heavy)}")
+    return [summarize(0, op, values) for op, values in timings.items()]
+
+
+def run_metadata(args):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "started": datetime.datetime.now().isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "storage": args.storage,
+        "journal": args.journal,
+        "apps": args.apps,
+        "mean_session": args.mean_session,
+        "seed": args.seed,
+    }
+
+
+def compare(current, baseline_path):
+    """Print current/baseline median ratios for every (size, op) found in both runs"""
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)
+    previous = {(r["size"], r["op"]): r for r in baseline["results"]}
+    print(f"\nCompared with {baseline_path} (commit {baseline['meta'].get('commit', '?')}):")
+    print(f"{'size':>10}  {'op':<34}{'before ms':>12}{'after ms':>12}{'ratio':>8}")
+    for result in current["results"]:
+        before = previous.get((result["size"], result["op"]))
+        if before is None:
+            continue
+        ratio = result["median_ms"] / before["median_ms"] if before["median_ms"] else float("inf")
+        print(f"{result['size']:>10}  {result['op']:<34}{before['median_ms']:>12.3f}"
+              f"{result['median_ms']:>12.3f}{ratio:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the storage and analysis hot paths")
+    parser.add_argument("--sizes", type=int, nargs="*", default=DEFAULT_SIZES,
+                        help="Synthetic log sizes in rows (e.g. 1000 10000000); none to skip")
+    parser.add_argument("--startup", type=int, default=0,
+                        help="Also time headless startup (import, build, first sample) this many times")
+    parser.add_argument("--apps", type=int, default=12, help="Distinct apps in the synthetic log")
+    parser.add_argument("--mean-session", type=float, default=45.0,
+                        help="Mean seconds between switches in the synthetic log")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--storage", default="text", help="TaskTracker storage format")
+    parser.add_argument("--journal", action="store_true",
+                        help="Group-commit the text log through the fsynced journal")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per read operation")
+    parser.add_argument("--writes", type=int, default=200, help="Timed record_app_switch calls")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Earlier JSON results to compare against")
+    args = parser.parse_args()
+
+    # Never touch the real desktop while benchmarking; the colour maths still runs
+    color_change.set_desktop_color = lambda r, g, b, image_path=None: True
+
+    report = {"meta": run_metadata(args), "results": []}
+    if args.startup:
+        for result in run_startup(args):
+            report["results"].append(result)
+            print(f"{'startup':>10}  {result['op']:<34}{result['median_ms']:>12.3f} ms")
+    for size in args.sizes:
+        for result in run_size(size, args):
+            report["results"].append(result)
+            print(f"{size:>10}  {result['op']:<34}{result['median_ms']:>12.3f} ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import os
+import sys
+import time
+import signal
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from tracking_service import TrackingService
+from task_tracker import TaskTracker
+from window_monitor import WindowMonitor
+from switch_analyzer import TaskSwitchAnalyzer
+from stats_storage import StatsStorage
+from launch_flow import LaunchFlow
+from color_change import DesktopColor, PaletteRenderer
+from analysis_snapshot import AnalysisSnapshot
+from baselines import HourOfWeekBaselines
+from duration_sketches import DurationSketches
+from switch_writer import SwitchWriter
+from adaptive_sampler import AdaptiveSampler
+from title_log import TitleLog
+import metrics
+
+
+def build_service(args):
+    """Wire up the same components as window_tracker_2.py, configured from the command line"""
+    # The switch writer flushes after every batch, so the log need not flush per row
+    task_tracker = TaskTracker(use_tsv=args.tsv, storage=args.storage, base_dir=args.base_dir,
+                               partition_period=args.partition_period, flush_every=50,
+                               journal=args.journal, group_commit_ms=args.group_commit_ms,
+                               fsync=args.journal)
+    if args.collector:
+        from collector import CollectorForwarder
+        task_tracker.listeners.append(CollectorForwarder(args.collector))
+    switch_writer = SwitchWriter(task_tracker)
+    if args.backend == "replay":
+        window_monitor = WindowMonitor("replay", timeline_path=args.timeline)
+    else:
+        window_monitor = WindowMonitor(args.backend)
+    stats_storage = StatsStorage(base_dir=args.base_dir, switch_log=task_tracker.switch_log)
+    snapshot = AnalysisSnapshot(task_tracker, stats_storage)
+    baselines = HourOfWeekBaselines(base_dir=args.base_dir, switch_log=task_tracker.switch_log)
+    sketches = None
+    if args.percentile is not None:
+        sketches = DurationSketches(base_dir=args.base_dir, switch_log=task_tracker.switch_log)
+    switch_analyzer = TaskSwitchAnalyzer(task_tracker, stats_storage, snapshot=snapshot,
+                                         baselines=baselines, sketches=sketches,
+                                         percentile=args.percentile, history_days=args.history_days,
+                                         stats_days=args.stats_days)
+    flow_launcher = None if args.no_flow else LaunchFlow()
+    desktop_color = None
+    if not args.no_color:
+        renderer = PaletteRenderer(cache_dir=os.path.join(args.base_dir, "cache", "colors"))
+        desktop_color = DesktopColor(switch_analyzer, stats_storage, renderer=renderer)
+    return TrackingService(
+        task_tracker=task_tracker,
+        window_monitor=window_monitor,
+        switch_analyzer=switch_analyzer,
+        flow_launcher=flow_launcher,
+        desktop_color=desktop_color,
+        sample_interval=args.sample_interval,
+        switch_writer=switch_writer,
+        sampler=AdaptiveSampler(args.min_interval, args.max_interval) if args.adaptive else None,
+        title_log=TitleLog(os.path.join(args.base_dir, "data", "titles")) if args.titles else None
+    )
+
+
+def run(args):
+    """Track without the tray icon until interrupted (Ctrl-C or SIGTERM)"""
+    if args.metrics_port is not None:
+        metrics.start_server(args.metrics_port)
+    metrics.dump_on_exit(os.path.join(args.base_dir, "metrics.prom"))
+
+    tracking_service = build_service(args)
+    tracking_service.start()
+    if tracking_service.desktop_color:
+        tracking_service.desktop_color.prerender_palette()
+
+    def terminate(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, terminate)
+
+    started = time.monotonic()
+    try:
+        while tracking_service.running:
+            if args.duration is not None and time.monotonic() - started >= args.duration:
+                break
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        pass
+    tracking_service.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="task_switch", description="Task switching tracker")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Track app switches without the tray icon")
+    run_parser.add_argument("--base-dir", default="~/task_switch")
+    run_parser.add_argument("--storage", default="text", choices=["text", "columnar", "partitioned", "sqlite"])
+    run_parser.add_argument("--tsv", action="store_true", help="Write the text log as TSV")
+    run_parser.add_argument("--partition-period", default="day")
+    run_parser.add_argument("--journal", action="store_true",
+                            help="Group-commit the text log through a checksummed, fsynced journal")
+    run_parser.add_argument("--group-commit-ms", type=float, default=200)
+    run_parser.add_argument("--collector", metavar="ADDRESS",
+                            help="Also send every switch to a collector (host:port or unix:/path)")
+    run_parser.add_argument("--backend", default="persistent", choices=["persistent", "oneshot", "replay"])
+    run_parser.add_argument("--timeline", help="Timeline file for --backend replay")
+    run_parser.add_argument("--sample-interval", type=float, default=1.0)
+    run_parser.add_argument("--adaptive", action="store_true",
+                            help="Sample faster after switches and back off while the app is stable")
+    run_parser.add_argument("--min-interval", type=float, default=0.25, help="Fastest --adaptive interval")
+    run_parser.add_argument("--max-interval", type=float, default=3.0, help="Slowest --adaptive interval")
+    run_parser.add_argument("--titles", action="store_true",
+                            help="Also record time per window title (stored under data/titles/)")
+    run_parser.add_argument("--percentile", type=float, default=None,
+                            help="Launch Flow when the recent median session is below this quantile "
+                                 "of past sessions (e.g. 0.25) instead of comparing means")
+    run_parser.add_argument("--history-days", type=int, default=28,
+                            help="Days of history behind --percentile")
+    run_parser.add_argument("--stats-days", type=int, default=None,
+                            help="Compare the recent mean with the mean of only the last N days "
+                                 "(default: all history)")
+    run_parser.add_argument("--no-color", action="store_true", help="Leave the desktop colour alone")
+    run_parser.add_argument("--no-flow", action="store_true", help="Never launch Flow")
+    run_parser.add_argument("--metrics-port", type=int, default=None,
+                            help="Serve Prometheus metrics on this localhost port")
+    run_parser.add_argument("--duration", type=float, default=None, help="Stop after this many seconds")
+    run_parser.set_defaults(handler=run)
+
+    report_parser = commands.add_parser("report", help="Summarize the switch history without loading it into memory")
+    import report
+    report.add_arguments(report_parser)
+    report_parser.set_defaults(handler=lambda args: sys.exit(report.run(args)))
+
+    args = parser.parse_args(argv)
+    if hasattr(args, "base_dir"):
+        args.base_dir = os.path.expanduser(args.base_dir)
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
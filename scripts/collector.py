@@ -0,0 +1,481 @@
+import os
+import re
+import sys
+import csv
+import json
+import time
+import heapq
+import queue
+import random
+import socket
+import asyncio
+import argparse
+import datetime
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from switch_log import CsvSwitchLog, HEADER
+
+DEFAULT_ADDRESS = "127.0.0.1:7070"
+
+
+def parse_address(address):
+    """"unix:/path", "/path" -> ("unix", path); "tcp:host:port", "host:port" -> ("tcp", host, port)"""
+    if address.startswith("unix:"):
+        return ("unix", os.path.expanduser(address[5:]))
+    if "/" in address or address.startswith("~"):
+        return ("unix", os.path.expanduser(address))
+    if address.startswith("tcp:"):
+        address = address[4:]
+    host, _, port = address.rpartition(":")
+    return ("tcp", host or "127.0.0.1", int(port))
+
+
+def safe_host(name):
+    """Host name usable as a directory name"""
+    return re.sub(r"[^A-Za-z0-9._-]", "_", str(name))[:100].lstrip(".") or "unknown"
+
+
+def encode_event(host, row):
+    """One NDJSON line for a switch row [id, timestamp, app_from, app_to, duration]"""
+    return json.dumps({"host": host, "timestamp": row[1], "app_from": row[2],
+                       "app_to": row[3], "duration": row[4]}) + "\n"
+
+
+class HostLogs:
+    def __init__(self, root, max_open=256):
+        """
+        One CSV switch log per host under root/<host>/task_tracker_data.csv.
+
+        At most max_open logs keep a file handle; the least recently written is
+        closed (flushing it and its id counter) when another one is needed.
+        """
+        self.root = root
+        self.max_open = max(1, max_open)
+        self.open_logs = OrderedDict()
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, host):
+        return os.path.join(self.root, host, "task_tracker_data.csv")
+
+    def get(self, host):
+        log = self.open_logs.get(host)
+        if log is not None:
+            self.open_logs.move_to_end(host)
+            return log
+        path = self.path(host)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', newline='') as f:
+                csv.writer(f).writerow(HEADER)
+        # Flushed per ingest batch by the collector, not per row
+        log = CsvSwitchLog(path, flush_every=1 << 30)
+        self.open_logs[host] = log
+        while len(self.open_logs) > self.max_open:
+            _, oldest = self.open_logs.popitem(last=False)
+            oldest.close()
+        return log
+
+    def flush(self):
+        for log in self.open_logs.values():
+            log.flush()
+
+    def close(self):
+        for log in self.open_logs.values():
+            log.close()
+        self.open_logs.clear()
+
+    def hosts(self):
+        return sorted(name for name in os.listdir(self.root) if os.path.exists(self.path(name)))
+
+
+def iter_host_rows(path, start=None, end=None):
+    """(epoch, row) from one host log with start < timestamp <= end, in file (time) order"""
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            try:
+                epoch = datetime.datetime.fromisoformat(row[1]).timestamp()
+            except (ValueError, IndexError):
+                continue
+            if start is not None and epoch <= start:
+                continue
+            if end is not None and epoch > end:
+                break
+            yield epoch, row
+
+
+def tagged_rows(path, host, start=None, end=None):
+    for epoch, row in iter_host_rows(path, start, end):
+        yield epoch, host, row
+
+
+def merged_rows(root, start=None, end=None, hosts=None):
+    """
+    Switches from every host (or the given ones) merged into one timestamp-ordered
+    stream of (epoch, host, row). A k-way heap merge over the per-host logs, so
+    only one pending row per host is held in memory.
+    """
+    logs = HostLogs(root)
+    # Same mapping the collector used to name the directories
+    names = [safe_host(host) for host in hosts] if hosts else logs.hosts()
+    streams = [tagged_rows(logs.path(host), host, start, end)
+               for host in names if os.path.exists(logs.path(host))]
+    return heapq.merge(*streams, key=lambda item: item[0])
+
+
+class Collector:
+    def __init__(self, root, address=DEFAULT_ADDRESS, batch_size=1000, batch_ms=200, max_open=256):
+        """
+        Accepts NDJSON switch events from many trackers over TCP or a Unix socket
+        and stores them per host.
+
+        Each line is {"host", "timestamp", "app_from", "app_to", "duration"}.
+        Events are buffered and written in batches (every batch_size events or
+        batch_ms milliseconds), with one flush per touched host per batch.
+        Batches are written on one writer thread, in order, so file I/O never
+        blocks the event loop. A line {"stats": true} is answered with the
+        collector's counters.
+        """
+        self.root = os.path.expanduser(root)
+        self.address = parse_address(address)
+        self.batch_size = max(1, batch_size)
+        self.batch_ms = batch_ms
+        self.logs = HostLogs(self.root, max_open)
+        # One worker: the host logs are only touched from this thread
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="collector-writer")
+        self.pending = []
+        self.server = None
+        self.started = time.monotonic()
+        self.counters = {
+            "connections": 0,
+            "open_connections": 0,
+            "events": 0,
+            "bad_lines": 0,
+            "batches": 0,
+            "max_batch": 0,
+            "max_ingest_ms": 0.0,
+        }
+
+    async def handle(self, reader, writer):
+        self.counters["connections"] += 1
+        self.counters["open_connections"] += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    self.counters["bad_lines"] += 1
+                    continue
+                if not isinstance(event, dict):
+                    self.counters["bad_lines"] += 1
+                    continue
+                if event.get("stats"):
+                    await self.ingest()
+                    writer.write((json.dumps(self.report()) + "\n").encode("utf-8"))
+                    await writer.drain()
+                    continue
+                self.pending.append(event)
+                if len(self.pending) >= self.batch_size:
+                    await self.ingest()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.counters["open_connections"] -= 1
+            writer.close()
+
+    async def ingest(self):
+        """Hand every pending event to the writer thread and wait for it to be stored"""
+        if not self.pending:
+            return
+        started = time.perf_counter()
+        events, self.pending = self.pending, []
+        stored, bad = await asyncio.get_running_loop().run_in_executor(self.executor, self.write_events, events)
+        self.counters["bad_lines"] += bad
+        self.counters["events"] += stored
+        self.counters["batches"] += 1
+        self.counters["max_batch"] = max(self.counters["max_batch"], len(events))
+        self.counters["max_ingest_ms"] = max(self.counters["max_ingest_ms"],
+                                             (time.perf_counter() - started) * 1000)
+
+    def write_events(self, events):
+        """
+        Write events to their host logs, then flush each touched log once.
+        Runs on the writer thread; returns (stored, malformed).
+        """
+        touched = {}
+        stored = bad = 0
+        for event in events:
+            try:
+                host = safe_host(event["host"])
+                when = datetime.datetime.fromisoformat(event["timestamp"])
+                duration = int(event.get("duration") or 0)
+            except (KeyError, TypeError, ValueError):
+                bad += 1
+                continue
+            log = touched.get(host) or self.logs.get(host)
+            touched[host] = log
+            log.append(when, event.get("app_from"), event.get("app_to"), duration)
+            stored += 1
+        for log in touched.values():
+            log.flush()
+        return stored, bad
+
+    async def flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.batch_ms / 1000)
+            await self.ingest()
+
+    async def serve(self):
+        if self.address[0] == "unix":
+            path = self.address[1]
+            if os.path.exists(path):
+                os.remove(path)
+            self.server = await asyncio.start_unix_server(self.handle, path=path, limit=1 << 20)
+        else:
+            self.server = await asyncio.start_server(self.handle, self.address[1], self.address[2],
+                                                     limit=1 << 20, backlog=4096)
+        print(f"Collector listening on {self.address}, storing under {self.root}")
+        flusher = asyncio.create_task(self.flush_periodically())
+        try:
+            async with self.server:
+                await self.server.serve_forever()
+        finally:
+            flusher.cancel()
+            await self.ingest()
+            self.executor.shutdown(wait=True)
+            self.logs.close()
+
+    def report(self):
+        report = dict(self.counters)
+        elapsed = time.monotonic() - self.started
+        report["events_per_s"] = report["events"] / elapsed if elapsed else 0.0
+        report["open_logs"] = len(self.logs.open_logs)
+        return report
+
+
+def connect(address, timeout=5.0):
+    kind = address[0]
+    if kind == "unix":
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(address[1])
+    else:
+        sock = socket.create_connection((address[1], address[2]), timeout=timeout)
+    return sock
+
+
+class CollectorForwarder:
+    def __init__(self, address=DEFAULT_ADDRESS, host=None, max_queue=10000, batch_size=100,
+                 retry_seconds=5.0):
+        """
+        TaskTracker listener that ships every recorded switch to a collector.
+
+        Rows are queued without blocking and sent in batches by a background
+        thread that reconnects after failures; while the collector is down rows
+        wait in the queue, and are dropped (and counted) once it is full.
+        """
+        self.address = parse_address(address)
+        self.host = host or socket.gethostname()
+        self.batch_size = max(1, batch_size)
+        self.retry_seconds = retry_seconds
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.sock = None
+        self.counters = {"sent": 0, "dropped": 0, "failures": 0}
+        self.closing = threading.Event()
+        self.thread = None
+        self.start()
+
+    def start(self):
+        """Start the sender thread (again after close); no-op while it is running"""
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.closing.clear()
+        self.thread = threading.Thread(target=self.run, name="collector-forwarder", daemon=True)
+        self.thread.start()
+
+    def add(self, row):
+        if self.closing.is_set():
+            # Closed earlier; rows recorded after that still get sent
+            self.start()
+        try:
+            self.queue.put_nowait(row)
+        except queue.Full:
+            self.counters["dropped"] += 1
+
+    def run(self):
+        batch = []
+        while not (self.closing.is_set() and self.queue.empty() and not batch):
+            if not batch:
+                try:
+                    batch.append(self.queue.get(timeout=0.5))
+                except queue.Empty:
+                    continue
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+            try:
+                if self.sock is None:
+                    self.sock = connect(self.address)
+                self.sock.sendall("".join(encode_event(self.host, row) for row in batch).encode("utf-8"))
+                self.counters["sent"] += len(batch)
+                batch = []
+            except OSError as e:
+                self.counters["failures"] += 1
+                if self.sock is not None:
+                    self.sock.close()
+                    self.sock = None
+                if self.closing.is_set():
+                    # Do not hold up shutdown for an unreachable collector
+                    self.counters["dropped"] += len(batch) + self.queue.qsize()
+                    return
+                print(f"Collector {self.address} unreachable ({e}), retrying in {self.retry_seconds}s")
+                self.closing.wait(self.retry_seconds)
+
+    def close(self):
+        self.closing.set()
+        self.thread.join(5.0)
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def report(self):
+        report = dict(self.counters)
+        report["queued"] = self.queue.qsize()
+        return report
+
+
+async def open_connection(address):
+    if address[0] == "unix":
+        return await asyncio.open_unix_connection(address[1])
+    return await asyncio.open_connection(address[1], address[2])
+
+
+async def simulated_tracker(address, host, events, rate, apps, start_gate, seed, connecting=None):
+    """
+    One fake tracker: connects, waits for the start signal, then sends its events.
+    With a connecting semaphore, the connection is opened while holding it, so
+    at most that many connects are in flight at once.
+    """
+    rng = random.Random(seed)
+    if connecting is None:
+        reader, writer = await open_connection(address)
+    else:
+        async with connecting:
+            reader, writer = await open_connection(address)
+    await start_gate.wait()
+    when = datetime.datetime.now() - datetime.timedelta(days=1)
+    current = rng.choice(apps)
+    for i in range(events):
+        duration = max(1, int(rng.expovariate(1 / 45)))
+        when += datetime.timedelta(seconds=duration)
+        target = rng.choice(apps)
+        writer.write(encode_event(host, [i + 1, when.isoformat(), current, target, duration]).encode("utf-8"))
+        current = target
+        if rate:
+            await writer.drain()
+            await asyncio.sleep(rng.expovariate(rate))
+        elif i % 100 == 99:
+            await writer.drain()
+    await writer.drain()
+    writer.close()
+
+
+async def collector_stats(address):
+    reader, writer = await open_connection(address)
+    writer.write(b'{"stats": true}\n')
+    await writer.drain()
+    stats = json.loads(await reader.readline())
+    writer.close()
+    return stats
+
+
+async def load_test(address, trackers, events, rate, connect_concurrency=200):
+    """Run many simulated trackers at once and measure end-to-end ingestion"""
+    apps = ["Code", "Slack", "Google Chrome", "Terminal", "Mail", "Zoom", "Notes", "Spotify"]
+    baseline = (await collector_stats(address))["events"]
+    start_gate = asyncio.Event()
+    connecting = asyncio.Semaphore(connect_concurrency)
+
+    tasks = [asyncio.create_task(simulated_tracker(address, f"loadgen-{n:05d}", events, rate, apps,
+                                                   start_gate, n, connecting))
+             for n in range(trackers)]
+    # Give every tracker a moment to connect so the timing covers sending only
+    await asyncio.sleep(min(10.0, 0.002 * trackers + 0.5))
+    started = time.perf_counter()
+    start_gate.set()
+    await asyncio.gather(*tasks)
+    sent_at = time.perf_counter()
+    expected = baseline + trackers * events
+    while True:
+        stats = await collector_stats(address)
+        if stats["events"] >= expected:
+            break
+        await asyncio.sleep(0.05)
+    ingested_at = time.perf_counter()
+    total = trackers * events
+    return {
+        "trackers": trackers,
+        "events": total,
+        "send_s": sent_at - started,
+        "ingest_s": ingested_at - started,
+        "events_per_s": total / (ingested_at - started),
+        "collector": stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Collect switch events from many trackers")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="Run the collector")
+    serve.add_argument("--root", default="~/task_switch/collector")
+    serve.add_argument("--address", default=DEFAULT_ADDRESS, help="host:port or unix:/path/to.sock")
+    serve.add_argument("--batch-size", type=int, default=1000)
+    serve.add_argument("--batch-ms", type=float, default=200)
+    serve.add_argument("--max-open", type=int, default=256, help="Host logs kept open at once")
+
+    query = commands.add_parser("query", help="Print switches from all hosts in timestamp order")
+    query.add_argument("--root", default="~/task_switch/collector")
+    query.add_argument("--from", dest="start", help="Only switches after this date/time")
+    query.add_argument("--to", dest="end", help="Only switches up to this date/time")
+    query.add_argument("--host", action="append", help="Limit to these hosts (repeatable)")
+    query.add_argument("--limit", type=int, default=None)
+
+    loadgen = commands.add_parser("loadgen", help="Simulate many trackers sending to a running collector")
+    loadgen.add_argument("--address", default=DEFAULT_ADDRESS)
+    loadgen.add_argument("--trackers", type=int, default=1000)
+    loadgen.add_argument("--events", type=int, default=100, help="Events per tracker")
+    loadgen.add_argument("--rate", type=float, default=0, help="Events per second per tracker (0 = as fast as possible)")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        collector = Collector(args.root, args.address, args.batch_size, args.batch_ms, args.max_open)
+        try:
+            asyncio.run(collector.serve())
+        except KeyboardInterrupt:
+            print(f"Collector stopped: {collector.report()}")
+    elif args.command == "query":
+        to_epoch = lambda value: datetime.datetime.fromisoformat(value).timestamp() if value else None
+        rows = merged_rows(os.path.expanduser(args.root), to_epoch(args.start), to_epoch(args.end), args.host)
+        writer = csv.writer(sys.stdout)
+        writer.writerow(["host"] + HEADER)
+        for count, (_, host, row) in enumerate(rows):
+            if args.limit is not None and count >= args.limit:
+                break
+            writer.writerow([host] + row)
+    else:
+        result = asyncio.run(load_test(parse_address(args.address), args.trackers, args.events, args.rate))
+        print(json.dumps(result, indent=1))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,105 @@
 import subprocess
-from PIL import Image
-import tempfile
 import os
+import metrics
+
+class PaletteRenderer:
+    def __init__(self, levels=32, cache_dir="~/task_switch/cache/colors", max_files=64):
+        """
+        Quantizes intensity to a fixed palette and keeps the rendered PNGs in an
+        on-disk LRU cache, so repeated colours reuse the same file.
+        
+        Args:
+            levels: Number of distinct intensity steps between calm and warning
+            cache_dir: Where rendered colour images are kept (None for a renderer
+                       that never renders images, e.g. the replay's)
+            max_files: Cache size; least recently used images are deleted beyond this
+        """
+        self.levels = max(2, levels)
+        self.cache_dir = os.path.expanduser(cache_dir) if cache_dir is not None else None
+        self.max_files = max(1, max_files)
+        self.last_applied = None
+        self.applied = 0
+        self.failed = 0
+        self.skipped = 0
+        self.rendered = 0
+        self.evicted = 0
+        if self.cache_dir is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+    
+    def quantize(self, intensity):
+        """Snap intensity (0.0-1.0) to the nearest palette step"""
+        step = round(max(0.0, min(1.0, intensity)) * (self.levels - 1))
+        return step / (self.levels - 1)
+    
+    def image_path(self, color):
+        """Path of a PNG for color, rendering it only on a cache miss"""
+        if self.cache_dir is None:
+            raise ValueError("This PaletteRenderer has no image cache")
+        r, g, b = color
+        path = os.path.join(self.cache_dir, f"desktop_{r:02x}{g:02x}{b:02x}.png")
+        if os.path.exists(path):
+            # Touch it so LRU eviction sees it as recently used
+            os.utime(path)
+            return path
+        
+        from PIL import Image
+        color_img = Image.new('RGB', (100, 100), color=(r, g, b))
+        tmp_path = path + ".tmp"
+        color_img.save(tmp_path, format='PNG')
+        os.replace(tmp_path, path)
+        self.rendered += 1
+        self.evict()
+        return path
+    
+    def evict(self):
+        """Delete the least recently used images beyond max_files"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.startswith("desktop_") and name.endswith(".png"):
+                path = os.path.join(self.cache_dir, name)
+                entries.append((os.path.getmtime(path), path))
+        entries.sort()
+        for _, path in entries[:max(0, len(entries) - self.max_files)]:
+            # Never delete the picture the desktop is currently showing
+            if self.last_applied is not None and path.endswith(
+                    "desktop_{:02x}{:02x}{:02x}.png".format(*self.last_applied)):
+                continue
+            os.remove(path)
+            self.evicted += 1
+    
+    def apply(self, color):
+        """Set the desktop to color unless it is already showing it; returns True if the desktop changed"""
+        if color == self.last_applied:
+            self.skipped += 1
+            return False
+        if not set_desktop_color(*color, image_path=self.image_path(color)):
+            # Not remembered, so the next update tries again
+            self.failed += 1
+            return False
+        self.last_applied = color
+        self.applied += 1
+        return True
+    
+    def report(self):
+        return {"applied": self.applied, "failed": self.failed, "skipped": self.skipped,
+                "rendered": self.rendered, "evicted": self.evicted}
 
 class DesktopColor:
-    def __init__(self, switch_analyzer, stats_storage):
+    def __init__(self, switch_analyzer, stats_storage, renderer=None, intensity_exponent=2,
+                 window_minutes=10, weighting="linear", half_life=120.0):
+        """
+        Args:
+            weighting: Recent average to compare with history: "linear" weights the
+                       i-th oldest session by i + 1, "exponential" halves a
+                       session's weight every half_life seconds of age
+            half_life: Seconds for the exponential weighting
+        """
+        if weighting not in ("linear", "exponential"):
+            raise ValueError(f"Unknown weighting {weighting}")
         self.switch_analyzer = switch_analyzer
         self.stats_storage = stats_storage
+        # Bounded palette + image cache; also skips the OS call when nothing changed
+        self.renderer = renderer if renderer is not None else PaletteRenderer()
         
         # Define color range (from calm to intense)
         self.calm_color = (0, 100, 255)  # Blue (calm)
@@ -15,6 +108,18 @@ class DesktopColor:
         # How often to update the color (in seconds)
         self.update_interval = 5
         
+        # Below-average ratios are raised to this power; higher = less sensitive
+        self.intensity_exponent = intensity_exponent
+        # How far back the recent average looks
+        self.window_minutes = window_minutes
+        self.weighting = weighting
+        self.half_life = half_life
+    
+    def prerender_palette(self):
+        """Render every palette colour up front so updates never have to"""
+        for step in range(self.renderer.levels):
+            self.renderer.image_path(self.interpolate_color(step / (self.renderer.levels - 1)))
+        
     def calculate_color_intensity(self, recent_duration, historical_mean):
         """
         Calculate color intensity based on how current behavior 
@@ -29,7 +134,7 @@ class DesktopColor:
         ratio = recent_duration / historical_mean       
         
         if ratio <=1:
-            ratio = ratio ** 2
+            ratio = ratio ** self.intensity_exponent
         if ratio > 1:
             ratio = ratio
         # Invert and clamp the ratio to get intensity
@@ -58,43 +163,44 @@ class DesktopColor:
         g = max(0, min(255, g))
         b = max(0, min(255, b))  
         return (r, g, b)
-    def update_color_based_on_behavior(self):
-        """Updates desktop color based on user switching behavior continuously"""
-        try:
-            # Get recent switches (last minute)
-            recent_switches = self.switch_analyzer.read_recent_switches(minutes=10)        
-            # If no recent switches, just return
-            if not recent_switches or len(recent_switches) < 2:
-                return        
-            # Calculate average duration of recent app sessions
-            #recent_durations = [int(switch[4]) for switch in recent_switches if len(switch) > 4 and switch[4]]
+    def update_color_based_on_behavior(self, scores=None):
+        """
+        Updates desktop color based on user switching behavior continuously
 
-            recent_durations = []
-            for switch in recent_switches:
-                if len(switch) > 4 and switch[4]:
-                    recent_durations.append(int(switch[4]))
-            if not recent_durations:
+        scores: recency_scores of the current window when the caller already has
+                them (the replay scores every tick at once with score_windows);
+                otherwise they are computed from the recent switches
+        """
+        from scoring import recency_scores, rows_to_arrays
+        try:
+            if scores is None:
+                # Get recent switches (last minute)
+                recent_switches = self.switch_analyzer.read_recent_switches(minutes=self.window_minutes)        
+                # If no recent switches, just return
+                if not recent_switches or len(recent_switches) < 2:
+                    return        
+                # Calculate average duration of recent app sessions; the linear
+                # recency weighting gives the i-th oldest session weight i + 1
+                times, durations = rows_to_arrays(recent_switches)
+                scores = recency_scores(durations, times, half_life=self.half_life,
+                                        now=self.switch_analyzer.clock())
+            if scores["count"] < 2:
                 return            
-            recent_avg_duration_2 = sum(recent_durations) / len(recent_durations)      
-            recent_avg_duration = 0
-            total_weight = 0
-
-            for i in (list(range(0,len(recent_durations)))):
-                recent_avg_duration = recent_avg_duration + recent_durations[i] * (i+1) #weight by i + 1 (1 to 5, in practice)
-                total_weight = total_weight + (1+i)
-            
-            recent_avg_duration = recent_avg_duration / total_weight if total_weight > 0 else 0
+            recent_avg_duration_2 = scores["mean"]
+            recent_avg_duration = scores[self.weighting]
          
             # Get historical statistics
-            historical_stats = self.stats_storage.calculate_statistics()          
+            historical_stats = self.switch_analyzer.calculate_statistics()          
             if historical_stats and 'mean' in historical_stats:
                 historical_mean_duration = historical_stats['mean']              
                 # Calculate how intense the color should be
                 intensity = self.calculate_color_intensity(recent_avg_duration, historical_mean_duration)             
+                intensity = self.renderer.quantize(intensity)
                 # Interpolate between calm and warning colors
                 color = self.interpolate_color(intensity)            
-                # Set the desktop color
-                set_desktop_color(*color)           
+                # Set the desktop color (no-op if it is already showing)
+                if not self.renderer.apply(color):
+                    return
                 print(f"Updated desktop color to {color} (intensity: {intensity:.2f})")
                 print(f"Recent avg duration: {recent_avg_duration:.1f}s, Historical mean: {historical_mean_duration:.1f}s")
                 print(f"Recent avg duration 2: {recent_avg_duration_2:.1f}s, Historical mean: {historical_mean_duration:.1f}s")
@@ -103,24 +209,21 @@ class DesktopColor:
         except Exception as e:
             print(f"Error updating desktop color: {e}")
 
-def set_desktop_color(r, g, b):
+@metrics.timed("set_desktop_color")
+def set_desktop_color(r, g, b, image_path=None):
     """
     Set the desktop background to a solid color using r,g,b values (0-255)
-    """
-    # Create a small solid color image
-    img_size = (100, 100)
-    color_img = Image.new('RGB', img_size, color=(r, g, b))
     
-    # Save to a temporary file
-    temp_file = tempfile.NamedTemporaryFile(suffix='.png', delete=False)
-    temp_path = temp_file.name
-    color_img.save(temp_path)
-    temp_file.close()
+    image_path: an already rendered image of that color (see PaletteRenderer);
+                when omitted the image comes from the shared palette cache
+    """
+    if image_path is None:
+        image_path = default_renderer().image_path((r, g, b))
     
     # AppleScript to set the desktop picture
     applescript = f'''
     tell application "Finder"
-        set desktop picture to POSIX file "{temp_path}"
+        set desktop picture to POSIX file "{image_path}"
     end tell
     '''
     
@@ -131,11 +234,20 @@ def set_desktop_color(r, g, b):
     
     if result.returncode != 0:
         print(f"Error: {result.stderr}")
-    else:
-        print(f"Desktop background set to RGB: {r}, {g}, {b}")
-    
-    # Don't delete the file immediately as macOS needs it
-    # You might want to store these files somewhere and clean them up later
+        return False
+    print(f"Desktop background set to RGB: {r}, {g}, {b}")
+    # The image stays in the palette cache since macOS keeps reading it;
+    # PaletteRenderer evicts old ones
+    return True
+
+_default_renderer = None
+
+def default_renderer():
+    """Palette cache used by set_desktop_color when no image is passed"""
+    global _default_renderer
+    if _default_renderer is None:
+        _default_renderer = PaletteRenderer()
+    return _default_renderer
 
 # Example: Set to a specific color (red)
 #set_desktop_color(255, 0, 0)
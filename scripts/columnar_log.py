@@ -0,0 +1,293 @@
+import os
+import csv
+import sys
+import time
+import array
+import struct
+import datetime
+import argparse
+import threading
+from string_table import StringTable
+
+# Column name -> array typecode. Fixed width so row i sits at i * itemsize.
+COLUMNS = {
+    "id": "q",          # int64
+    "timestamp": "q",   # int64 epoch microseconds
+    "app_from": "i",    # int32 id into apps.txt
+    "app_to": "i",      # int32 id into apps.txt
+    "duration": "i",    # int32 seconds
+}
+NUMPY_DTYPES = {"q": "<i8", "i": "<i4"}
+
+
+def to_epoch_us(when):
+    """Datetime (naive = local time, like the CSV log) to epoch microseconds"""
+    seconds = int(when.replace(microsecond=0).timestamp())
+    return seconds * 1000000 + when.microsecond
+
+
+def from_epoch_us(epoch_us):
+    """Epoch microseconds back to the naive local datetime, without float rounding"""
+    seconds, micros = divmod(epoch_us, 1000000)
+    return datetime.datetime.fromtimestamp(seconds) + datetime.timedelta(microseconds=micros)
+
+
+class ColumnarSwitchLog:
+    def __init__(self, log_dir, flush_every=1, flush_interval=None, fsync=False, read_only=False):
+        """
+        Binary switch log stored as one fixed-width file per column.
+
+        Timestamps are int64 epoch microseconds, durations int32 seconds and
+        app names are int32 ids into an interned dictionary (apps.txt), so the
+        files can be memory-mapped straight into NumPy/pandas.
+
+        Args:
+            log_dir: Directory holding the column files
+            flush_every: Flush the buffered writers after this many records
+            flush_interval: Also flush if this many seconds passed since the last flush (None = off)
+            fsync: Call os.fsync after every flush
+            read_only: Open a log another process (the tracker) writes to: columns
+                       are never truncated and the app dictionary never written.
+                       Reads see the rows that were complete when it was opened.
+        """
+        self.log_dir = log_dir
+        self.data_path = log_dir
+        self.flush_every = max(1, flush_every)
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.read_only = read_only
+        if not read_only:
+            os.makedirs(log_dir, exist_ok=True)
+
+        self.files = None
+        self.pending = 0
+        self.last_flush = time.monotonic()
+        self.lock = threading.RLock()
+
+        # Counted before the app dictionary loads: apps are written before any
+        # row uses them, so every counted row has its names
+        self.count = None
+        self.count = self.rows_on_disk() if read_only else self.repair()
+        self.apps = StringTable(os.path.join(log_dir, "apps.txt"), read_only=read_only)
+        self.next_id = self.read_column("id", self.count - 1, self.count)[0] + 1 if self.count else 1
+
+    def column_path(self, name):
+        return os.path.join(self.log_dir, f"{name}.{NUMPY_DTYPES[COLUMNS[name]][1:]}")
+
+    def repair(self):
+        """Truncate every column to the shortest one so a torn append never leaves ragged columns"""
+        counts = []
+        for name, typecode in COLUMNS.items():
+            path = self.column_path(name)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            counts.append(size // array.array(typecode).itemsize)
+        count = min(counts)
+        for name, typecode in COLUMNS.items():
+            path = self.column_path(name)
+            with open(path, 'ab') as f:
+                f.truncate(count * array.array(typecode).itemsize)
+        return count
+
+    def open(self):
+        if self.files is None:
+            self.files = {name: open(self.column_path(name), 'ab') for name in COLUMNS}
+
+    def append(self, when, app_from, app_to, duration):
+        """Append one switch and return it as a row shaped like the CSV log"""
+        if self.read_only:
+            raise ValueError(f"{self.log_dir} is open read-only")
+        with self.lock:
+            self.open()
+            values = {
+                "id": self.next_id,
+                "timestamp": to_epoch_us(when),
+                "app_from": self.apps.intern(app_from),
+                "app_to": self.apps.intern(app_to),
+                "duration": duration,
+            }
+            for name, typecode in COLUMNS.items():
+                self.files[name].write(struct.pack("<" + typecode, values[name]))
+            row = [self.next_id, when.isoformat(), app_from, app_to, duration]
+            self.next_id += 1
+            self.count += 1
+            self.pending += 1
+
+            if self.pending >= self.flush_every or (
+                    self.flush_interval is not None
+                    and time.monotonic() - self.last_flush >= self.flush_interval):
+                self.flush()
+            return row
+
+    def flush(self):
+        with self.lock:
+            if self.files is None:
+                return
+            for f in self.files.values():
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            self.pending = 0
+            self.last_flush = time.monotonic()
+
+    def close(self):
+        with self.lock:
+            if self.files is None:
+                return
+            self.flush()
+            for f in self.files.values():
+                f.close()
+            self.files = None
+
+    def rows_on_disk(self):
+        """Rows completely written to every column file (as of opening, when read-only)"""
+        if self.read_only and self.count is not None:
+            return self.count
+        counts = []
+        for name, typecode in COLUMNS.items():
+            path = self.column_path(name)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            counts.append(size // array.array(typecode).itemsize)
+        return min(counts)
+
+    def read_column(self, name, start, stop):
+        """Values of one column for rows [start, stop)"""
+        values = array.array(COLUMNS[name])
+        if stop <= start:
+            return values
+        with open(self.column_path(name), 'rb') as f:
+            f.seek(start * values.itemsize)
+            values.frombytes(f.read((stop - start) * values.itemsize))
+        if sys.byteorder != "little":
+            values.byteswap()
+        return values
+
+    def build_rows(self, start, stop):
+        columns = {name: self.read_column(name, start, stop) for name in COLUMNS}
+        lookup = self.apps.lookup
+        return [
+            [columns["id"][i], from_epoch_us(columns["timestamp"][i]).isoformat(),
+             lookup(columns["app_from"][i]), lookup(columns["app_to"][i]), columns["duration"][i]]
+            for i in range(len(columns["id"]))
+        ]
+
+    def read_since(self, offset=0, max_rows=100000):
+        """Rows after a row offset; returns (rows, new_offset) like read_rows_since"""
+        stop = min(self.rows_on_disk(), offset + max_rows)
+        return self.build_rows(offset, stop), max(offset, stop)
+
+    def bisect_time(self, epoch_us, count):
+        """First row index whose timestamp is greater than epoch_us (timestamps are append-ordered)"""
+        low, high = 0, count
+        with open(self.column_path("timestamp"), 'rb') as f:
+            while low < high:
+                mid = (low + high) // 2
+                f.seek(mid * 8)
+                if struct.unpack("<q", f.read(8))[0] <= epoch_us:
+                    low = mid + 1
+                else:
+                    high = mid
+        return low
+
+    def tail(self, cutoff, before=None):
+        """Rows with cutoff < timestamp <= before as (epoch, row), found by binary search"""
+        self.flush()
+        count = self.rows_on_disk()
+        start = self.bisect_time(int(cutoff * 1000000), count)
+        stop = count if before is None else self.bisect_time(int(before * 1000000), count)
+        stamps = self.read_column("timestamp", start, stop)
+        rows = self.build_rows(start, stop)
+        return [(stamp / 1000000, row) for stamp, row in zip(stamps, rows)]
+
+    def load(self):
+        """Memory-map every column as a read-only NumPy array (zero copy)"""
+        import numpy as np
+        count = self.rows_on_disk()
+        arrays = {}
+        for name, typecode in COLUMNS.items():
+            if count == 0:
+                arrays[name] = np.zeros(0, dtype=NUMPY_DTYPES[typecode])
+            else:
+                arrays[name] = np.memmap(self.column_path(name), dtype=NUMPY_DTYPES[typecode],
+                                         mode='r', shape=(count,))
+        return arrays
+
+    def to_dataframe(self):
+        """Load the log into pandas; app names become categoricals over the app dictionary"""
+        import pandas as pd
+        from dateutil.tz import tzlocal
+        arrays = self.load()
+        # Naive local time, as the CSV log stores it (tzlocal applies the offset
+        # in force at each timestamp, so rows on either side of a DST change agree)
+        timestamps = pd.to_datetime(arrays["timestamp"], unit="us", utc=True)
+        categories = pd.Index(self.apps.strings[:])
+        return pd.DataFrame({
+            "id": arrays["id"],
+            "timestamp": timestamps.tz_convert(tzlocal()).tz_localize(None),
+            "app_from": pd.Categorical.from_codes(arrays["app_from"], categories=categories),
+            "app_to": pd.Categorical.from_codes(arrays["app_to"], categories=categories),
+            "duration": arrays["duration"],
+        })
+
+
+def convert_to_columnar(src_path, log_dir, delimiter=','):
+    """
+    Copy an existing CSV/TSV switch log into the columnar format.
+    Ids, timestamps (to the microsecond), app names and durations are kept as-is.
+    """
+    log = ColumnarSwitchLog(log_dir, flush_every=10000)
+    if log.count:
+        raise ValueError(f"{log_dir} already contains {log.count} rows")
+    converted = 0
+    with open(src_path, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        next(reader, None)
+        for row in reader:
+            if len(row) < 5:
+                print(f"Skipping malformed row: {row}")
+                continue
+            log.next_id = int(row[0])
+            log.append(datetime.datetime.fromisoformat(row[1]), row[2], row[3], int(row[4] or 0))
+            converted += 1
+    log.close()
+    return converted
+
+
+def verify_conversion(src_path, log_dir, delimiter=','):
+    """Check that every row of the CSV/TSV log reads back identically from the columnar log"""
+    log = ColumnarSwitchLog(log_dir, read_only=True)
+    offset = 0
+    stored = []
+    with open(src_path, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        next(reader, None)
+        for row in reader:
+            if len(row) < 5:
+                continue
+            if not stored:
+                stored, offset = log.read_since(offset, max_rows=10000)
+                stored.reverse()
+            expected = [int(row[0]), datetime.datetime.fromisoformat(row[1]).isoformat(),
+                        row[2], row[3], int(row[4] or 0)]
+            actual = stored.pop() if stored else None
+            if actual != expected:
+                print(f"Mismatch: {actual} != {expected}")
+                return False
+    return not stored and offset == log.rows_on_disk()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a CSV/TSV switch log to the columnar format")
+    parser.add_argument("src", help="Existing task_tracker_data.csv or .tsv")
+    parser.add_argument("dst", help="Output directory, e.g. task_tracker_data.col")
+    parser.add_argument("--verify", action="store_true", help="Read everything back and compare")
+    args = parser.parse_args()
+
+    delimiter = '\t' if args.src.endswith('.tsv') else ','
+    converted = convert_to_columnar(args.src, args.dst, delimiter)
+    print(f"Converted {converted} rows into {args.dst}")
+    if args.verify:
+        print("Verified" if verify_conversion(args.src, args.dst, delimiter) else "Verification FAILED")
+
+
+if __name__ == "__main__":
+    main()
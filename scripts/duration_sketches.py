@@ -0,0 +1,278 @@
+import os
+import sys
+import json
+import argparse
+import datetime
+import threading
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from quantile_sketch import KllSketch
+from switch_log import read_rows_since
+
+
+def parse_day(value):
+    """A date, datetime or ISO string as a "YYYY-MM-DD" key (None stays None)"""
+    if value is None or isinstance(value, str):
+        return value[:10] if value else None
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    return value.isoformat()
+
+
+class DurationSketches:
+    def __init__(self, base_dir="~/task_switch", switch_log=None, retention_days=90, min_count=30,
+                 k=200, checkpoint_every=100, read_only=False):
+        """
+        Session duration quantile sketches per day and per app, merged on demand.
+
+        Each (day, app) cell is a KllSketch of the durations spent in that app
+        (the app switched away from) on that day. Any range of days and set of
+        apps is answered by merging cells; merges over finished days are cached
+        until one of them changes. Days more than retention_days before the
+        newest one are folded into one archive sketch per app, so memory is
+        bounded by retention_days x apps x roughly 3k values however long the
+        history is.
+
+        New rows are folded in as they appear in the switch log and checkpointed
+        with the log offset they cover, like HourOfWeekBaselines.
+
+        Args:
+            base_dir: Directory whose data/ holds duration_sketches.json
+                      (None keeps everything in memory, e.g. for replays)
+            switch_log: The tracker's switch log to read new rows from (any storage
+                        format). Defaults to reading task_tracker_data.csv directly.
+            retention_days: Days kept separately before folding into the archive
+            min_count: percentile returns None when fewer sessions than this match
+            k: Sketch accuracy (rank error about 1.7 / k)
+            checkpoint_every: Save the checkpoint after this many new rows
+            read_only: Load the tracker's checkpoint and catch up in memory, but
+                       never save it (for inspecting a running tracker)
+        """
+        self.switch_log = switch_log
+        self.read_only = read_only
+        self.checkpoint_path = None
+        self.source_path = switch_log.data_path if switch_log else None
+        if base_dir is not None:
+            data_dir = os.path.join(os.path.expanduser(base_dir), "data")
+            if not read_only:
+                os.makedirs(data_dir, exist_ok=True)
+            self.checkpoint_path = os.path.join(data_dir, "duration_sketches.json")
+            self.source_path = self.source_path or os.path.join(data_dir, "task_tracker_data.csv")
+        self.retention_days = retention_days
+        self.min_count = min_count
+        self.k = k
+        self.checkpoint_every = max(1, checkpoint_every)
+        self.lock = threading.RLock()
+        self.reset()
+        self.load_checkpoint()
+
+    def reset(self):
+        self.days = {}
+        self.latest = None
+        self.archive = {}
+        self.offset = 0
+        self.last_id = 0
+        self.since_checkpoint = 0
+        # Bumped whenever a finished day or the archive changes; keys the merge cache
+        self.generation = 0
+        self.cache = {}
+
+    def load_checkpoint(self):
+        if self.checkpoint_path is None:
+            return
+        try:
+            with open(self.checkpoint_path, 'r') as f:
+                state = json.load(f)
+            if state.get("source", self.source_path) != self.source_path:
+                print(f"Duration sketch checkpoint is for {state['source']}, rebuilding")
+                return
+            self.days = {day: {app: KllSketch.from_dict(sketch) for app, sketch in apps.items()}
+                         for day, apps in state["days"].items()}
+            self.archive = {app: KllSketch.from_dict(sketch) for app, sketch in state["archive"].items()}
+            self.latest = max(self.days) if self.days else None
+            self.offset = state["offset"]
+            self.last_id = state["last_id"]
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Ignoring unreadable duration sketch checkpoint {self.checkpoint_path}: {e}")
+            self.reset()
+
+    def save_checkpoint(self):
+        if self.checkpoint_path is None or self.read_only:
+            return
+        state = {
+            "source": self.source_path,
+            "offset": self.offset,
+            "last_id": self.last_id,
+            "days": {day: {app: sketch.to_dict() for app, sketch in apps.items()}
+                     for day, apps in self.days.items()},
+            "archive": {app: sketch.to_dict() for app, sketch in self.archive.items()},
+        }
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, separators=(',', ':'))
+        os.replace(tmp_path, self.checkpoint_path)
+        self.since_checkpoint = 0
+
+    def read_since(self, offset):
+        if self.switch_log is not None:
+            return self.switch_log.read_since(offset)
+        if self.source_path is None:
+            return [], offset
+        return read_rows_since(self.source_path, offset)
+
+    def update(self):
+        """Fold rows appended since the last call into their (day, app) sketches"""
+        with self.lock:
+            added = 0
+            while True:
+                rows, self.offset = self.read_since(self.offset)
+                if not rows:
+                    break
+                for row in rows:
+                    added += self.add(row)
+            self.since_checkpoint += added
+            if self.since_checkpoint >= self.checkpoint_every:
+                self.save_checkpoint()
+            return added
+
+    def add(self, row):
+        """Fold one row [id, timestamp, app_from, app_to, duration]; returns 1 if it was counted"""
+        try:
+            row_id = int(row[0])
+            day = row[1][:10]
+            duration = int(row[4])
+        except (ValueError, IndexError, TypeError):
+            return 0
+        with self.lock:
+            if row_id <= self.last_id:
+                return 0
+            self.last_id = row_id
+            app = row[2]
+            if app in (None, ""):
+                # First switch of a tracking session; no time was spent anywhere yet
+                return 0
+            if self.latest is not None and day != self.latest:
+                # Either a new day started (the previous one is now finished) or
+                # a late row landed in a finished day; both change cached merges
+                self.generation += 1
+            cells = self.days.setdefault(day, {})
+            sketch = cells.get(app)
+            if sketch is None:
+                sketch = cells[app] = KllSketch(self.k)
+            sketch.add(duration)
+            if self.latest is None or day > self.latest:
+                self.latest = day
+                self.expire(day)
+            return 1
+
+    def expire(self, newest):
+        """Fold days more than retention_days before newest into the per-app archive"""
+        if self.retention_days is None:
+            return
+        cutoff = (datetime.date.fromisoformat(newest) - datetime.timedelta(days=self.retention_days)).isoformat()
+        for day in [day for day in self.days if day < cutoff]:
+            for app, sketch in self.days.pop(day).items():
+                self.archive.setdefault(app, KllSketch(self.k)).merge(sketch)
+            self.generation += 1
+
+    def merge_cells(self, days, apps, include_archive):
+        merged = KllSketch(self.k)
+        for day in days:
+            for app, sketch in self.days[day].items():
+                if apps is None or app in apps:
+                    merged.merge(sketch)
+        if include_archive:
+            for app, sketch in self.archive.items():
+                if apps is None or app in apps:
+                    merged.merge(sketch)
+        return merged
+
+    def sketch(self, start=None, end=None, apps=None):
+        """
+        One sketch of the sessions from day start to day end inclusive (dates,
+        datetimes or ISO strings; None is unbounded) in the given apps (default
+        all). Archived days are only included when start is None.
+        """
+        start, end = parse_day(start), parse_day(end)
+        apps = frozenset(apps) if apps is not None else None
+        with self.lock:
+            self.update()
+            latest = self.latest
+            in_range = [day for day in self.days
+                        if (start is None or day >= start) and (end is None or day <= end)]
+            key = (start, end, apps, self.generation)
+            settled = self.cache.get(key)
+            if settled is None:
+                settled = self.merge_cells([day for day in in_range if day != latest], apps, start is None)
+                if len(self.cache) >= 16:
+                    self.cache.clear()
+                self.cache[key] = settled
+            # The newest day is still filling up; merge it fresh on top of a copy
+            merged = KllSketch(self.k).merge(settled)
+            if latest in in_range:
+                merged.merge(self.merge_cells([latest], apps, False))
+            return merged
+
+    def percentile(self, q, start=None, end=None, apps=None):
+        """Estimated q-quantile (0..1) of session durations, or None with fewer than min_count sessions"""
+        sketch = self.sketch(start, end, apps)
+        if sketch.count < max(1, self.min_count):
+            return None
+        return sketch.quantile(q)
+
+    def table(self, start=None, end=None, quantiles=(0.25, 0.5, 0.9)):
+        """(app, sessions, [quantile values]) per app, most sessions first"""
+        with self.lock:
+            self.update()
+            apps = set(self.archive) if start is None else set()
+            for cells in self.days.values():
+                apps.update(cells)
+        rows = []
+        for app in apps:
+            sketch = self.sketch(start, end, [app])
+            if sketch.count:
+                rows.append((app, sketch.count, sketch.quantiles(quantiles)))
+        rows.sort(key=lambda row: -row[1])
+        return rows
+
+    def close(self):
+        with self.lock:
+            self.update()
+            self.save_checkpoint()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Session duration percentiles per app")
+    parser.add_argument("--base-dir", default="~/task_switch")
+    parser.add_argument("--days", type=int, default=None, help="Only the last N days (default: all history)")
+    parser.add_argument("--app", action="append", help="Limit to these apps (repeatable)")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--log", help="Switch log the tracker writes (default: the one for --storage under --base-dir)")
+    parser.add_argument("--storage", default="text", choices=["text", "columnar", "partitioned", "sqlite"])
+    parser.add_argument("--tsv", action="store_true", help="The text log is TSV")
+    args = parser.parse_args()
+
+    from report import log_path, open_log
+    path = os.path.expanduser(args.log) if args.log else log_path(args.base_dir, args.storage, args.tsv)
+    if not os.path.exists(path):
+        print(f"No switch log at {path}")
+        return
+    # Starts from the tracker's checkpoint for this log and never overwrites it
+    sketches = DurationSketches(args.base_dir, switch_log=open_log(path), read_only=True)
+    start = None
+    if args.days:
+        start = datetime.date.today() - datetime.timedelta(days=args.days - 1)
+    print(f"{'App':<30} {'Sessions':>9} {'p25':>7} {'p50':>7} {'p90':>7}")
+    rows = [row for row in sketches.table(start) if not args.app or row[0] in args.app]
+    for app, count, (p25, p50, p90) in rows[:args.limit]:
+        print(f"{app[:30]:<30} {count:>9} {p25:>6}s {p50:>6}s {p90:>6}s")
+    overall = sketches.sketch(start, apps=args.app)
+    if overall.count:
+        p25, p50, p90 = overall.quantiles([0.25, 0.5, 0.9])
+        print(f"{'All':<30} {overall.count:>9} {p25:>6}s {p50:>6}s {p90:>6}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+import os
+import json
+import time
+import zlib
+import threading
+from switch_log import CsvSwitchLog
+import metrics
+
+
+class SwitchJournal:
+    def __init__(self, path, fsync=True):
+        """
+        Write-ahead journal of switch rows: one "<crc32 hex> <json row>" line per
+        record, so a torn or corrupted record is detected on recovery.
+        """
+        self.path = path
+        self.fsync = fsync
+        self.file = None
+        self.open()
+
+    def open(self):
+        """Open the journal for appending (again after close)"""
+        if self.file is None:
+            self.file = open(self.path, 'ab')
+
+    @staticmethod
+    def encode(row):
+        payload = json.dumps(row, separators=(',', ':')).encode('utf-8')
+        return b"%08x %s\n" % (zlib.crc32(payload), payload)
+
+    def append(self, rows):
+        """Write a group of rows and make them durable with one flush (and fsync)"""
+        self.open()
+        self.file.write(b"".join(self.encode(row) for row in rows))
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+
+    def clear(self):
+        """Drop every record once they are safely in the main log"""
+        self.open()
+        self.file.truncate(0)
+        self.file.seek(0)
+
+    def recover(self):
+        """
+        Records that passed their checksum, in order, stopping at the first bad
+        one; the journal is truncated to drop it. Returns (rows, bytes truncated).
+        """
+        rows = []
+        valid = 0
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        for line in data.split(b'\n')[:-1]:
+            checksum, _, payload = line.partition(b' ')
+            try:
+                if int(checksum, 16) != zlib.crc32(payload):
+                    break
+                rows.append(json.loads(payload))
+            except ValueError:
+                break
+            valid += len(line) + 1
+        if valid < len(data):
+            self.open()
+            self.file.truncate(valid)
+        return rows, len(data) - valid
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class JournaledSwitchLog(CsvSwitchLog):
+    def __init__(self, data_path, delimiter=',', group_size=32, group_ms=200, fsync=True,
+                 checkpoint_every=100):
+        """
+        CSV/TSV switch log with group commit through a checksummed journal.
+
+        Appends are collected in memory and committed as a group once group_size
+        rows are waiting or the oldest has waited group_ms milliseconds. A commit
+        writes the group to the journal (one fsync), then to the CSV (one fsync),
+        then clears the journal. On startup a torn CSV row is truncated and
+        journal records the CSV is missing are replayed, so the CSV only ever
+        gains whole groups.
+
+        Args:
+            group_size: Commit once this many rows are waiting
+            group_ms: Commit once the oldest waiting row is this many milliseconds old
+            fsync: fsync the journal and the CSV on every commit
+        """
+        self.journal_path = data_path + ".journal"
+        self.group_size = max(1, group_size)
+        self.group_ms = group_ms
+        self.group = []
+        self.group_started = None
+        self.commits = 0
+        self.committed_rows = 0
+        self.commit_total = 0.0
+        self.commit_max = 0.0
+        self.commit_histogram = metrics.REGISTRY.histogram(
+            "task_switch_journal_commit_seconds", "Duration of a journal group commit in seconds")
+
+        started = time.perf_counter()
+        super().__init__(data_path, delimiter, flush_every=1, fsync=fsync,
+                         checkpoint_every=checkpoint_every)
+        self.journal = SwitchJournal(self.journal_path, fsync)
+        self.recovery = self.replay_journal()
+        self.recovery["seconds"] = time.perf_counter() - started
+        metrics.REGISTRY.gauge("task_switch_journal_recovery_seconds",
+                               "Time spent recovering the switch log on startup").set(self.recovery["seconds"])
+        if self.recovery["replayed"] or self.recovery["journal_truncated_bytes"]:
+            print(f"Switch log recovery: {self.recovery}")
+
+        self.condition = threading.Condition(self.lock)
+        self.closing = False
+        self.committer = None
+        self.start_committer()
+
+    def start_committer(self):
+        """Start the thread that commits partial groups (again after close)"""
+        with self.lock:
+            if self.committer is not None and self.committer.is_alive() and not self.closing:
+                return
+            self.closing = False
+            self.committer = threading.Thread(target=self.commit_loop, name="journal-commit", daemon=True)
+            self.committer.start()
+
+    def replay_journal(self):
+        """Append journal records the CSV does not have yet (by id), then clear the journal"""
+        rows, truncated = self.journal.recover()
+        missing = []
+        for row in rows:
+            # A retried commit can leave the same row in the journal twice
+            if int(row[0]) >= self.next_id:
+                missing.append(row)
+                self.next_id = int(row[0]) + 1
+        if missing:
+            self.open()
+            for row in missing:
+                self.writer.writerow(row)
+            CsvSwitchLog.flush(self)
+            self.write_counter(self.next_id, self.offset)
+        self.journal.clear()
+        return {"replayed": len(missing), "journal_records": len(rows), "journal_truncated_bytes": truncated}
+
+    def append(self, when, app_from, app_to, duration):
+        """Queue one switch for the next group commit and return its row"""
+        with self.lock:
+            if self.closing:
+                # Appending after close (e.g. tracking restarted); the files reopen on commit
+                self.start_committer()
+            row = [self.next_id, when.isoformat(), app_from, app_to, duration]
+            self.next_id += 1
+            self.group.append(row)
+            if self.group_started is None:
+                self.group_started = time.monotonic()
+                self.condition.notify()
+            if len(self.group) >= self.group_size:
+                try:
+                    self.commit()
+                except OSError as e:
+                    # The row is queued either way; the committer retries the group
+                    print(f"Error committing switch group: {e}")
+            return row
+
+    def commit(self):
+        """Make the waiting group durable: journal first, then the CSV"""
+        with self.lock:
+            if not self.group:
+                return
+            started = time.perf_counter()
+            rows = self.group
+            self.journal.append(rows)
+            self.open()
+            for row in rows:
+                self.writer.writerow(row)
+            self.since_checkpoint += len(rows)
+            CsvSwitchLog.flush(self)
+            # Only dropped from memory once both writes succeeded; a failed commit
+            # is retried with the same rows (replay skips journal duplicates by id)
+            self.group, self.group_started = [], None
+            self.journal.clear()
+
+            elapsed = time.perf_counter() - started
+            self.commits += 1
+            self.committed_rows += len(rows)
+            self.commit_total += elapsed
+            self.commit_max = max(self.commit_max, elapsed)
+            self.commit_histogram.observe(elapsed)
+
+    def commit_loop(self):
+        """Commit a partial group once its oldest row has waited group_ms"""
+        with self.condition:
+            while not self.closing:
+                if self.group_started is None:
+                    self.condition.wait()
+                    continue
+                remaining = self.group_started + self.group_ms / 1000 - time.monotonic()
+                if remaining > 0:
+                    self.condition.wait(remaining)
+                    continue
+                try:
+                    self.commit()
+                except OSError as e:
+                    # The group stays queued; try again after another group_ms
+                    print(f"Error committing switch group: {e}")
+                    self.group_started = time.monotonic()
+
+    def flush(self):
+        """Commit whatever is waiting now"""
+        self.commit()
+
+    def close(self):
+        with self.lock:
+            self.commit()
+            self.closing = True
+            self.condition.notify()
+        self.committer.join(1.0)
+        with self.lock:
+            CsvSwitchLog.close(self)
+            self.journal.close()
+
+    def report(self):
+        """Group commit latency and the startup recovery summary"""
+        return {
+            "commits": self.commits,
+            "rows": self.committed_rows,
+            "mean_group": self.committed_rows / self.commits if self.commits else 0.0,
+            "mean_commit_ms": self.commit_total / self.commits * 1000 if self.commits else 0.0,
+            "max_commit_ms": self.commit_max * 1000,
+            "recovery": self.recovery,
+        }
@@ -1,18 +1,10 @@
-import time
-import datetime
 import subprocess
-import os
-import threading
-import csv
-import pystray
-from pystray import MenuItem as item
-from PIL import Image, ImageDraw
-import pandas as pd
-import sys
+import metrics
 
 class LaunchFlow:
     def __init__(self):
         pass
+    @metrics.timed("launch_flow_app")
     def launch_flow_app(self):
         """Launch the Flow app"""
         try:
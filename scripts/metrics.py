@@ -0,0 +1,251 @@
+import os
+import sys
+import time
+import atexit
+import threading
+import subprocess
+from bisect import bisect_left
+from functools import wraps
+
+# Without /proc or psutil the resident size comes from spawning ps; reuse it this many seconds
+RSS_CACHE_SECONDS = 30.0
+_rss_cache = [None, -RSS_CACHE_SECONDS]
+
+# Seconds; covers a sub-millisecond buffered write up to a multi-second osascript stall
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def samples(self, name, labels):
+        return [(name, labels, self.value)]
+
+
+class Gauge:
+    def __init__(self, callback=None):
+        """A value that is set, or read from callback at scrape time"""
+        self.value = 0
+        self.callback = callback
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self, name, labels):
+        value = self.callback() if self.callback else self.value
+        return [] if value is None else [(name, labels, value)]
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """Cumulative-bucket histogram; observe() is a bisect and three additions"""
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def samples(self, name, labels):
+        with self.lock:
+            counts = list(self.counts)
+            total, count = self.sum, self.count
+        samples = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.bounds + (float("inf"),), counts):
+            cumulative += bucket_count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            samples.append((name + "_bucket", labels + (("le", le),), cumulative))
+        samples.append((name + "_sum", labels, total))
+        samples.append((name + "_count", labels, count))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        """Named metric families, each with one child per label set"""
+        self.families = {}
+        self.lock = threading.Lock()
+
+    def get(self, kind, name, help_text, labels, factory):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            family = self.families.get(name)
+            if family is None:
+                family = self.families[name] = {"type": kind, "help": help_text, "children": {}}
+            child = family["children"].get(key)
+            if child is None:
+                child = family["children"][key] = factory()
+            return child
+
+    def counter(self, name, help_text="", **labels):
+        return self.get("counter", name, help_text, labels, Counter)
+
+    def gauge(self, name, help_text="", callback=None, **labels):
+        """The gauge for these labels; a callback replaces any earlier one, so the newest owner is reported"""
+        gauge = self.get("gauge", name, help_text, labels, lambda: Gauge(callback))
+        if callback is not None:
+            gauge.callback = callback
+        return gauge
+
+    def histogram(self, name, help_text="", buckets=DEFAULT_BUCKETS, **labels):
+        return self.get("histogram", name, help_text, labels, lambda: Histogram(buckets))
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format"""
+        lines = []
+        with self.lock:
+            families = [(name, dict(family), dict(family["children"]))
+                        for name, family in sorted(self.families.items())]
+        for name, family, children in families:
+            if family["help"]:
+                lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {family['type']}")
+            for labels, child in sorted(children.items()):
+                for sample_name, sample_labels, value in child.samples(name, labels):
+                    lines.append(f"{sample_name}{format_labels(sample_labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def observe(name, seconds, **labels):
+    REGISTRY.histogram(f"task_switch_{name}_seconds", f"Duration of {name} in seconds", **labels).observe(seconds)
+
+
+def timed(name, **labels):
+    """Decorator recording each call's duration in the task_switch_<name>_seconds histogram"""
+    histogram = REGISTRY.histogram(f"task_switch_{name}_seconds", f"Duration of {name} in seconds", **labels)
+
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def rss_bytes():
+    """Current resident set size of this process, or None if it cannot be read"""
+    try:
+        with open("/proc/self/statm", 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    # macOS without psutil: spawning ps on every scrape costs more than it
+    # measures, so the value is refreshed at most every RSS_CACHE_SECONDS
+    now = time.monotonic()
+    if now - _rss_cache[1] < RSS_CACHE_SECONDS:
+        return _rss_cache[0]
+    try:
+        # ps reports kilobytes
+        out = subprocess.run(["ps", "-o", "rss=", "-p", str(os.getpid())],
+                             capture_output=True, text=True, timeout=2).stdout
+        value = int(out.strip()) * 1024
+    except (OSError, ValueError, subprocess.SubprocessError):
+        value = None
+    _rss_cache[:] = [value, now]
+    return value
+
+
+def max_rss_bytes():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+REGISTRY.gauge("process_resident_memory_bytes", "Resident memory size in bytes", callback=rss_bytes)
+REGISTRY.gauge("process_max_resident_memory_bytes", "Peak resident memory size in bytes", callback=max_rss_bytes)
+
+
+def metrics_handler():
+    # http.server costs tens of milliseconds to import; only pay that when serving
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = REGISTRY.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Scrapes every few seconds would flood the console
+            pass
+
+    return MetricsHandler
+
+
+class MetricsServer:
+    def __init__(self, port=9464, host="127.0.0.1"):
+        """Serves /metrics in Prometheus text format on a daemon thread (localhost only by default)"""
+        from http.server import ThreadingHTTPServer
+        self.server = ThreadingHTTPServer((host, port), metrics_handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics", daemon=True)
+        self.thread.start()
+        print(f"Metrics at http://{host}:{self.server.server_address[1]}/metrics")
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def start_server(port=9464, host="127.0.0.1"):
+    """A MetricsServer, or None (tracking carries on without it) when the port cannot be bound"""
+    try:
+        return MetricsServer(port, host)
+    except OSError as e:
+        print(f"Not serving metrics on {host}:{port}: {e}")
+        return None
+
+
+def dump(path):
+    """Write the current metrics to path in Prometheus text format"""
+    path = os.path.expanduser(path)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(REGISTRY.render())
+    os.replace(tmp_path, path)
+
+
+def dump_on_exit(path="~/task_switch/metrics.prom"):
+    atexit.register(dump, path)
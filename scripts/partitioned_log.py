@@ -0,0 +1,372 @@
+import os
+import csv
+import json
+import time
+import argparse
+import datetime
+import threading
+from switch_log import HEADER, read_rows_since, read_tail
+
+# Partition key formats; all of them sort chronologically as strings
+PERIODS = {
+    "hour": "%Y-%m-%dT%H",
+    "day": "%Y-%m-%d",
+    "week": "%G-W%V",
+    "month": "%Y-%m",
+}
+
+
+def empty_entry(name):
+    return {
+        "file": f"{name}.csv",
+        "start": None,
+        "end": None,
+        "rows": 0,
+        "bytes": 0,
+        "first_id": None,
+        "last_id": None,
+        "duration_sum": 0,
+        "duration_sumsq": 0,
+        "duration_min": None,
+        "duration_max": None,
+    }
+
+
+def add_to_entry(entry, row_id, epoch, duration):
+    """Fold one row into a partition's manifest entry"""
+    entry["start"] = epoch if entry["start"] is None else min(entry["start"], epoch)
+    entry["end"] = epoch if entry["end"] is None else max(entry["end"], epoch)
+    entry["rows"] += 1
+    entry["first_id"] = row_id if entry["first_id"] is None else entry["first_id"]
+    entry["last_id"] = row_id
+    entry["duration_sum"] += duration
+    entry["duration_sumsq"] += duration * duration
+    entry["duration_min"] = duration if entry["duration_min"] is None else min(entry["duration_min"], duration)
+    entry["duration_max"] = duration if entry["duration_max"] is None else max(entry["duration_max"], duration)
+
+
+def parse_row(row):
+    """(id, epoch, duration) for a CSV row, or None if it is malformed"""
+    try:
+        return int(row[0]), datetime.datetime.fromisoformat(row[1]).timestamp(), int(row[4] or 0)
+    except (ValueError, IndexError):
+        return None
+
+
+class PartitionedSwitchLog:
+    def __init__(self, log_dir, period="day", delimiter=',', flush_every=1, flush_interval=None,
+                 fsync=False, manifest_every=50, read_only=False):
+        """
+        Switch log split into one CSV/TSV file per period, plus a manifest.
+
+        The manifest (manifest.json) records each partition's time range, row
+        count and duration aggregates, so range queries open only the
+        partitions that overlap the range, and whole-partition statistics come
+        straight from the manifest.
+
+        Args:
+            log_dir: Directory holding the partitions and manifest
+            period: "hour", "day", "week" or "month"
+            flush_every: Flush the buffered writer after this many records
+            flush_interval: Also flush if this many seconds passed since the last flush (None = off)
+            fsync: Call os.fsync after every flush
+            manifest_every: Persist the manifest after this many records (it is
+                            also written on partition roll-over and close, and
+                            repaired from the files on startup)
+            read_only: Open a log another process (the tracker) writes to: the
+                       manifest is brought up to date in memory but never saved
+        """
+        if period not in PERIODS:
+            raise ValueError(f"Unknown partition period: {period}")
+        self.log_dir = log_dir
+        self.data_path = log_dir
+        self.period = period
+        self.delimiter = delimiter
+        self.extension = 'tsv' if delimiter == '\t' else 'csv'
+        self.manifest_path = os.path.join(log_dir, "manifest.json")
+        self.flush_every = max(1, flush_every)
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.manifest_every = max(1, manifest_every)
+        self.read_only = read_only
+        if not read_only:
+            os.makedirs(log_dir, exist_ok=True)
+
+        self.file = None
+        self.writer = None
+        self.active = None
+        self.pending = 0
+        self.since_manifest = 0
+        self.last_flush = time.monotonic()
+        self.lock = threading.RLock()
+
+        self.partitions = {}
+        self.load_manifest()
+        self.reconcile()
+        self.next_id = max((e["last_id"] for e in self.partitions.values() if e["last_id"]), default=0) + 1
+
+    def partition_name(self, when):
+        return when.strftime(PERIODS[self.period])
+
+    def partition_path(self, name):
+        return os.path.join(self.log_dir, self.partitions[name]["file"])
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return
+        if self.read_only:
+            # Readers take the layout from the manifest instead of the defaults
+            self.period = manifest.get("period", self.period)
+            if any(entry["file"].endswith(".tsv") for entry in manifest["partitions"].values()):
+                self.delimiter, self.extension = '\t', 'tsv'
+        if manifest.get("period", self.period) != self.period:
+            raise ValueError(f"{self.log_dir} is partitioned by {manifest['period']}, not {self.period}")
+        self.partitions = manifest["partitions"]
+
+    def save_manifest(self):
+        if self.read_only:
+            return
+        manifest = {"period": self.period, "partitions": self.partitions}
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+        self.since_manifest = 0
+
+    def reconcile(self):
+        """Bring the manifest up to date with rows written after it was last saved"""
+        if not os.path.isdir(self.log_dir):
+            # A reader opened a log that has not been written yet: nothing to reconcile
+            return
+        changed = False
+        suffix = "." + self.extension
+        for file_name in os.listdir(self.log_dir):
+            name = file_name[:-len(suffix)]
+            if file_name.endswith(suffix) and name not in self.partitions:
+                entry = empty_entry(name)
+                entry["file"] = file_name
+                self.partitions[name] = entry
+                changed = True
+        for name, entry in self.partitions.items():
+            path = self.partition_path(name)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            if size < entry["bytes"]:
+                # File shrank under us; rebuild this partition's entry from scratch
+                file_name = entry["file"]
+                entry.clear()
+                entry.update(empty_entry(name))
+                entry["file"] = file_name
+            if size != entry["bytes"]:
+                self.fold_rows_since(name)
+                changed = True
+        if changed:
+            self.save_manifest()
+
+    def fold_rows_since(self, name):
+        entry = self.partitions[name]
+        path = self.partition_path(name)
+        while True:
+            rows, offset = read_rows_since(path, entry["bytes"], self.delimiter)
+            if not rows:
+                break
+            for row in rows:
+                parsed = parse_row(row)
+                if parsed is not None:
+                    add_to_entry(entry, *parsed)
+            entry["bytes"] = offset
+
+    def open(self, name):
+        """Switch the writer to partition `name`, creating it with a header if needed"""
+        if self.active == name and self.file is not None:
+            return
+        self.close_file()
+        if name not in self.partitions:
+            entry = empty_entry(name)
+            entry["file"] = f"{name}.{self.extension}"
+            self.partitions[name] = entry
+        path = self.partition_path(name)
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, 'a', newline='')
+        self.writer = csv.writer(self.file, delimiter=self.delimiter)
+        if new_file:
+            self.writer.writerow(HEADER)
+        self.active = name
+
+    def append(self, when, app_from, app_to, duration):
+        """Append one switch to the partition its timestamp falls in"""
+        if self.read_only:
+            raise ValueError(f"{self.log_dir} is open read-only")
+        with self.lock:
+            name = self.partition_name(when)
+            rolled = name != self.active
+            self.open(name)
+            row = [self.next_id, when.isoformat(), app_from, app_to, duration]
+            self.writer.writerow(row)
+            add_to_entry(self.partitions[name], self.next_id, when.timestamp(), duration)
+            self.next_id += 1
+            self.pending += 1
+            self.since_manifest += 1
+
+            if rolled or self.pending >= self.flush_every or (
+                    self.flush_interval is not None
+                    and time.monotonic() - self.last_flush >= self.flush_interval):
+                self.flush(save_manifest=rolled)
+            return row
+
+    def flush(self, save_manifest=False):
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.flush()
+            if self.fsync:
+                os.fsync(self.file.fileno())
+            self.partitions[self.active]["bytes"] = self.file.tell()
+            self.pending = 0
+            self.last_flush = time.monotonic()
+            if save_manifest or self.since_manifest >= self.manifest_every:
+                self.save_manifest()
+
+    def close_file(self):
+        if self.file is not None:
+            self.flush(save_manifest=True)
+            self.file.close()
+            self.file = None
+            self.writer = None
+
+    def close(self):
+        with self.lock:
+            self.close_file()
+            self.active = None
+
+    def overlapping(self, start=None, end=None):
+        """Partition names whose time range overlaps (start, end], in time order"""
+        names = []
+        for name in sorted(self.partitions):
+            entry = self.partitions[name]
+            if entry["rows"] == 0:
+                continue
+            if start is not None and entry["end"] <= start:
+                continue
+            if end is not None and entry["start"] > end:
+                continue
+            names.append(name)
+        return names
+
+    def tail(self, cutoff, before=None):
+        """Rows with cutoff < timestamp <= before as (epoch, row), oldest first"""
+        self.flush()
+        rows = []
+        for name in self.overlapping(cutoff, before):
+            rows.extend(read_tail(self.partition_path(name), cutoff, before, self.delimiter))
+        return rows
+
+    def rows_between(self, start=None, end=None):
+        """Yield (epoch, row) with start < timestamp <= end, reading only overlapping partitions"""
+        self.flush()
+        for name in self.overlapping(start, end):
+            with open(self.partition_path(name), 'r', newline='') as f:
+                reader = csv.reader(f, delimiter=self.delimiter)
+                next(reader, None)
+                for row in reader:
+                    parsed = parse_row(row)
+                    if parsed is None:
+                        continue
+                    epoch = parsed[1]
+                    if (start is None or epoch > start) and (end is None or epoch <= end):
+                        yield epoch, row
+
+    def read_since(self, cursor=0):
+        """
+        Rows after a cursor, across partitions; returns (rows, new_cursor).
+        The cursor is [partition name, byte offset] (0 means the beginning).
+        """
+        self.flush()
+        names = sorted(self.partitions)
+        if not names:
+            return [], cursor
+        if not cursor:
+            cursor = [names[0], 0]
+        name, offset = cursor
+        while True:
+            rows, new_offset = read_rows_since(self.partition_path(name), offset, self.delimiter)
+            if rows:
+                return rows, [name, new_offset]
+            later = [n for n in names if n > name]
+            if not later:
+                return [], [name, offset]
+            name, offset = later[0], 0
+
+    def aggregate(self, start=None, end=None):
+        """
+        Duration count/sum/sum of squares/min/max for (start, end].
+        Partitions fully inside the range come from the manifest; only the
+        partitions cut by the range edges are scanned.
+        """
+        self.flush()
+        totals = {"count": 0, "sum": 0, "sumsq": 0, "min": None, "max": None}
+
+        def fold(count, total, sumsq, low, high):
+            totals["count"] += count
+            totals["sum"] += total
+            totals["sumsq"] += sumsq
+            if low is not None:
+                totals["min"] = low if totals["min"] is None else min(totals["min"], low)
+                totals["max"] = high if totals["max"] is None else max(totals["max"], high)
+
+        for name in self.overlapping(start, end):
+            entry = self.partitions[name]
+            inside = (start is None or entry["start"] > start) and (end is None or entry["end"] <= end)
+            if inside:
+                fold(entry["rows"], entry["duration_sum"], entry["duration_sumsq"],
+                     entry["duration_min"], entry["duration_max"])
+                continue
+            with open(self.partition_path(name), 'r', newline='') as f:
+                reader = csv.reader(f, delimiter=self.delimiter)
+                next(reader, None)
+                for row in reader:
+                    parsed = parse_row(row)
+                    if parsed is None:
+                        continue
+                    _, epoch, duration = parsed
+                    if (start is None or epoch > start) and (end is None or epoch <= end):
+                        fold(1, duration, duration * duration, duration, duration)
+        return totals
+
+
+def migrate_monolithic(src_path, log_dir, period="day", delimiter=','):
+    """Split an existing single-file CSV/TSV log into partitions, keeping ids and rows as-is"""
+    log = PartitionedSwitchLog(log_dir, period, delimiter, flush_every=10000, manifest_every=100000)
+    if log.partitions:
+        raise ValueError(f"{log_dir} already contains partitions")
+    migrated = 0
+    with open(src_path, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        next(reader, None)
+        for row in reader:
+            if parse_row(row) is None:
+                print(f"Skipping malformed row: {row}")
+                continue
+            log.next_id = int(row[0])
+            log.append(datetime.datetime.fromisoformat(row[1]), row[2], row[3], int(row[4] or 0))
+            migrated += 1
+    log.close()
+    return migrated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Split a monolithic switch log into time partitions")
+    parser.add_argument("src", help="Existing task_tracker_data.csv or .tsv")
+    parser.add_argument("dst", help="Output directory, e.g. ~/task_switch/data/task_tracker_data")
+    parser.add_argument("--period", default="day", choices=sorted(PERIODS))
+    args = parser.parse_args()
+
+    delimiter = '\t' if args.src.endswith('.tsv') else ','
+    migrated = migrate_monolithic(args.src, os.path.expanduser(args.dst), args.period, delimiter)
+    print(f"Migrated {migrated} rows into {args.dst}")
+
+
+if __name__ == "__main__":
+    main()
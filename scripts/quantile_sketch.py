@@ -0,0 +1,145 @@
+import math
+import random
+
+# Smallest level capacity (the value DataSketches uses)
+MIN_WIDTH = 8
+
+
+class KllSketch:
+    def __init__(self, k=200, seed=None):
+        """
+        KLL quantile sketch (Karnin, Lang & Liberty).
+
+        Values go into a stack of compactors; level h holds items that each
+        stand for 2**h values. When the sketch is full, a level over its
+        capacity is sorted and every other item is promoted to the next level,
+        so memory stays around 3k items however many values are added. Two
+        sketches merge by concatenating their levels and compacting again.
+        Rank error is roughly 1.7 / k of the count (about 1% for k=200).
+
+        Args:
+            k: Capacity of the top level; higher is more accurate and larger
+            seed: Seed for the coin flips that pick which half is promoted
+        """
+        self.k = k
+        self.levels = [[]]
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.random = random.Random(seed)
+        self.size = 0
+        self.max_size = self.total_capacity()
+
+    def capacity(self, level):
+        """
+        Capacities shrink by 2/3 per level below the top one, down to MIN_WIDTH
+        so the low levels do not trigger a compaction every couple of adds
+        """
+        depth = len(self.levels) - level - 1
+        return max(MIN_WIDTH, int(math.ceil(self.k * (2 / 3) ** depth)) + 1)
+
+    def total_capacity(self):
+        return sum(self.capacity(level) for level in range(len(self.levels)))
+
+    def add(self, x):
+        """Add one value"""
+        self.levels[0].append(x)
+        self.count += 1
+        self.size += 1
+        if self.min is None or x < self.min:
+            self.min = x
+        if self.max is None or x > self.max:
+            self.max = x
+        if self.size >= self.max_size:
+            self.compress()
+
+    def compress(self):
+        """Compact levels from the bottom until the sketch is under its capacity again"""
+        for level in range(len(self.levels)):
+            items = self.levels[level]
+            if len(items) < self.capacity(level):
+                continue
+            if level + 1 == len(self.levels):
+                self.levels.append([])
+                self.max_size = self.total_capacity()
+            items.sort()
+            # An odd item out stays behind at its own weight
+            kept = [items.pop()] if len(items) % 2 else []
+            promoted = items[self.random.getrandbits(1)::2]
+            self.levels[level + 1].extend(promoted)
+            self.levels[level] = kept
+            self.size -= len(items) - len(promoted)
+            if self.size < self.max_size:
+                break
+
+    def merge(self, other):
+        """Fold another sketch in; the result summarizes both inputs"""
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for level, items in enumerate(other.levels):
+            self.levels[level].extend(items)
+        self.count += other.count
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+        self.max_size = self.total_capacity()
+        self.size = sum(len(items) for items in self.levels)
+        while self.size >= self.max_size:
+            self.compress()
+        return self
+
+    def weighted(self):
+        """(value, weight) pairs in value order"""
+        return sorted((x, 1 << level) for level, items in enumerate(self.levels) for x in items)
+
+    def quantiles(self, qs):
+        """Estimates for several quantiles (0..1) with one sort"""
+        if not self.count:
+            return [None for _ in qs]
+        items = self.weighted()
+        total = sum(weight for _, weight in items)
+        results = []
+        for q in qs:
+            if q <= 0:
+                results.append(self.min)
+                continue
+            if q >= 1:
+                results.append(self.max)
+                continue
+            target = q * total
+            cumulative = 0
+            value = self.max
+            for x, weight in items:
+                cumulative += weight
+                if cumulative >= target:
+                    value = x
+                    break
+            results.append(value)
+        return results
+
+    def quantile(self, q):
+        """Estimated value below which a fraction q of the values fall"""
+        return self.quantiles([q])[0]
+
+    def rank(self, x):
+        """Estimated fraction of values <= x"""
+        if not self.count:
+            return None
+        items = self.weighted()
+        total = sum(weight for _, weight in items)
+        return sum(weight for value, weight in items if value <= x) / total
+
+    def to_dict(self):
+        return {"k": self.k, "count": self.count, "min": self.min, "max": self.max, "levels": self.levels}
+
+    @classmethod
+    def from_dict(cls, state):
+        sketch = cls(state["k"])
+        sketch.levels = [list(items) for items in state["levels"]] or [[]]
+        sketch.count = state["count"]
+        sketch.min = state["min"]
+        sketch.max = state["max"]
+        sketch.size = sum(len(items) for items in sketch.levels)
+        sketch.max_size = sketch.total_capacity()
+        return sketch
@@ -0,0 +1,84 @@
+import time
+import threading
+from bisect import bisect_right
+
+
+class RecentSwitchBuffer:
+    def __init__(self, retention_minutes=10, loader=None):
+        """
+        Time-indexed buffer of the most recent switches.
+
+        Args:
+            retention_minutes: How much history to keep in memory; grows if a
+                               longer window is ever asked for
+            loader: Callable (cutoff, before) -> [(epoch, row), ...] that reads
+                    rows with cutoff < epoch <= before from disk, oldest first
+        """
+        self.retention = retention_minutes * 60
+        self.loader = loader
+        # Parallel lists sorted by time so windows can be found with bisect
+        self.times = []
+        self.rows = []
+        # Everything recorded after this epoch is in the buffer
+        self.covered_since = time.time()
+        self.lock = threading.Lock()
+
+    def load(self, now=None):
+        """Cold start: pull only the tail of the log that falls inside the retention window"""
+        now = time.time() if now is None else now
+        cutoff = now - self.retention
+        with self.lock:
+            if self.loader is not None:
+                loaded = self.loader(cutoff, now)
+                self.times = [t for t, _ in loaded] + self.times
+                self.rows = [row for _, row in loaded] + self.rows
+            self.covered_since = cutoff
+
+    def add(self, row, epoch):
+        """Add a freshly recorded switch"""
+        row = [str(v) for v in row]
+        with self.lock:
+            if self.times and epoch < self.times[-1]:
+                # Clock went backwards; keep the list sorted anyway
+                i = bisect_right(self.times, epoch)
+                self.times.insert(i, epoch)
+                self.rows.insert(i, row)
+            else:
+                self.times.append(epoch)
+                self.rows.append(row)
+            self.evict(epoch - self.retention)
+
+    def evict(self, cutoff):
+        i = bisect_right(self.times, cutoff)
+        if i:
+            del self.times[:i]
+            del self.rows[:i]
+        self.covered_since = max(self.covered_since, cutoff)
+
+    def extend_back(self, cutoff):
+        """Load rows older than what the buffer currently covers"""
+        if self.loader is None:
+            return
+        loaded = self.loader(cutoff, self.covered_since)
+        self.times = [t for t, _ in loaded] + self.times
+        self.rows = [row for _, row in loaded] + self.rows
+        self.covered_since = cutoff
+
+    def window_entries(self, minutes=1, now=None):
+        """(times, rows) recorded in the last X minutes, oldest first"""
+        now = time.time() if now is None else now
+        cutoff = now - minutes * 60
+        with self.lock:
+            if cutoff < self.covered_since:
+                # Longer window than we keep: remember it and fill the gap once
+                self.retention = max(self.retention, minutes * 60)
+                self.extend_back(cutoff)
+            i = bisect_right(self.times, cutoff)
+            return self.times[i:], self.rows[i:]
+
+    def window(self, minutes=1, now=None):
+        """Rows recorded in the last X minutes, oldest first"""
+        return self.window_entries(minutes, now)[1]
+
+    def __len__(self):
+        return len(self.times)
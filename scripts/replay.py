@@ -0,0 +1,330 @@
+import os
+import io
+import sys
+import csv
+import json
+import math
+import argparse
+import datetime
+import itertools
+import contextlib
+import multiprocessing
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from recent_switches import RecentSwitchBuffer
+from running_stats import DurationAggregate
+from baselines import HourOfWeekBaselines
+from duration_sketches import DurationSketches
+from switch_analyzer import TaskSwitchAnalyzer
+from color_change import DesktopColor, PaletteRenderer
+
+DEFAULT_PARAMS = {
+    "threshold_ratio": 0.5,       # TaskSwitchAnalyzer
+    "min_switches": 5,            # TaskSwitchAnalyzer
+    "percentile": None,           # TaskSwitchAnalyzer percentile mode (e.g. 0.25), None = mean
+    "history_days": 28,           # days of sessions behind the percentile
+    "baselines": True,            # compare against hour-of-week baselines, as the tracker does
+    "baseline_min_count": 30,     # HourOfWeekBaselines min_count
+    "analysis_minutes": 1,        # window passed to check_excessive_task_switching
+    "analysis_interval": 10,      # seconds between Flow checks
+    "intensity_exponent": 2,      # DesktopColor.calculate_color_intensity
+    "color_minutes": 10,          # DesktopColor window
+    "color_interval": 5,          # seconds between colour updates
+    "color_weighting": "linear",  # DesktopColor recent average: linear or exponential
+    "half_life": 120.0,           # seconds, for the exponential weighting
+    "palette_levels": 32,         # PaletteRenderer
+}
+
+
+class ReplayTracker:
+    def __init__(self, retention_minutes):
+        """Stands in for TaskTracker: an in-memory recent buffer fed by the replay"""
+        self.recent = RecentSwitchBuffer(retention_minutes=retention_minutes)
+        # Everything the replay feeds is in the buffer
+        self.recent.covered_since = -math.inf
+        self.version = 0
+
+    def feed(self, epoch, row):
+        self.recent.add(row, epoch)
+        self.version += 1
+
+
+class ReplayStats:
+    def __init__(self):
+        """Stands in for StatsStorage: statistics over every row fed so far"""
+        self.durations = DurationAggregate()
+
+    def feed(self, duration):
+        self.durations.add(duration)
+
+    def calculate_statistics(self):
+        durations = self.durations
+        if durations.count == 0:
+            return {}
+        return {"count": durations.count, "mean": durations.mean, "median": durations.quantile(0.5),
+                "std": durations.std(), "min": durations.min, "max": durations.max}
+
+
+class RecordingRenderer(PaletteRenderer):
+    def __init__(self, levels, clock):
+        """Quantizes like PaletteRenderer but records colour changes instead of touching the desktop"""
+        # Nothing is rendered, so no image cache in the user's home
+        super().__init__(levels=levels, cache_dir=None)
+        self.clock = clock
+        self.changes = []
+
+    def apply(self, color):
+        if color == self.last_applied:
+            self.skipped += 1
+            return False
+        self.changes.append((self.clock(), color))
+        self.last_applied = color
+        self.applied += 1
+        return True
+
+
+def open_log_entries(path, start=None, end=None):
+    """
+    Read a switch log as (epoch, row) pairs in time order. Accepts a CSV/TSV file,
+    a SQLite database, a columnar log directory or a partitioned log directory.
+    """
+    if path.endswith('.db') or os.path.isdir(path):
+        # Opened read-only, so a replay never repairs a log the tracker is writing
+        from report import iter_entries
+        return list(iter_entries(path, start, end))
+
+    delimiter = '\t' if path.endswith('.tsv') else ','
+    entries = []
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        next(reader, None)
+        for row in reader:
+            try:
+                epoch = datetime.datetime.fromisoformat(row[1]).timestamp()
+            except (ValueError, IndexError):
+                continue
+            if (start is None or epoch > start) and (end is None or epoch <= end):
+                entries.append((epoch, row))
+    entries.sort(key=lambda entry: entry[0])
+    return entries
+
+
+class ReplayEngine:
+    def __init__(self, entries, params=None):
+        """
+        Streams a historical switch log through TaskSwitchAnalyzer and DesktopColor
+        on a simulated clock, as fast as the CPU allows.
+
+        Ticks fire on the same intervals as TrackingService. Stretches where
+        neither window can hold a switch (nights, weekends) are skipped, since
+        both checks return early without recent switches.
+        """
+        self.entries = entries
+        self.params = dict(DEFAULT_PARAMS, **(params or {}))
+        self.now = 0.0
+
+        p = self.params
+        clock = lambda: self.now
+        self.tracker = ReplayTracker(max(p["analysis_minutes"], p["color_minutes"]))
+        self.stats = ReplayStats()
+        # In memory only, fed the same rows as the tracker
+        self.sketches = DurationSketches(base_dir=None) if p["percentile"] is not None else None
+        self.baselines = (HourOfWeekBaselines(base_dir=None, min_count=p["baseline_min_count"])
+                          if p["baselines"] else None)
+        self.analyzer = TaskSwitchAnalyzer(self.tracker, self.stats,
+                                           threshold_ratio=p["threshold_ratio"],
+                                           min_switches=p["min_switches"], clock=clock,
+                                           baselines=self.baselines, sketches=self.sketches, percentile=p["percentile"],
+                                           history_days=p["history_days"])
+        self.renderer = RecordingRenderer(p["palette_levels"], clock)
+        self.desktop_color = DesktopColor(self.analyzer, self.stats, renderer=self.renderer,
+                                          intensity_exponent=p["intensity_exponent"],
+                                          window_minutes=p["color_minutes"],
+                                          weighting=p["color_weighting"], half_life=p["half_life"])
+        self.flow_launches = []
+
+    def score_color_ticks(self, first_tick):
+        """
+        recency scores for every colour tick whose window holds a switch, in one
+        score_windows pass; color_scores looks them up by tick number
+        """
+        from scoring import entries_to_arrays, score_windows
+        p = self.params
+        interval, window = p["color_interval"], p["color_minutes"] * 60
+        times, durations = entries_to_arrays(self.entries)
+        # Ticks in [time, time + window) of some switch, from merged runs of windows
+        numbers = []
+        run_start = run_end = None
+        for epoch in list(times) + [None]:
+            if epoch is not None and run_end is not None and epoch < run_end:
+                run_end = epoch + window
+                continue
+            if run_end is not None:
+                low = max(0, math.ceil((run_start - first_tick) / interval))
+                high = max(low, math.ceil((run_end - first_tick) / interval))
+                numbers.extend(range(low, high))
+            if epoch is not None:
+                run_start, run_end = epoch, epoch + window
+        ticks = [first_tick + number * interval for number in numbers]
+        self.tick_scores = score_windows(times, durations, ticks, window, p["half_life"])
+        self.tick_index = {number: i for i, number in enumerate(numbers)}
+        self.first_color_tick = first_tick
+
+    def color_scores(self):
+        """Precomputed scores for the colour tick at self.now"""
+        number = round((self.now - self.first_color_tick) / self.params["color_interval"])
+        i = self.tick_index.get(number)
+        if i is None:
+            return {"count": 0}
+        return {name: values[i] for name, values in self.tick_scores.items()}
+
+    def run(self):
+        p = self.params
+        if not self.entries:
+            return self.report()
+        times = [epoch for epoch, _ in self.entries]
+        start, end = times[0], times[-1]
+        next_analysis = start + p["analysis_interval"]
+        next_color = start + p["color_interval"]
+        self.score_color_ticks(next_color)
+        fed = 0
+
+        # The analyzer and colour code print on every check; keep the replay quiet
+        with contextlib.redirect_stdout(io.StringIO()) as sink:
+            while min(next_analysis, next_color) <= end + max(p["analysis_interval"], p["color_interval"]):
+                self.now = min(next_analysis, next_color)
+                while fed < len(self.entries) and self.entries[fed][0] <= self.now:
+                    epoch, row = self.entries[fed]
+                    self.tracker.feed(epoch, row)
+                    if self.sketches is not None:
+                        self.sketches.add(row)
+                    if self.baselines is not None:
+                        self.baselines.add(row)
+                    try:
+                        self.stats.feed(int(row[4]))
+                    except (ValueError, IndexError):
+                        # Skipped like the other readers do with malformed rows
+                        pass
+                    fed += 1
+
+                if self.now == next_analysis:
+                    if self.analyzer.check_excessive_task_switching(p["analysis_minutes"]):
+                        self.flow_launches.append(self.now)
+                    next_analysis += p["analysis_interval"]
+                if self.now == next_color:
+                    self.desktop_color.update_color_based_on_behavior(self.color_scores())
+                    next_color += p["color_interval"]
+
+                # Fast-forward over idle stretches: nothing can trigger until the
+                # next switch is inside a window
+                last_seen = times[fed - 1] if fed else -math.inf
+                window = max(p["analysis_minutes"], p["color_minutes"]) * 60
+                if fed < len(times) and self.now - last_seen > window:
+                    skip_to = times[fed]
+                    next_analysis = self.skip(next_analysis, p["analysis_interval"], skip_to)
+                    next_color = self.skip(next_color, p["color_interval"], skip_to)
+                sink.seek(0)
+                sink.truncate()
+        return self.report()
+
+    @staticmethod
+    def skip(deadline, interval, target):
+        """First deadline on the same tick grid at or after target"""
+        if deadline >= target:
+            return deadline
+        return deadline + math.ceil((target - deadline) / interval) * interval
+
+    def report(self):
+        episodes = 0
+        previous = None
+        for launch in self.flow_launches:
+            # Consecutive checks that all fire count as one episode
+            if previous is None or launch - previous > self.params["analysis_interval"]:
+                episodes += 1
+            previous = launch
+        iso = lambda epoch: datetime.datetime.fromtimestamp(epoch).isoformat(timespec="seconds")
+        return {
+            "params": self.params,
+            "switches": len(self.entries),
+            "flow_launches": len(self.flow_launches),
+            "flow_episodes": episodes,
+            "flow_launch_times": [iso(t) for t in self.flow_launches],
+            "color_changes": len(self.renderer.changes),
+            "color_timeline": [[iso(t), list(color)] for t, color in self.renderer.changes],
+        }
+
+
+# Worker processes get the log once, not once per parameter set
+_worker_entries = None
+
+
+def _init_worker(entries):
+    global _worker_entries
+    _worker_entries = entries
+
+
+def _run_params(params):
+    return ReplayEngine(_worker_entries, params).run()
+
+
+def sweep(entries, param_sets, workers=None):
+    """Replay every parameter set over the same log, in parallel across processes"""
+    if workers == 1 or len(param_sets) == 1:
+        return [ReplayEngine(entries, params).run() for params in param_sets]
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(entries,)) as pool:
+        return pool.map(_run_params, param_sets)
+
+
+def parse_grid(specs):
+    """["threshold_ratio=0.3,0.5", "intensity_exponent=1,2"] -> list of every combination"""
+    axes = []
+    for spec in specs:
+        name, values = spec.split("=", 1)
+        if name not in DEFAULT_PARAMS:
+            raise ValueError(f"Unknown parameter {name}; choose from {', '.join(DEFAULT_PARAMS)}")
+        axes.append([(name, json.loads(value)) for value in values.split(",")])
+    return [dict(combination) for combination in itertools.product(*axes)] or [{}]
+
+
+def parse_date(value):
+    return datetime.datetime.fromisoformat(value).timestamp() if value else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a switch log to backtest intervention thresholds")
+    parser.add_argument("log", help="task_tracker_data.csv/.tsv/.db, a .col directory or a partitioned directory")
+    parser.add_argument("--grid", nargs="*", default=[],
+                        help="Parameter sweep, e.g. threshold_ratio=0.3,0.5,0.7 intensity_exponent=1,2")
+    parser.add_argument("--params", help="JSON file with a list of parameter sets (instead of --grid)")
+    parser.add_argument("--from", dest="start", help="Only replay switches after this date/time")
+    parser.add_argument("--to", dest="end", help="Only replay switches up to this date/time")
+    parser.add_argument("--workers", type=int, default=None, help="Processes to use (default: all cores)")
+    parser.add_argument("--output", help="Write the full report (including timelines) as JSON")
+    args = parser.parse_args()
+
+    if args.params:
+        with open(args.params, 'r') as f:
+            param_sets = json.load(f)
+    else:
+        param_sets = parse_grid(args.grid)
+
+    entries = open_log_entries(args.log, parse_date(args.start), parse_date(args.end))
+    print(f"Replaying {len(entries)} switches with {len(param_sets)} parameter set(s)")
+    started = datetime.datetime.now()
+    reports = sweep(entries, param_sets, args.workers)
+    elapsed = (datetime.datetime.now() - started).total_seconds()
+
+    for report in reports:
+        changed = {k: v for k, v in report["params"].items() if DEFAULT_PARAMS.get(k) != v}
+        print(f"{json.dumps(changed or 'defaults'):<60} Flow launches: {report['flow_launches']:>6} "
+              f"({report['flow_episodes']} episodes)  colour changes: {report['color_changes']:>6}")
+    print(f"Done in {elapsed:.1f}s")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(reports, f, indent=1)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
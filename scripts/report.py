@@ -0,0 +1,306 @@
+import os
+import sys
+import csv
+import json
+import argparse
+import datetime
+import contextlib
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from running_stats import DurationAggregate
+from switch_log import read_rows_since
+
+# Sketch size per group; transitions can mean thousands of groups
+GROUP_SKETCH_K = 64
+# Rows per read from columnar and SQLite logs, bytes per read from CSV/TSV logs
+CHUNK_ROWS = 20000
+CHUNK_BYTES = 1 << 20
+
+
+def group_app(row):
+    # Duration is the time spent in the app switched away from
+    return row[2] or None
+
+
+def group_transition(row):
+    return f"{row[2]} -> {row[3]}" if row[2] else None
+
+
+def group_hour(row):
+    return f"{row[1][11:13]}:00"
+
+
+def group_day(row):
+    return row[1][:10]
+
+
+GROUPINGS = {"app": group_app, "transition": group_transition, "hour": group_hour, "day": group_day}
+# app and transition are ranked by time; hour and day read best in order
+CHRONOLOGICAL = {"hour", "day"}
+
+
+def log_path(base_dir, storage="text", use_tsv=False):
+    """Where TaskTracker keeps the switch log for a storage format"""
+    data_dir = os.path.join(os.path.expanduser(base_dir), "data")
+    if storage == "columnar":
+        return os.path.join(data_dir, "task_tracker_data.col")
+    if storage == "partitioned":
+        return os.path.join(data_dir, "task_tracker_data")
+    if storage == "sqlite":
+        return os.path.join(data_dir, "task_tracker_data.db")
+    return os.path.join(data_dir, f"task_tracker_data.{'tsv' if use_tsv else 'csv'}")
+
+
+def row_epoch(row):
+    try:
+        return datetime.datetime.fromisoformat(row[1]).timestamp()
+    except (ValueError, IndexError, TypeError):
+        return None
+
+
+def seek_time(path, epoch, delimiter=','):
+    """
+    Byte offset of the first row with timestamp > epoch in a CSV/TSV log, by
+    binary search over file offsets (rows are appended in time order).
+    Returns 0 when the search should start at the header.
+    """
+    with open(path, 'rb') as f:
+        low, high = 0, f.seek(0, os.SEEK_END)
+        while high - low > 4096:
+            mid = (low + high) // 2
+            f.seek(mid)
+            f.readline()
+            line_start = f.tell()
+            line = f.readline()
+            if not line.endswith(b'\n'):
+                high = mid
+                continue
+            row = next(csv.reader([line.decode('utf-8', 'replace')], delimiter=delimiter), [])
+            when = row_epoch(row)
+            if when is not None and when > epoch:
+                high = mid
+            else:
+                low = line_start
+        if low == 0:
+            return 0
+        # low is the start of a row at or before epoch; resume at the next line
+        f.seek(low)
+        f.readline()
+        return f.tell()
+
+
+def iter_text_entries(path, start=None, end=None, delimiter=','):
+    offset = seek_time(path, start, delimiter) if start is not None else 0
+    while True:
+        rows, offset = read_rows_since(path, offset, delimiter, CHUNK_BYTES)
+        if not rows:
+            return
+        for row in rows:
+            epoch = row_epoch(row)
+            if epoch is None or (start is not None and epoch <= start):
+                continue
+            if end is not None and epoch > end:
+                return
+            yield epoch, row
+
+
+def iter_columnar_entries(path, start=None, end=None):
+    from columnar_log import ColumnarSwitchLog
+    log = ColumnarSwitchLog(path, read_only=True)
+    count = log.rows_on_disk()
+    first = log.bisect_time(int(start * 1000000), count) if start is not None else 0
+    stop = log.bisect_time(int(end * 1000000), count) if end is not None else count
+    for chunk in range(first, stop, CHUNK_ROWS):
+        chunk_stop = min(stop, chunk + CHUNK_ROWS)
+        stamps = log.read_column("timestamp", chunk, chunk_stop)
+        for stamp, row in zip(stamps, log.build_rows(chunk, chunk_stop)):
+            yield stamp / 1000000, row
+    log.close()
+
+
+def iter_sqlite_entries(path, start=None, end=None):
+    from sqlite_log import COLUMNS, SqliteSwitchLog
+    conditions, params = [], []
+    if start is not None:
+        conditions.append("epoch > ?")
+        params.append(start)
+    if end is not None:
+        conditions.append("epoch <= ?")
+        params.append(end)
+    where = " WHERE " + " AND ".join(conditions) if conditions else ""
+    # Read-only: a wrong path is an error rather than a new empty database, and
+    # the tracker's WAL database is never locked for writing
+    with contextlib.closing(SqliteSwitchLog(path, read_only=True)) as log:
+        cursor = log.connection.execute(f"SELECT epoch, {COLUMNS} FROM switches{where} ORDER BY epoch, id", params)
+        while True:
+            rows = cursor.fetchmany(CHUNK_ROWS)
+            if not rows:
+                return
+            for row in rows:
+                yield row[0], list(row[1:])
+
+
+def iter_entries(path, start=None, end=None):
+    """
+    (epoch, row) with start < timestamp <= end, oldest first, from any switch log
+    format, read in bounded chunks: CSV/TSV from a binary-searched offset in
+    CHUNK_BYTES blocks, partitioned logs one overlapping partition at a time, columnar and
+    SQLite logs CHUNK_ROWS rows at a time.
+    """
+    if path.endswith('.db'):
+        return iter_sqlite_entries(path, start, end)
+    if os.path.isdir(path):
+        if os.path.exists(os.path.join(path, "manifest.json")):
+            from partitioned_log import PartitionedSwitchLog
+            return PartitionedSwitchLog(path, read_only=True).rows_between(start, end)
+        return iter_columnar_entries(path, start, end)
+    return iter_text_entries(path, start, end, '\t' if path.endswith('.tsv') else ',')
+
+
+def open_log(path):
+    """
+    A read-only switch log object (read_since, tail) for any storage format, for
+    tools that keep the tracker's checkpoint cursors without writing the log
+    """
+    if path.endswith('.db'):
+        from sqlite_log import SqliteSwitchLog
+        return SqliteSwitchLog(path, read_only=True)
+    if os.path.isdir(path):
+        if os.path.exists(os.path.join(path, "manifest.json")):
+            from partitioned_log import PartitionedSwitchLog
+            return PartitionedSwitchLog(path, read_only=True)
+        from columnar_log import ColumnarSwitchLog
+        return ColumnarSwitchLog(path, read_only=True)
+    from switch_log import CsvSwitchLog
+    return CsvSwitchLog(path, '\t' if path.endswith('.tsv') else ',', read_only=True)
+
+
+def build_report(entries, group_by="app"):
+    """
+    One DurationAggregate per group, folded as the entries stream past, so
+    memory depends on the number of groups and not on the number of rows.
+    Returns (groups, summary).
+    """
+    key_of = GROUPINGS[group_by]
+    groups = {}
+    switches = total = 0
+    first = last = None
+    for epoch, row in entries:
+        try:
+            duration = int(row[4])
+        except (ValueError, IndexError, TypeError):
+            continue
+        if first is None:
+            first = epoch
+        last = epoch
+        switches += 1
+        total += duration
+        key = key_of(row)
+        if key is None:
+            continue
+        aggregate = groups.get(key)
+        if aggregate is None:
+            aggregate = groups[key] = DurationAggregate(GROUP_SKETCH_K)
+        aggregate.add(duration)
+    iso = lambda epoch: datetime.datetime.fromtimestamp(epoch).isoformat(timespec="seconds") if epoch else None
+    return groups, {"switches": switches, "total_s": total, "from": iso(first), "to": iso(last)}
+
+
+def report_rows(groups, group_by="app", limit=None):
+    """Groups as dicts, most time first (or in time order for hour and day)"""
+    grand_total = sum(aggregate.total for aggregate in groups.values()) or 1
+    rows = []
+    for key, aggregate in groups.items():
+        p50, p90 = aggregate.sketch.quantiles([0.5, 0.9])
+        rows.append({
+            group_by: key,
+            "switches": aggregate.count,
+            "total_s": aggregate.total,
+            "share": aggregate.total / grand_total,
+            "mean_s": aggregate.mean,
+            "p50_s": p50,
+            "p90_s": p90,
+            "max_s": aggregate.max,
+        })
+    if group_by in CHRONOLOGICAL:
+        rows.sort(key=lambda row: row[group_by])
+    else:
+        rows.sort(key=lambda row: (-row["total_s"], -row["switches"]))
+    return rows[:limit] if limit else rows
+
+
+def format_seconds(seconds):
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+def write_table(rows, group_by, summary, out):
+    width = max([len(group_by)] + [len(str(row[group_by])) for row in rows])
+    width = min(width, 50)
+    out.write(f"{group_by.capitalize():<{width}} {'Switches':>9} {'Time':>10} {'Share':>6} "
+              f"{'Mean':>8} {'p50':>8} {'p90':>8} {'Max':>8}\n")
+    for row in rows:
+        out.write(f"{str(row[group_by])[:width]:<{width}} {row['switches']:>9} {format_seconds(row['total_s']):>10} "
+                  f"{row['share']:>6.1%} {format_seconds(row['mean_s']):>8} {format_seconds(row['p50_s']):>8} "
+                  f"{format_seconds(row['p90_s']):>8} {format_seconds(row['max_s']):>8}\n")
+    out.write(f"{summary['switches']} switches, {format_seconds(summary['total_s'])} tracked, "
+              f"{summary['from']} to {summary['to']}\n")
+
+
+def write_report(rows, group_by, summary, fmt="table", out=sys.stdout):
+    if fmt == "json":
+        json.dump({"group_by": group_by, "summary": summary, "groups": rows}, out, indent=1)
+        out.write("\n")
+    elif fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=[group_by, "switches", "total_s", "share",
+                                                 "mean_s", "p50_s", "p90_s", "max_s"])
+        writer.writeheader()
+        writer.writerows(rows)
+    else:
+        write_table(rows, group_by, summary, out)
+
+
+def parse_time(value):
+    """ISO date/time, or a relative "7d" / "12h" before now, as an epoch (None stays None)"""
+    if not value:
+        return None
+    if value[-1] in "dh" and value[:-1].isdigit():
+        hours = int(value[:-1]) * (24 if value[-1] == "d" else 1)
+        return (datetime.datetime.now() - datetime.timedelta(hours=hours)).timestamp()
+    return datetime.datetime.fromisoformat(value).timestamp()
+
+
+def add_arguments(parser):
+    parser.add_argument("--by", default="app", choices=sorted(GROUPINGS), help="What to group switches by")
+    parser.add_argument("--from", dest="start", help="Only switches after this date/time (or e.g. 7d, 12h ago)")
+    parser.add_argument("--to", dest="end", help="Only switches up to this date/time")
+    parser.add_argument("--format", default="table", choices=["table", "csv", "json"])
+    parser.add_argument("--limit", type=int, default=None, help="Show only the first N groups")
+    parser.add_argument("--log", help="Switch log to read (default: the tracker's log under --base-dir)")
+    parser.add_argument("--base-dir", default="~/task_switch")
+    parser.add_argument("--storage", default="text", choices=["text", "columnar", "partitioned", "sqlite"])
+    parser.add_argument("--tsv", action="store_true", help="The text log is TSV")
+
+
+def run(args):
+    path = os.path.expanduser(args.log) if args.log else log_path(args.base_dir, args.storage, args.tsv)
+    if not os.path.exists(path):
+        print(f"No switch log at {path}")
+        return 1
+    groups, summary = build_report(iter_entries(path, parse_time(args.start), parse_time(args.end)), args.by)
+    write_report(report_rows(groups, args.by, args.limit), args.by, summary, args.format)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize the switch history by app, transition, hour or day")
+    add_arguments(parser)
+    sys.exit(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import math
+from quantile_sketch import KllSketch
+
+
+class DurationAggregate:
+    def __init__(self, k=200):
+        """
+        Mergeable duration summary: count, sum, sum of squares, min, max and a
+        KLL sketch for quantiles. Aggregates over disjoint sets of rows merge
+        into the aggregate of their union, so partial summaries (snapshots,
+        days, apps) combine without going back to the rows.
+        """
+        self.count = 0
+        self.total = 0
+        self.sumsq = 0
+        self.min = None
+        self.max = None
+        self.sketch = KllSketch(k)
+
+    def add(self, x):
+        """Fold one duration into the aggregate"""
+        self.count += 1
+        self.total += x
+        self.sumsq += x * x
+        self.min = x if self.min is None else min(self.min, x)
+        self.max = x if self.max is None else max(self.max, x)
+        self.sketch.add(x)
+
+    def merge(self, other):
+        """Fold another aggregate in"""
+        self.count += other.count
+        self.total += other.total
+        self.sumsq += other.sumsq
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        if other.max is not None:
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+        return self
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else math.nan
+
+    def std(self):
+        """Sample standard deviation (ddof=1, same as pandas)"""
+        if self.count < 2:
+            return math.nan
+        variance = (self.sumsq - self.total * self.total / self.count) / (self.count - 1)
+        return math.sqrt(max(0.0, variance))
+
+    def quantile(self, q):
+        return self.sketch.quantile(q)
+
+    def to_dict(self):
+        return {"count": self.count, "sum": self.total, "sumsq": self.sumsq,
+                "min": self.min, "max": self.max, "sketch": self.sketch.to_dict()}
+
+    @classmethod
+    def from_dict(cls, state):
+        aggregate = cls()
+        aggregate.count = state["count"]
+        aggregate.total = state["sum"]
+        aggregate.sumsq = state["sumsq"]
+        aggregate.min = state["min"]
+        aggregate.max = state["max"]
+        aggregate.sketch = KllSketch.from_dict(state["sketch"])
+        return aggregate
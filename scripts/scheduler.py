@@ -0,0 +1,129 @@
+import time
+import heapq
+import threading
+import metrics
+
+
+class ScheduledTask:
+    def __init__(self, name, interval, callback, background=False):
+        """A periodic job with its own interval and drift bookkeeping"""
+        self.name = name
+        self.interval = interval
+        self.callback = callback
+        self.background = background
+        self.thread = None
+        self.runs = 0
+        self.missed = 0
+        self.drift_total = 0.0
+        self.drift_max = 0.0
+        self.last_runtime = 0.0
+        self.runtime_max = 0.0
+
+    def report(self):
+        """Runs, missed deadlines and drift (ms) for this task"""
+        return {
+            "interval_s": self.interval,
+            "runs": self.runs,
+            "missed": self.missed,
+            "mean_drift_ms": self.drift_total / self.runs * 1000 if self.runs else 0.0,
+            "max_drift_ms": self.drift_max * 1000,
+            "max_runtime_ms": self.runtime_max * 1000,
+        }
+
+
+class Scheduler:
+    def __init__(self, clock=time.monotonic):
+        """
+        Runs periodic tasks against monotonic deadlines.
+
+        Each task's next deadline is its previous deadline plus its interval, so
+        a slow task does not shift the others and sampling does not drift. If a
+        task overruns by whole intervals those runs are counted as missed and
+        skipped rather than replayed in a burst. Background tasks run on their
+        own thread so slow work (pandas, osascript) cannot hold up the others;
+        a background run that is still busy at its next deadline counts as missed.
+        A callback may change its task's interval (e.g. adaptive sampling); the
+        next deadline is computed with the new value.
+        """
+        self.clock = clock
+        self.tasks = {}
+        self.queue = []
+        self.counter = 0
+        self.stop_event = threading.Event()
+
+    def add(self, name, interval, callback, start=None, background=False):
+        """Schedule callback every interval seconds (first run one interval after start)"""
+        task = ScheduledTask(name, interval, callback, background)
+        self.tasks[name] = task
+        start = self.clock() if start is None else start
+        self.push(start + interval, task)
+        return task
+
+    def push(self, deadline, task):
+        # The counter keeps ordering stable for tasks that share a deadline
+        self.counter += 1
+        heapq.heappush(self.queue, (deadline, self.counter, task))
+
+    def run(self):
+        """Dispatch tasks until stop() is called (returns at once if it already was)"""
+        while self.queue and not self.stop_event.is_set():
+            deadline, _, task = self.queue[0]
+            delay = deadline - self.clock()
+            if delay > 0:
+                self.stop_event.wait(delay)
+                continue
+            heapq.heappop(self.queue)
+
+            started = self.clock()
+            drift = started - deadline
+            if task.background and task.thread is not None and task.thread.is_alive():
+                task.missed += 1
+                metrics.REGISTRY.counter("task_switch_scheduler_missed_total", "Skipped task runs",
+                                         task=task.name).inc()
+            else:
+                task.runs += 1
+                task.drift_total += drift
+                task.drift_max = max(task.drift_max, drift)
+                metrics.observe("scheduler_drift", drift, task=task.name)
+                if task.background:
+                    task.thread = threading.Thread(target=self.execute, args=(task,), daemon=True)
+                    task.thread.start()
+                else:
+                    self.execute(task)
+            finished = self.clock()
+
+            next_deadline = deadline + task.interval
+            if next_deadline <= finished:
+                skipped = int((finished - next_deadline) // task.interval) + 1
+                task.missed += skipped
+                metrics.REGISTRY.counter("task_switch_scheduler_missed_total", "Skipped task runs",
+                                         task=task.name).inc(skipped)
+                next_deadline += skipped * task.interval
+            self.push(next_deadline, task)
+
+    def execute(self, task):
+        started = self.clock()
+        try:
+            task.callback()
+        except Exception as e:
+            print(f"Error in scheduled task {task.name}: {e}")
+        task.last_runtime = self.clock() - started
+        task.runtime_max = max(task.runtime_max, task.last_runtime)
+
+    def stop(self):
+        """Wake the run loop and make it return"""
+        self.stop_event.set()
+
+    def join(self, timeout=None):
+        """Wait for background runs still in progress; returns the names of those still busy"""
+        busy = []
+        for task in list(self.tasks.values()):
+            if task.thread is not None:
+                task.thread.join(timeout)
+                if task.thread.is_alive():
+                    busy.append(task.name)
+        return busy
+
+    def report(self):
+        """Per-task runs, missed deadlines and drift"""
+        return {name: task.report() for name, task in self.tasks.items()}
@@ -0,0 +1,130 @@
+import datetime
+import numpy as np
+
+# Upper bound on the (ticks x switches-per-window) matrix built per chunk in score_windows
+MAX_CHUNK_CELLS = 1 << 20
+
+
+def row_duration(row):
+    """A row's duration as a float, or None when it is missing or malformed"""
+    try:
+        return float(row[4])
+    except (ValueError, IndexError, TypeError):
+        return None
+
+
+def durations_array(rows):
+    """Duration column of switch rows as a float array (rows with no usable duration are skipped)"""
+    durations = (row_duration(row) for row in rows)
+    return np.array([d for d in durations if d is not None], dtype=float)
+
+
+def entries_to_arrays(entries):
+    """(epoch, row) pairs, as returned by the switch logs' tail(), to (times, durations) arrays"""
+    pairs = [(epoch, row_duration(row)) for epoch, row in entries]
+    pairs = [(epoch, duration) for epoch, duration in pairs if epoch is not None and duration is not None]
+    times = np.array([epoch for epoch, _ in pairs], dtype=float)
+    durations = np.array([duration for _, duration in pairs], dtype=float)
+    return times, durations
+
+
+def rows_to_arrays(rows):
+    """Switch rows to (times, durations) arrays, reading the epoch from the ISO timestamp"""
+    entries = []
+    for row in rows:
+        try:
+            entries.append((datetime.datetime.fromisoformat(row[1]).timestamp(), row))
+        except (ValueError, IndexError, TypeError):
+            continue
+    return entries_to_arrays(entries)
+
+
+def recency_scores(durations, times=None, half_life=120.0, now=None):
+    """
+    Plain, linear and exponential recency-weighted mean of durations, oldest first.
+
+    linear weights the i-th oldest session by i + 1 (what DesktopColor always did).
+    exponential halves a session's weight every half_life seconds of age when
+    times are given, or every half_life sessions otherwise.
+
+    Returns {"mean", "median", "linear", "exponential", "count"}; the values are
+    None when there are no durations.
+    """
+    durations = np.asarray(durations, dtype=float)
+    count = len(durations)
+    if count == 0:
+        return {"mean": None, "median": None, "linear": None, "exponential": None, "count": 0}
+
+    linear_weights = np.arange(1, count + 1, dtype=float)
+    if times is not None:
+        times = np.asarray(times, dtype=float)
+        reference = times[-1] if now is None else now
+        age = reference - times
+    else:
+        age = (count - 1) - np.arange(count, dtype=float)
+    exp_weights = np.exp2(-age / half_life)
+
+    return {
+        "mean": float(durations.mean()),
+        "median": float(np.median(durations)),
+        "linear": float(durations @ linear_weights / linear_weights.sum()),
+        "exponential": float(durations @ exp_weights / exp_weights.sum()),
+        "count": count,
+    }
+
+
+def score_windows(times, durations, ticks, window_seconds=600, half_life=120.0):
+    """
+    recency_scores for many windows at once, e.g. every tick across a whole day.
+
+    For each tick t the window holds the sessions with t - window_seconds < time <= t.
+    Exponential weights decay with age relative to the tick.
+
+    Args:
+        times: Switch epochs, sorted ascending
+        durations: Duration of each switch
+        ticks: Epochs to score at
+    Returns:
+        dict of arrays aligned with ticks: "mean", "linear", "exponential"
+        (NaN where the window is empty) and "count"
+    """
+    times = np.asarray(times, dtype=float)
+    durations = np.asarray(durations, dtype=float)
+    ticks = np.asarray(ticks, dtype=float)
+
+    starts = np.searchsorted(times, ticks - window_seconds, side="right")
+    ends = np.searchsorted(times, ticks, side="right")
+    counts = ends - starts
+
+    result = {
+        "mean": np.full(len(ticks), np.nan),
+        "linear": np.full(len(ticks), np.nan),
+        "exponential": np.full(len(ticks), np.nan),
+        "count": counts,
+    }
+    if len(ticks) == 0 or counts.max(initial=0) == 0:
+        return result
+
+    width = int(counts.max())
+    chunk = max(1, MAX_CHUNK_CELLS // width)
+    offsets = np.arange(width)
+    for first in range(0, len(ticks), chunk):
+        last = min(len(ticks), first + chunk)
+        start, count = starts[first:last], counts[first:last]
+        # One row per tick, one column per session in its window; padding is masked out
+        index = start[:, None] + offsets
+        mask = offsets < count[:, None]
+        index = np.where(mask, index, 0)
+        window_durations = np.where(mask, durations[index], 0.0)
+
+        linear_weights = np.where(mask, offsets + 1.0, 0.0)
+        age = ticks[first:last, None] - times[index]
+        exp_weights = np.where(mask, np.exp2(-age / half_life), 0.0)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result["mean"][first:last] = window_durations.sum(axis=1) / count
+            result["linear"][first:last] = ((window_durations * linear_weights).sum(axis=1)
+                                            / linear_weights.sum(axis=1))
+            result["exponential"][first:last] = ((window_durations * exp_weights).sum(axis=1)
+                                                 / exp_weights.sum(axis=1))
+    return result
@@ -0,0 +1,189 @@
+import os
+import csv
+import time
+import sqlite3
+import argparse
+import datetime
+import threading
+from urllib.parse import quote
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS switches (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    epoch REAL NOT NULL,
+    app_from TEXT,
+    app_to TEXT,
+    duration INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS switches_epoch ON switches (epoch);
+"""
+COLUMNS = "id, timestamp, app_from, app_to, duration"
+
+
+class SqliteSwitchLog:
+    def __init__(self, db_path, flush_every=1, flush_interval=None, fsync=False, read_only=False):
+        """
+        Switch log in a SQLite database (WAL mode) with an index on the timestamp.
+
+        Ids come from AUTOINCREMENT, so startup never counts rows. Appends go
+        into one open transaction that is committed every flush_every records
+        (or flush_interval seconds); range and aggregate queries use the
+        timestamp index instead of scanning the log.
+
+        Args:
+            db_path: Path to the .db file
+            flush_every: Commit after this many records
+            flush_interval: Also commit if this many seconds passed since the last commit (None = off)
+            fsync: synchronous=FULL, so each commit survives a power loss
+                   (otherwise NORMAL: WAL commits survive a crash of this process)
+            read_only: Query a database the tracker writes to without creating
+                       the schema or changing its settings; appends fail
+        """
+        self.db_path = db_path
+        self.data_path = db_path
+        self.flush_every = max(1, flush_every)
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.read_only = read_only
+        self.pending = 0
+        self.last_flush = time.monotonic()
+        # Appends come from the writer thread, queries from the analysis threads
+        self.lock = threading.RLock()
+
+        self.connection = None
+        self.connect()
+        row = self.connection.execute("SELECT seq FROM sqlite_sequence WHERE name = 'switches'").fetchone()
+        self.next_id = (row[0] if row else 0) + 1
+
+    def connect(self):
+        """Open the connection (again after close)"""
+        with self.lock:
+            if self.connection is None and self.read_only:
+                self.connection = sqlite3.connect(f"file:{quote(self.db_path)}?mode=ro", uri=True,
+                                                  check_same_thread=False, isolation_level=None)
+            elif self.connection is None:
+                self.connection = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+                self.connection.execute("PRAGMA journal_mode=WAL")
+                self.connection.execute(f"PRAGMA synchronous={'FULL' if self.fsync else 'NORMAL'}")
+                self.connection.executescript(SCHEMA)
+            return self.connection
+
+    def append(self, when, app_from, app_to, duration):
+        """Insert one switch (when is a datetime) and return the row"""
+        if self.read_only:
+            raise ValueError(f"{self.db_path} is open read-only")
+        with self.lock:
+            self.connect()
+            if not self.connection.in_transaction:
+                self.connection.execute("BEGIN")
+            cursor = self.connection.execute(
+                "INSERT INTO switches (timestamp, epoch, app_from, app_to, duration) VALUES (?, ?, ?, ?, ?)",
+                (when.isoformat(), when.timestamp(), app_from, app_to, duration))
+            row = [cursor.lastrowid, when.isoformat(), app_from, app_to, duration]
+            self.next_id = cursor.lastrowid + 1
+            self.pending += 1
+
+            if self.pending >= self.flush_every or (
+                    self.flush_interval is not None
+                    and time.monotonic() - self.last_flush >= self.flush_interval):
+                self.flush()
+            return row
+
+    def flush(self):
+        """Commit the open batch"""
+        with self.lock:
+            if self.connection is None:
+                return
+            if self.connection.in_transaction:
+                self.connection.execute("COMMIT")
+            self.pending = 0
+            self.last_flush = time.monotonic()
+
+    def close(self):
+        with self.lock:
+            if self.connection is None:
+                return
+            self.flush()
+            self.connection.close()
+            self.connection = None
+
+    def query(self, sql, params=()):
+        with self.lock:
+            return self.connect().execute(sql, params).fetchall()
+
+    def read_since(self, cursor=0, max_rows=100000):
+        """Rows with an id above the cursor; returns (rows, new_cursor) like read_rows_since"""
+        rows = self.query(f"SELECT {COLUMNS} FROM switches WHERE id > ? ORDER BY id LIMIT ?",
+                          (cursor, max_rows))
+        return [list(row) for row in rows], rows[-1][0] if rows else cursor
+
+    def tail(self, cutoff, before=None):
+        """Rows with cutoff < timestamp <= before as (epoch, row), oldest first, via the index"""
+        if before is None:
+            rows = self.query(f"SELECT epoch, {COLUMNS} FROM switches WHERE epoch > ? ORDER BY epoch, id",
+                              (cutoff,))
+        else:
+            rows = self.query(f"SELECT epoch, {COLUMNS} FROM switches WHERE epoch > ? AND epoch <= ? "
+                              "ORDER BY epoch, id", (cutoff, before))
+        return [(row[0], list(row[1:])) for row in rows]
+
+    def aggregate(self, start=None, end=None):
+        """Duration count/sum/sum of squares/min/max for (start, end], answered by SQLite"""
+        sql = "SELECT COUNT(*), TOTAL(duration), TOTAL(duration * duration), MIN(duration), MAX(duration) FROM switches"
+        conditions, params = [], []
+        if start is not None:
+            conditions.append("epoch > ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("epoch <= ?")
+            params.append(end)
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        count, total, sumsq, low, high = self.query(sql, params)[0]
+        return {"count": count, "sum": total, "sumsq": sumsq, "min": low, "max": high}
+
+
+def import_csv(src_path, db_path, delimiter=','):
+    """Copy an existing CSV/TSV switch log into SQLite in one transaction, keeping the ids"""
+    log = SqliteSwitchLog(db_path)
+    if log.next_id > 1:
+        raise ValueError(f"{db_path} already contains switches")
+    imported = 0
+    batch = []
+    with open(src_path, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        next(reader, None)
+        with log.lock:
+            log.connection.execute("BEGIN")
+            for row in reader:
+                try:
+                    when = datetime.datetime.fromisoformat(row[1])
+                    batch.append((int(row[0]), when.isoformat(), when.timestamp(), row[2], row[3], int(row[4] or 0)))
+                except (ValueError, IndexError):
+                    print(f"Skipping malformed row: {row}")
+                    continue
+                if len(batch) >= 10000:
+                    log.connection.executemany("INSERT INTO switches VALUES (?, ?, ?, ?, ?, ?)", batch)
+                    imported += len(batch)
+                    batch = []
+            log.connection.executemany("INSERT INTO switches VALUES (?, ?, ?, ?, ?, ?)", batch)
+            imported += len(batch)
+            log.connection.execute("COMMIT")
+    log.close()
+    return imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import a CSV/TSV switch log into SQLite")
+    parser.add_argument("src", help="Existing task_tracker_data.csv or .tsv")
+    parser.add_argument("dst", help="Output database, e.g. ~/task_switch/data/task_tracker_data.db")
+    args = parser.parse_args()
+
+    delimiter = '\t' if args.src.endswith('.tsv') else ','
+    imported = import_csv(args.src, os.path.expanduser(args.dst), delimiter)
+    print(f"Imported {imported} rows into {args.dst}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,61 @@
-import time
 import datetime
-import subprocess
 import os
-import threading
 import csv
-import pystray
-from pystray import MenuItem as item
-from PIL import Image, ImageDraw
-import pandas as pd
-import sys 
+import json
+from running_stats import DurationAggregate
+from switch_log import read_rows_since, read_tail
+import metrics
+
+SNAPSHOT_FIELDS = ["timestamp", "count", "mean", "median", "std", "min", "max",
+                   "sum", "sumsq", "source", "offset", "last_id", "sketch"]
+
 
 class StatsStorage:
-    def __init__(self, base_dir="~/task_switch"):
-        """Initialize the stats storage with configurable base directory"""
+    def __init__(self, base_dir="~/task_switch", switch_log=None, checkpoint_every=100,
+                 max_snapshot_bytes=4 * 1024 * 1024):
+        """
+        Initialize the stats storage with configurable base directory
+        
+        Duration statistics are kept as a mergeable aggregate (count, sum, sum of
+        squares, min, max and a quantile sketch). Every checkpoint_every new rows
+        a snapshot of it is appended to duration_stats.csv, tagged with the last
+        row id and log cursor it covers; on startup the latest snapshot is loaded
+        and only the rows after it are read.
+        
+        Args:
+            switch_log: The tracker's switch log to read new rows from (any storage
+                        format). Defaults to reading task_tracker_data.csv directly.
+            checkpoint_every: Append a snapshot after this many new rows
+            max_snapshot_bytes: Once duration_stats.csv is larger, it is rewritten
+                                with only the latest snapshot
+        """
         # Set up paths
         self.base_dir = os.path.expanduser(base_dir)
         self.data_dir = os.path.join(self.base_dir, "data")
         self.tracker_data_path = os.path.join(self.data_dir, "task_tracker_data.csv")
         self.stats_path = os.path.join(self.data_dir, "duration_stats.csv")
+        self.switch_log = switch_log
+        self.source_path = switch_log.data_path if switch_log else self.tracker_data_path
+        self.checkpoint_every = max(1, checkpoint_every)
+        self.max_snapshot_bytes = max_snapshot_bytes
         # Create directory if needed
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir, exist_ok=True)
             print(f"Created data directory at {self.data_dir}")
+        
+        # Streaming statistics, restored from the latest snapshot and caught up lazily
+        self.reset()
+        self.load_checkpoint()
+
+    def reset(self):
+        self.durations = DurationAggregate()
+        self.tracker_offset = 0
+        self.last_id = 0
+        self.since_checkpoint = 0
 
     def read_tracker_data(self):
         """Read the tracker data into a pandas DataFrame"""
+        import pandas as pd
         try:
             df = pd.read_csv(self.tracker_data_path)
             print(f"Read {len(df)} records from {self.tracker_data_path}")
@@ -33,46 +64,234 @@ class StatsStorage:
             print(f"Warning: Data file not found at {self.tracker_data_path}")
             return pd.DataFrame(columns=["id", "timestamp", "app_from", "app_to", "duration"])
     
+    def read_last_snapshot(self):
+        """
+        The newest complete snapshot row in duration_stats.csv as a dict, or None
+        (also for a file in the old format, which save_checkpoint moves aside)
+        """
+        with open(self.stats_path, 'rb') as f:
+            header = next(csv.reader([f.readline().decode('utf-8', 'replace')]), [])
+            if header != SNAPSHOT_FIELDS:
+                return None
+            end = f.seek(0, os.SEEK_END)
+            block = 64 * 1024
+            while True:
+                start = max(0, end - block)
+                f.seek(start)
+                lines = f.read(end - start).split(b'\n')
+                # A crash can leave the last line torn; take the newest one that parses
+                for line in reversed(lines[1:] if start else lines):
+                    values = next(csv.reader([line.decode('utf-8', 'replace')]), [])
+                    if len(values) != len(SNAPSHOT_FIELDS) or values == SNAPSHOT_FIELDS:
+                        continue
+                    try:
+                        snapshot = dict(zip(SNAPSHOT_FIELDS, values))
+                        snapshot["sketch"] = json.loads(snapshot["sketch"])
+                        return snapshot
+                    except ValueError:
+                        continue
+                if start == 0:
+                    return None
+                block *= 4
+
+    def load_checkpoint(self):
+        """Restore the statistics from the latest snapshot in duration_stats.csv"""
+        try:
+            snapshot = self.read_last_snapshot()
+            if snapshot is None:
+                return
+            if snapshot["source"] != self.source_path:
+                print(f"Statistics snapshot is for {snapshot['source']}, rebuilding")
+                return
+            self.durations = DurationAggregate.from_dict({
+                "count": int(snapshot["count"]),
+                "sum": int(snapshot["sum"]),
+                "sumsq": int(snapshot["sumsq"]),
+                "min": int(snapshot["min"]) if snapshot["min"] else None,
+                "max": int(snapshot["max"]) if snapshot["max"] else None,
+                "sketch": snapshot["sketch"],
+            })
+            self.tracker_offset = json.loads(snapshot["offset"])
+            self.last_id = int(snapshot["last_id"])
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Ignoring unreadable statistics snapshot in {self.stats_path}: {e}")
+            self.reset()
+    
+    def migrate_legacy_stats(self):
+        """
+        Move a duration_stats.csv written in the old format (one row of
+        statistics per run, no log cursor) to duration_stats.legacy.csv, so the
+        next snapshot starts a new file instead of being appended to it
+        """
+        try:
+            with open(self.stats_path, 'rb') as f:
+                first_line = f.readline()
+        except FileNotFoundError:
+            return False
+        header = next(csv.reader([first_line.decode('utf-8', 'replace')]), [])
+        if not first_line or header == SNAPSHOT_FIELDS:
+            return False
+        legacy_path = os.path.join(self.data_dir, "duration_stats.legacy.csv")
+        os.replace(self.stats_path, legacy_path)
+        print(f"Moved old-format statistics from {self.stats_path} to {legacy_path}")
+        return True
+
+    def save_checkpoint(self):
+        """Append a snapshot of the statistics with the row id and log cursor it covers"""
+        durations = self.durations
+        snapshot = {
+            "timestamp": datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "count": durations.count,
+            "mean": durations.mean if durations.count else "",
+            "median": durations.quantile(0.5) if durations.count else "",
+            "std": durations.std() if durations.count > 1 else "",
+            "min": "" if durations.min is None else durations.min,
+            "max": "" if durations.max is None else durations.max,
+            "sum": durations.total,
+            "sumsq": durations.sumsq,
+            "source": self.source_path,
+            "offset": json.dumps(self.tracker_offset),
+            "last_id": self.last_id,
+            "sketch": json.dumps(durations.sketch.to_dict(), separators=(',', ':')),
+        }
+        self.migrate_legacy_stats()
+        try:
+            size = os.path.getsize(self.stats_path)
+        except FileNotFoundError:
+            size = 0
+        # Snapshots are cumulative, so only the latest one is needed to restart
+        mode = 'w' if size == 0 or size > self.max_snapshot_bytes else 'a'
+        tmp_path = self.stats_path + ".tmp" if mode == 'w' else self.stats_path
+        with open(tmp_path, mode, newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=SNAPSHOT_FIELDS)
+            if mode == 'w':
+                writer.writeheader()
+            writer.writerow(snapshot)
+        if mode == 'w':
+            os.replace(tmp_path, self.stats_path)
+        self.since_checkpoint = 0
+    
+    def read_since(self, offset):
+        """New rows after offset from whichever log backs the statistics"""
+        if self.switch_log is not None:
+            return self.switch_log.read_since(offset)
+        return read_rows_since(self.tracker_data_path, offset)
+    
+    def update_statistics(self):
+        """Fold rows appended since the last call into the streaming statistics"""
+        if self.switch_log is None:
+            try:
+                size = os.path.getsize(self.tracker_data_path)
+            except FileNotFoundError:
+                return 0
+            if size < self.tracker_offset:
+                # Data file was truncated or replaced, start over
+                print(f"Tracker data shrank, rebuilding statistics from {self.tracker_data_path}")
+                self.reset()
+        
+        added = 0
+        while True:
+            rows, self.tracker_offset = self.read_since(self.tracker_offset)
+            if not rows:
+                break
+            for row in rows:
+                if len(row) > 4 and row[4] not in (None, ""):
+                    try:
+                        row_id = int(row[0])
+                        duration = int(row[4])
+                    except ValueError:
+                        print(f"Error parsing duration in row: {row}")
+                        continue
+                    if row_id <= self.last_id:
+                        continue
+                    self.last_id = row_id
+                    self.durations.add(duration)
+                    added += 1
+        self.since_checkpoint += added
+        if self.since_checkpoint >= self.checkpoint_every:
+            self.save_checkpoint()
+        return added
+    
+    @metrics.timed("calculate_statistics")
     def calculate_statistics(self):
         """Calculate key statistics from the tracker data"""
-        df = self.read_tracker_data()
+        self.update_statistics()
+        durations = self.durations
         
-        if len(df) == 0:
+        if durations.count == 0:
             print("No data available for statistics calculation")
             return {}
         
         stats = {
             "timestamp": datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            "count": len(df),
-            "mean": df['duration'].mean(),
-            "median": df['duration'].median(),
-            "std": df['duration'].std(),
-            "min": df['duration'].min(),
-            "max": df['duration'].max()
+            "count": durations.count,
+            "mean": durations.mean,
+            "median": durations.quantile(0.5),
+            "std": durations.std(),
+            "min": durations.min,
+            "max": durations.max
         }
         
         return stats
     
+    def statistics_between(self, start, end=None):
+        """
+        Statistics for switches recorded between two datetimes (end defaults to now).
+        A partitioned log answers from its manifest and opens only the partitions
+        the range cuts through; other logs scan just the requested range.
+        """
+        start_epoch = start.timestamp()
+        end_epoch = (end or datetime.datetime.now()).timestamp()
+        if self.switch_log is not None and hasattr(self.switch_log, "aggregate"):
+            totals = self.switch_log.aggregate(start_epoch, end_epoch)
+        else:
+            if self.switch_log is not None:
+                rows = self.switch_log.tail(start_epoch, end_epoch)
+            else:
+                rows = read_tail(self.tracker_data_path, start_epoch, end_epoch)
+            totals = {"count": 0, "sum": 0, "sumsq": 0, "min": None, "max": None}
+            for _, row in rows:
+                try:
+                    duration = int(row[4])
+                except (ValueError, IndexError):
+                    continue
+                totals["count"] += 1
+                totals["sum"] += duration
+                totals["sumsq"] += duration * duration
+                totals["min"] = duration if totals["min"] is None else min(totals["min"], duration)
+                totals["max"] = duration if totals["max"] is None else max(totals["max"], duration)
+        
+        count = totals["count"]
+        if count == 0:
+            return {}
+        mean = totals["sum"] / count
+        variance = (totals["sumsq"] - count * mean * mean) / (count - 1) if count > 1 else float("nan")
+        return {
+            "start": start.strftime('%Y-%m-%d %H:%M:%S'),
+            "end": (end or datetime.datetime.now()).strftime('%Y-%m-%d %H:%M:%S'),
+            "count": count,
+            "mean": mean,
+            "std": max(0.0, variance) ** 0.5 if count > 1 else variance,
+            "min": totals["min"],
+            "max": totals["max"]
+        }
+    
     def save_statistics(self):
-        """Calculate and save statistics to CSV file"""
-        stats = self.calculate_statistics()
+        """Catch up and append a statistics snapshot to duration_stats.csv"""
+        self.update_statistics()
         
-        if not stats:
+        if self.durations.count == 0:
             print("No statistics to save")
             return None
         
-        file_exists = os.path.isfile(self.stats_path)
-        
-        with open(self.stats_path, 'a') as f:
-            # Write header if file doesn't exist
-            if not file_exists:
-                header = ','.join(stats.keys())
-                f.write(f"{header}\n")
-            
-            # Write values
-            values = ','.join(str(v) for v in stats.values())
-            f.write(f"{values}\n")
-        
+        self.save_checkpoint()
         print(f"Statistics saved to {self.stats_path}")
         return self.stats_path
-    
\ No newline at end of file
+    
+    def close(self):
+        """Snapshot rows folded since the last snapshot, so the next start reads none of them"""
+        self.update_statistics()
+        if self.since_checkpoint:
+            self.save_checkpoint()
@@ -0,0 +1,72 @@
+import os
+import json
+import threading
+
+
+class StringTable:
+    def __init__(self, path=None, read_only=False):
+        """
+        Append-only string interning table: each distinct string gets a small
+        integer id, assigned in order of first appearance.
+
+        Args:
+            path: File to persist the table to (one JSON string per line, the
+                  line number is the id). None keeps the table in memory only.
+            read_only: Open a table another process writes: the file is never
+                       truncated or appended to, and strings interned here
+                       stay in memory
+        """
+        self.path = path
+        self.read_only = read_only
+        self.strings = []
+        self.ids = {}
+        self.lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def load(self):
+        size = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # Torn last entry (or one being written); no row can reference it yet
+                    break
+                value = json.loads(line)
+                self.ids[value] = len(self.strings)
+                self.strings.append(value)
+                size += len(line)
+        if self.read_only:
+            return
+        # Drop a torn trailing entry so the next append starts on a clean line
+        if os.path.getsize(self.path) > size:
+            with open(self.path, 'rb+') as f:
+                f.truncate(size)
+
+    def intern(self, value):
+        """Id for value, adding it to the table (and to disk) if it is new"""
+        value = "" if value is None else str(value)
+        string_id = self.ids.get(value)
+        if string_id is not None:
+            return string_id
+        with self.lock:
+            string_id = self.ids.get(value)
+            if string_id is None:
+                string_id = len(self.strings)
+                if self.path is not None and not self.read_only:
+                    # Written before any record references the id
+                    with open(self.path, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps(value) + '\n')
+                self.strings.append(value)
+                self.ids[value] = string_id
+        return string_id
+
+    def lookup(self, string_id):
+        """String for an id"""
+        return self.strings[string_id]
+
+    def get(self, value):
+        """Id for value without adding it (None if unknown)"""
+        return self.ids.get(value)
+
+    def __len__(self):
+        return len(self.strings)
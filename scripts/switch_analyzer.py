@@ -1,76 +1,121 @@
 import time
 import datetime
-import subprocess
-import os
-import threading
-import csv
-import pystray
-from pystray import MenuItem as item
-from PIL import Image, ImageDraw
-import pandas as pd
-import sys
+import metrics
 
 class TaskSwitchAnalyzer:
-    def __init__(self, task_tracker, stats_storage):
+    def __init__(self, task_tracker, stats_storage, snapshot=None, threshold_ratio=0.5,
+                 min_switches=5, clock=time.time, baselines=None, sketches=None, percentile=None,
+                 history_days=None, stats_days=None):
         """
         Initialize analyzer with reference to TaskTracker for data access
         
         Args:
             task_tracker: TaskTracker instance that contains data path information
+            snapshot: Optional AnalysisSnapshot shared with DesktopColor, so the
+                      history is only read once per tick
+            threshold_ratio: Switching is excessive when the recent mean duration is
+                             below this fraction of the historical mean
+            min_switches: Fewer recent switches than this is never excessive
+            clock: Returns the current epoch; the replay engine passes a simulated one
+            baselines: Optional HourOfWeekBaselines; checks compare against the
+                       current hour-of-week bucket when it has enough history
+            sketches: Optional DurationSketches, used when percentile is set
+            percentile: Switching is excessive when the recent median duration is
+                        below this quantile (0..1) of past sessions, e.g. 0.25 for
+                        "below my p25". Falls back to the mean comparison until the
+                        sketches hold enough history.
+            history_days: Only compare against the last N days of sessions (None = all)
+            stats_days: Compare the recent mean with the mean of the last N days
+                        (StatsStorage.statistics_between, which partitioned and
+                        SQLite logs answer from their manifest or index) instead
+                        of all history (None)
         """
         self.task_tracker = task_tracker
         self.stats_storage = stats_storage
+        self.snapshot = snapshot
+        self.threshold_ratio = threshold_ratio
+        self.min_switches = min_switches
+        self.clock = clock
+        self.baselines = baselines
+        self.sketches = sketches
+        self.percentile = percentile
+        self.history_days = history_days
+        self.stats_days = stats_days
         
+    @metrics.timed("read_recent_switches")
     def read_recent_switches(self, minutes=1):
-        """Read switches from CSV/TSV file within the last X minutes"""
-        time_window = datetime.datetime.now() - datetime.timedelta(minutes=minutes)
-        recent_switches = []
-        
-        try:
-            with open(self.task_tracker.data_path, 'r', newline='') as f:
-                reader = csv.reader(f, delimiter=self.task_tracker.delimiter)
-                # Skip header
-                next(reader, None)
-                
-                for row in reader:
-                    if len(row) >= 2:  # Make sure there's at least an ID and timestamp
-                        try:
-                            # Parse the timestamp (format: 2025-05-13T14:30:45.123456)
-                            timestamp = datetime.datetime.fromisoformat(row[1])
-                            if timestamp > time_window:
-                                recent_switches.append(row)
-                        except (ValueError, IndexError) as e:
-                            print(f"Error parsing row: {row}, {e}")
-            
-            return recent_switches
-        except FileNotFoundError:
-            print(f"Data file not found: {self.task_tracker.data_path}")
-            return []
+        """Switches within the last X minutes, served from the tracker's in-memory buffer"""
+        now = self.clock()
+        if self.snapshot is not None:
+            return self.snapshot.read_recent_switches(minutes, now)
+        return self.task_tracker.recent.window(minutes, now)
+    
+    def calculate_statistics(self):
+        """
+        Historical statistics for now: the hour-of-week baseline when there is
+        one with enough history, otherwise the global statistics (through the
+        shared snapshot when there is one)
+        """
+        if self.baselines is not None:
+            stats = self.baselines.statistics_at(self.clock())
+            if stats:
+                return stats
+        if self.stats_days:
+            end = datetime.datetime.fromtimestamp(self.clock())
+            start = end - datetime.timedelta(days=self.stats_days)
+            if self.snapshot is not None:
+                return self.snapshot.statistics_between(start, end)
+            return self.stats_storage.statistics_between(start, end)
+        if self.snapshot is not None:
+            return self.snapshot.calculate_statistics()
+        return self.stats_storage.calculate_statistics()
+    
+    def historical_percentile(self):
+        """The configured percentile of past session durations, or None without enough history"""
+        if self.sketches is None or self.percentile is None:
+            return None
+        start = None
+        if self.history_days:
+            now = datetime.datetime.fromtimestamp(self.clock())
+            start = (now - datetime.timedelta(days=self.history_days)).date()
+        return self.sketches.percentile(self.percentile, start=start)
+    
     def check_excessive_task_switching(self, minutes=1):
+        # numpy is only loaded once the first check runs, not at startup
+        from scoring import durations_array, recency_scores
     # Get recent switches
         recent_switches = self.read_recent_switches(minutes)
     
     # If we don't have enough recent switches, no excessive switching
-        if len(recent_switches) < 5:
+        if len(recent_switches) < self.min_switches:
             return False
     
     # Calculate average duration of recent app sessions
-        recent_durations = [int(switch[4]) for switch in recent_switches if len(switch) > 4 and switch[4]]
-        #print(recent_durations)
-        if not recent_durations:
+        scores = recency_scores(durations_array(recent_switches))
+        if not scores["count"]:
             return False
         
-        recent_avg_duration = sum(recent_durations) / len(recent_durations)
+        recent_avg_duration = scores["mean"]
+        
+    # Percentile mode: compare the recent median with a quantile of past sessions
+        threshold = self.historical_percentile()
+        if threshold is not None:
+            print(f"Recent median duration: {scores['median']:.1f}s, "
+                  f"Historical p{self.percentile * 100:g}: {threshold:.1f}s")
+            if scores["median"] < threshold:
+                print("EXCESSIVE TASK SWITCHING DETECTED - User isn't staying in apps long enough!")
+                return True
+            return False
     
     # Get historical statistics
-        historical_stats = self.stats_storage.calculate_statistics()
+        historical_stats = self.calculate_statistics()
     
     # Check if recent average duration is significantly lower than historical mean
         if historical_stats and 'mean' in historical_stats:
             historical_mean_duration = historical_stats['mean']
         
         # If recent durations are less than 50% of typical durations, that's excessive switching
-            threshold_ratio = 0.5  # This can be adjusted based on desired sensitivity
+            threshold_ratio = self.threshold_ratio  # Adjust sensitivity via the constructor
         
             print(f"Recent avg duration: {recent_avg_duration:.1f}s, Historical mean: {historical_mean_duration:.1f}s")
         
@@ -0,0 +1,262 @@
+import os
+import csv
+import time
+import threading
+import datetime
+
+HEADER = ['id', 'timestamp', 'app_from', 'app_to', 'duration']
+
+
+class CsvSwitchLog:
+    def __init__(self, data_path, delimiter=',', flush_every=1, flush_interval=None,
+                 fsync=False, checkpoint_every=100, read_only=False):
+        """
+        Append-only CSV/TSV switch log that never rescans the file to find the next id
+
+        Args:
+            data_path: Path to the CSV/TSV file
+            delimiter: ',' for CSV or '\\t' for TSV
+            flush_every: Flush the buffered writer after this many records
+            flush_interval: Also flush if this many seconds passed since the last flush (None = off)
+            fsync: Call os.fsync after every flush so records survive a power loss
+            checkpoint_every: Persist the id/offset counter after this many records
+            read_only: Read a log the tracker writes to: no torn-row repair, no
+                       counter file, no appends
+        """
+        self.data_path = data_path
+        self.delimiter = delimiter
+        self.counter_path = data_path + ".counter"
+        self.flush_every = max(1, flush_every)
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.checkpoint_every = max(1, checkpoint_every)
+        self.read_only = read_only
+
+        self.file = None
+        self.writer = None
+        self.pending = 0
+        self.since_checkpoint = 0
+        self.last_flush = time.monotonic()
+        # The tray thread may close the log while the tracking thread appends
+        self.lock = threading.RLock()
+
+        self.next_id, self.offset = self.recover_counter()
+
+    def count_lines(self, start=0):
+        """Count newline-terminated lines from a byte offset to the end of the file"""
+        count = 0
+        with open(self.data_path, 'rb') as f:
+            f.seek(start)
+            while True:
+                chunk = f.read(1 << 20)
+                if not chunk:
+                    break
+                count += chunk.count(b'\n')
+        return count
+
+    def repair_tail(self):
+        """
+        Truncate a torn last row (no trailing newline) left by a crash mid-write,
+        so the next append does not run into it. Returns the bytes removed.
+        """
+        with open(self.data_path, 'rb+') as f:
+            size = f.seek(0, os.SEEK_END)
+            if size == 0:
+                return 0
+            f.seek(size - 1)
+            if f.read(1) == b'\n':
+                return 0
+            # Walk back to the last complete line
+            position = size
+            while position > 0:
+                read_size = min(64 << 10, position)
+                position -= read_size
+                f.seek(position)
+                newline = f.read(read_size).rfind(b'\n')
+                if newline >= 0:
+                    position += newline + 1
+                    break
+            f.truncate(position)
+            if position == 0:
+                # Even the header was torn; put it back so row 1 is not taken for it
+                f.seek(0)
+                f.write((self.delimiter.join(HEADER) + '\r\n').encode('utf-8'))
+        print(f"Removed a torn {size - position}-byte row from the end of {self.data_path}")
+        return size - position
+
+    def recover_counter(self):
+        """
+        Recover (next_id, offset) on startup.
+
+        The counter file stores the next id and the byte offset it was valid for,
+        so only the rows appended after the last checkpoint have to be counted.
+        """
+        if not os.path.exists(self.data_path):
+            return 1, 0
+
+        if not self.read_only:
+            self.repair_tail()
+        size = os.path.getsize(self.data_path)
+        next_id, offset = None, 0
+        try:
+            with open(self.counter_path, 'r') as f:
+                next_id, offset = (int(v) for v in f.read().split())
+        except (FileNotFoundError, ValueError):
+            next_id = None
+
+        if next_id is None or offset > size:
+            # No usable checkpoint: count once, header counts as 1 like before
+            next_id = max(1, self.count_lines())
+        else:
+            next_id += self.count_lines(offset)
+        if not self.read_only:
+            self.write_counter(next_id, size)
+        return next_id, size
+
+    def write_counter(self, next_id, offset):
+        """Atomically persist the id/offset counter next to the data file"""
+        tmp_path = self.counter_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(f"{next_id} {offset}\n")
+        os.replace(tmp_path, self.counter_path)
+
+    def open(self):
+        """Open the long-lived buffered writer"""
+        if self.read_only:
+            raise ValueError(f"{self.data_path} is open read-only")
+        if self.file is None:
+            self.file = open(self.data_path, 'a', newline='')
+            self.writer = csv.writer(self.file, delimiter=self.delimiter)
+
+    def append(self, when, app_from, app_to, duration):
+        """Append one switch (when is a datetime) and return the row that was written"""
+        with self.lock:
+            self.open()
+            row = [self.next_id, when.isoformat(), app_from, app_to, duration]
+            self.writer.writerow(row)
+            self.next_id += 1
+            self.pending += 1
+            self.since_checkpoint += 1
+
+            if self.pending >= self.flush_every or (
+                    self.flush_interval is not None
+                    and time.monotonic() - self.last_flush >= self.flush_interval):
+                self.flush()
+            return row
+
+    def flush(self):
+        """Flush buffered rows to disk according to the fsync policy"""
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.flush()
+            if self.fsync:
+                os.fsync(self.file.fileno())
+            self.offset = self.file.tell()
+            self.pending = 0
+            self.last_flush = time.monotonic()
+
+            if self.since_checkpoint >= self.checkpoint_every:
+                self.write_counter(self.next_id, self.offset)
+                self.since_checkpoint = 0
+
+    def close(self):
+        """Flush, checkpoint the counter and release the file handle"""
+        with self.lock:
+            if self.file is None:
+                return
+            self.flush()
+            self.write_counter(self.next_id, self.offset)
+            self.since_checkpoint = 0
+            self.file.close()
+            self.file = None
+            self.writer = None
+
+    def read_since(self, offset=0):
+        """Rows appended after a byte offset; returns (rows, new_offset)"""
+        return read_rows_since(self.data_path, offset, self.delimiter)
+
+    def tail(self, cutoff, before=None):
+        """
+        Rows with cutoff < timestamp <= before as (epoch, row), oldest first.
+        Seeks backward from the end of the file, so only the tail is read.
+        """
+        self.flush()
+        return read_tail(self.data_path, cutoff, before, self.delimiter)
+
+
+def read_rows_since(data_path, offset=0, delimiter=',', max_bytes=8 << 20):
+    """
+    Read the complete rows appended after a byte offset.
+
+    Returns (rows, new_offset). At most max_bytes are read per call, so callers
+    catching up on a large file should loop until no rows come back. A trailing
+    line without a newline is left for the next call, so a row that is still
+    being written is never half-read. When offset is 0 the header row is skipped.
+    """
+    try:
+        with open(data_path, 'rb') as f:
+            f.seek(offset)
+            data = f.read(max_bytes)
+    except FileNotFoundError:
+        return [], offset
+
+    end = data.rfind(b'\n') + 1
+    if end == 0:
+        return [], offset
+    lines = data[:end].decode('utf-8').splitlines()
+    if offset == 0 and lines:
+        lines = lines[1:]
+    rows = list(csv.reader(lines, delimiter=delimiter))
+    return rows, offset + end
+
+
+def iter_rows_reversed(data_path, delimiter=',', block_size=64 << 10):
+    """Yield complete rows newest first by reading the file backward in blocks"""
+    try:
+        f = open(data_path, 'rb')
+    except FileNotFoundError:
+        return
+    with f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        remainder = b''
+        first_block = True
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            chunk = f.read(read_size) + remainder
+            lines = chunk.split(b'\n')
+            if first_block:
+                if len(lines) == 1 and position > 0:
+                    # No newline yet: the row still being written spans blocks
+                    remainder = chunk
+                    continue
+                # Whatever follows the last newline is a row still being written
+                lines.pop()
+                first_block = False
+            # The first piece may be cut mid-line; keep it for the next block
+            remainder = lines.pop(0) if position > 0 and lines else b''
+            for line in reversed(lines):
+                if line:
+                    yield next(csv.reader([line.decode('utf-8')], delimiter=delimiter))
+
+
+def read_tail(data_path, cutoff, before=None, delimiter=','):
+    """Rows with cutoff < timestamp <= before as (epoch, row), oldest first"""
+    rows = []
+    for row in iter_rows_reversed(data_path, delimiter):
+        if len(row) < 2 or row[0] == HEADER[0]:
+            continue
+        try:
+            epoch = datetime.datetime.fromisoformat(row[1]).timestamp()
+        except ValueError as e:
+            print(f"Error parsing row: {row}, {e}")
+            continue
+        if epoch <= cutoff:
+            break
+        if before is None or epoch <= before:
+            rows.append((epoch, row))
+    rows.reverse()
+    return rows
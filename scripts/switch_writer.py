@@ -0,0 +1,142 @@
+import time
+import queue
+import threading
+
+# Put on the queue by close() to stop the writer after everything before it is written
+_STOP = object()
+
+
+class SwitchWriter:
+    def __init__(self, task_tracker, max_queue=1000, batch_size=50, block_timeout=0.01):
+        """
+        Moves persistence off the sampling thread.
+
+        The sampler submits switches with the time it observed them; a dedicated
+        writer thread drains the bounded queue in batches, records each switch
+        with its sample timestamp (so durations do not include write latency)
+        and flushes the log once per batch.
+
+        When the queue is full submit waits up to block_timeout seconds
+        (counted as backpressure) and then drops the switch (counted as dropped)
+        rather than stalling sampling.
+
+        Args:
+            task_tracker: TaskTracker whose record_app_switch does the writing
+            max_queue: Switches that can be waiting before backpressure starts
+            batch_size: Most switches written between two flushes
+            block_timeout: Seconds submit may wait for space in a full queue
+        """
+        self.task_tracker = task_tracker
+        self.max_queue = max_queue
+        self.batch_size = max(1, batch_size)
+        self.block_timeout = block_timeout
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.thread = None
+        # Set once close() queued _STOP, until the thread has actually exited
+        self.stopping = False
+        self.lock = threading.Lock()
+        self.counters = {
+            "submitted": 0,
+            "written": 0,
+            "dropped": 0,
+            "blocked": 0,
+            "failed": 0,
+            "batches": 0,
+            "max_depth": 0,
+            "max_lag_ms": 0.0,
+        }
+
+    def start(self):
+        """Start the writer thread (no-op if it is already running)"""
+        if self.thread is not None and self.thread.is_alive():
+            if not self.stopping:
+                return
+            # A close() timed out: the old thread still has switches to write
+            # before it reaches _STOP, and two writers must never share the log
+            self.thread.join()
+        self.stopping = False
+        self.thread = threading.Thread(target=self.run, name="switch-writer")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def submit(self, app_from, app_to, timestamp):
+        """Queue a switch observed at timestamp (a datetime); returns False if it was dropped"""
+        item = (app_from, app_to, timestamp, time.monotonic())
+        with self.lock:
+            self.counters["submitted"] += 1
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            with self.lock:
+                self.counters["blocked"] += 1
+            try:
+                self.queue.put(item, timeout=self.block_timeout)
+            except queue.Full:
+                with self.lock:
+                    self.counters["dropped"] += 1
+                print(f"Switch queue full, dropped {app_from} -> {app_to}")
+                return False
+        depth = self.queue.qsize()
+        with self.lock:
+            self.counters["max_depth"] = max(self.counters["max_depth"], depth)
+        return True
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = any(item is _STOP for item in batch)
+            self.write_batch([item for item in batch if item is not _STOP])
+            if stopping:
+                return
+
+    def write_batch(self, batch):
+        if not batch:
+            return
+        written = 0
+        lag = 0.0
+        for app_from, app_to, timestamp, queued_at in batch:
+            try:
+                self.task_tracker.record_app_switch(app_from, app_to, timestamp)
+                written += 1
+            except Exception as e:
+                print(f"Error recording switch {app_from} -> {app_to}: {e}")
+                with self.lock:
+                    self.counters["failed"] += 1
+            lag = max(lag, time.monotonic() - queued_at)
+        try:
+            self.task_tracker.flush()
+        except Exception as e:
+            print(f"Error flushing switch log: {e}")
+        with self.lock:
+            self.counters["written"] += written
+            self.counters["batches"] += 1
+            self.counters["max_lag_ms"] = max(self.counters["max_lag_ms"], lag * 1000)
+
+    def close(self, timeout=5.0):
+        """Write everything still queued, then stop the writer thread"""
+        if self.thread is None:
+            return
+        if not self.stopping:
+            self.stopping = True
+            # Waits for space if the queue is full; the writer is still draining it
+            self.queue.put(_STOP)
+        self.thread.join(timeout)
+        if self.thread.is_alive():
+            # Keep the handle so start() waits for this thread instead of adding a second one
+            print(f"Switch writer still busy after {timeout}s, {self.queue.qsize()} switches pending")
+            return
+        self.thread = None
+        self.stopping = False
+
+    def report(self):
+        """Queue depth, backpressure, drop and batching counters"""
+        with self.lock:
+            report = dict(self.counters)
+        report["depth"] = self.queue.qsize()
+        report["mean_batch"] = report["written"] / report["batches"] if report["batches"] else 0.0
+        return report
@@ -0,0 +1,92 @@
+import os
+import csv
+import math
+import random
+import argparse
+import datetime
+
+HEADER = ['id', 'timestamp', 'app_from', 'app_to', 'duration']
+
+
+def app_names(app_count):
+    """Plausible app names, padded with numbered ones for large app counts"""
+    common = ["Code", "Google Chrome", "Slack", "Terminal", "Mail", "Zoom", "Notion",
+              "Finder", "Spotify", "Messages", "Calendar", "Preview", "Safari", "Obsidian"]
+    names = common[:app_count]
+    names += [f"App {i}" for i in range(len(names), app_count)]
+    return names
+
+
+def generate_rows(rows, app_count=12, mean_session=45.0, end=None, seed=0):
+    """
+    Yield realistic switch rows, oldest first, ending at `end` (default now).
+
+    App popularity follows a Zipf-like curve, session lengths are log-normal
+    around mean_session seconds, and roughly one session in twenty is a long
+    focus block, so short bursts and long dwell times both show up.
+    """
+    apps = app_names(app_count)
+    weights = [1.0 / (rank + 1) for rank in range(app_count)]
+    # Log-normal with the requested mean: mean = exp(mu + sigma^2 / 2)
+    sigma = 1.0
+    mu = math.log(mean_session) - sigma ** 2 / 2
+
+    def durations():
+        # Drawn twice from the same seed (once to find the start time) so
+        # ten million rows never have to sit in memory
+        rng = random.Random(seed)
+        for _ in range(rows):
+            duration = rng.lognormvariate(mu, sigma)
+            if rng.random() < 0.05:
+                duration *= 10
+            yield max(0, int(duration)), rng.randrange(1000000)
+
+    end = datetime.datetime.now() if end is None else end
+    total = sum(duration + micros / 1000000 for duration, micros in durations())
+    when = end - datetime.timedelta(seconds=total)
+    app_rng = random.Random(seed + 1)
+    current = app_rng.choices(apps, weights)[0]
+    for i, (duration, micros) in enumerate(durations()):
+        when += datetime.timedelta(seconds=duration, microseconds=micros)
+        if when > end:
+            when = end
+        new_app = current
+        while new_app == current and app_count > 1:
+            new_app = app_rng.choices(apps, weights)[0]
+        yield [i + 1, when.isoformat(), current, new_app, duration]
+        current = new_app
+
+
+def write_log(path, rows, app_count=12, mean_session=45.0, delimiter=',', seed=0, end=None):
+    """Write a synthetic CSV/TSV switch log with a header, like TaskTracker does"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f, delimiter=delimiter)
+        writer.writerow(HEADER)
+        batch = []
+        for row in generate_rows(rows, app_count, mean_session, end, seed):
+            batch.append(row)
+            if len(batch) >= 10000:
+                writer.writerows(batch)
+                batch = []
+        writer.writerows(batch)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic task switch log")
+    parser.add_argument("path", help="Output CSV/TSV path")
+    parser.add_argument("--rows", type=int, default=100000, help="Number of switches")
+    parser.add_argument("--apps", type=int, default=12, help="Number of distinct apps")
+    parser.add_argument("--mean-session", type=float, default=45.0,
+                        help="Mean seconds between switches")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    delimiter = '\t' if args.path.endswith('.tsv') else ','
+    write_log(args.path, args.rows, args.apps, args.mean_session, delimiter, args.seed)
+    print(f"Wrote {args.rows} switches to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,85 @@
-import time
 import datetime
-import subprocess
 import os
-import threading
 import csv
-import pystray
-from pystray import MenuItem as item
-from PIL import Image, ImageDraw
-import pandas as pd
-import sys
+from switch_log import CsvSwitchLog
+from columnar_log import ColumnarSwitchLog
+from partitioned_log import PartitionedSwitchLog
+from sqlite_log import SqliteSwitchLog
+from journal_log import JournaledSwitchLog
+from recent_switches import RecentSwitchBuffer
+from transition_matrix import TransitionMatrix
+import metrics
 
 class TaskTracker:
-    def __init__(self, use_tsv=False):
+    def __init__(self, use_tsv=False, flush_every=1, flush_interval=None, fsync=False,
+                 recent_minutes=10, storage="text", base_dir="~/task_switch", partition_period="day",
+                 journal=False, group_commit_ms=200):
         # Determine file type
         self.use_tsv = use_tsv
         self.delimiter = '\t' if use_tsv else ','
         self.file_extension = 'tsv' if use_tsv else 'csv'
+        # "text" for CSV/TSV, "columnar" for the binary column files,
+        # "partitioned" for one CSV/TSV per partition_period plus a manifest,
+        # "sqlite" for a WAL-mode SQLite database indexed by timestamp
+        self.storage = storage
         
         # Set up the data directory and file path
-        self.data_dir = os.path.expanduser("~/task_switch/data")
+        self.data_dir = os.path.join(os.path.expanduser(base_dir), "data")
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir, exist_ok=True)
             print(f"Created data directory at {self.data_dir}")
         
-        self.data_path = os.path.join(self.data_dir, f"task_tracker_data.{self.file_extension}")
-        
         self.last_switch_time = None
-        self.setup_datafile()
+        # Bumped on every append so caches know when the history changed
+        self.version = 0
+        
+        # Long-lived writer; keeps the next id in memory instead of rescanning the file
+        if storage == "columnar":
+            self.data_path = os.path.join(self.data_dir, "task_tracker_data.col")
+            self.switch_log = ColumnarSwitchLog(self.data_path,
+                                                flush_every=flush_every,
+                                                flush_interval=flush_interval,
+                                                fsync=fsync)
+        elif storage == "partitioned":
+            self.data_path = os.path.join(self.data_dir, "task_tracker_data")
+            self.switch_log = PartitionedSwitchLog(self.data_path, partition_period, self.delimiter,
+                                                   flush_every=flush_every,
+                                                   flush_interval=flush_interval,
+                                                   fsync=fsync)
+        elif storage == "sqlite":
+            self.data_path = os.path.join(self.data_dir, "task_tracker_data.db")
+            self.switch_log = SqliteSwitchLog(self.data_path,
+                                              flush_every=flush_every,
+                                              flush_interval=flush_interval,
+                                              fsync=fsync)
+        elif storage == "text":
+            self.data_path = os.path.join(self.data_dir, f"task_tracker_data.{self.file_extension}")
+            self.setup_datafile()
+            if journal:
+                # Group commit through a checksummed journal: flush_every rows or
+                # group_commit_ms milliseconds per commit, torn tails repaired on startup
+                self.switch_log = JournaledSwitchLog(self.data_path, self.delimiter,
+                                                     group_size=flush_every,
+                                                     group_ms=group_commit_ms,
+                                                     fsync=fsync)
+            else:
+                self.switch_log = CsvSwitchLog(self.data_path, self.delimiter,
+                                               flush_every=flush_every,
+                                               flush_interval=flush_interval,
+                                               fsync=fsync)
+        else:
+            raise ValueError(f"Unknown storage format: {storage}")
+        
+        # Recent switches kept in memory for the analyzer; cold start reads only the file tail
+        self.recent = RecentSwitchBuffer(retention_minutes=recent_minutes,
+                                         loader=self.switch_log.tail)
+        self.recent.load()
+        
+        # App-to-app transition counts and dwell times, kept current per switch
+        self.transitions = TransitionMatrix(self.data_dir, self.switch_log)
+        # Objects with add(row) and close() that see every recorded row
+        # (e.g. a CollectorForwarder shipping switches to a collector)
+        self.listeners = [self.transitions]
     
     def setup_datafile(self):
         """Initialize the CSV/TSV file if it doesn't exist"""
@@ -36,27 +89,39 @@ class TaskTracker:
                 writer.writerow(['id', 'timestamp', 'app_from', 'app_to', 'duration'])
                 print(f"Created new {self.file_extension.upper()} file at {self.data_path}")
     
-    def record_app_switch(self, app_from, app_to):
-        """Record an application switch in the CSV/TSV file"""
-        now = datetime.datetime.now().isoformat()
+    @metrics.timed("record_app_switch")
+    def record_app_switch(self, app_from, app_to, timestamp=None):
+        """
+        Record an application switch in the CSV/TSV file
+        
+        timestamp: When the switch was sampled (a datetime, default now); the
+                   duration is measured between sample times, so a queued or
+                   slow write does not change it
+        """
+        now = timestamp or datetime.datetime.now()
         duration = 0
         if self.last_switch_time:
-            duration = int((datetime.datetime.now() - self.last_switch_time).total_seconds())
-        
-        # Get the next ID by counting existing rows
-        next_id = 1
-        try:
-            with open(self.data_path, 'r', newline='') as f:
-                reader = csv.reader(f, delimiter=self.delimiter)
-                next_id = sum(1 for _ in reader)  # Header counts as 1
-        except FileNotFoundError:
-            # File doesn't exist yet, start with ID 1
-            pass
-        
-        # Append the new record
-        with open(self.data_path, 'a', newline='') as f:
-            writer = csv.writer(f, delimiter=self.delimiter)
-            writer.writerow([next_id, now, app_from, app_to, duration])
-        
-        self.last_switch_time = datetime.datetime.now()
+            # Rounded, not truncated: samples land a hair either side of the
+            # second, and truncating would store a 0.999s visit as 0
+            duration = round((now - self.last_switch_time).total_seconds())
+        
+        # Append the new record; the id comes from the in-memory counter
+        row = self.switch_log.append(now, app_from, app_to, duration)
+        self.recent.add(row, now.timestamp())
+        for listener in self.listeners:
+            listener.add(row)
+        self.version += 1
+        
+        self.last_switch_time = now
         print(f"Switch recorded: {app_from} -> {app_to} (Duration: {duration}s)")
+        return row
+    
+    def flush(self):
+        """Flush any buffered switches to disk"""
+        self.switch_log.flush()
+    
+    def close(self):
+        """Flush and close the switch log"""
+        self.switch_log.close()
+        for listener in self.listeners:
+            listener.close()
@@ -0,0 +1,414 @@
+import os
+import sys
+import json
+import time
+import array
+import random
+import struct
+import argparse
+import datetime
+import threading
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from string_table import StringTable
+from columnar_log import to_epoch_us, from_epoch_us
+
+# One title session: start (int64 epoch microseconds), title id, duration (uint32 milliseconds)
+RECORD = struct.Struct("<qII")
+MAX_DURATION_MS = 0xFFFFFFFF
+
+
+def title_entry(app_id, title):
+    """
+    Titles are interned per app as "<app id><tab><title>", so one title id
+    identifies both (and "Untitled" in two apps stays two titles)
+    """
+    return f"{app_id}\t{title}"
+
+
+def split_entry(entry):
+    app_id, _, title = entry.partition("\t")
+    return int(app_id), title
+
+
+class TitleLog:
+    def __init__(self, state_dir, max_title_length=200, flush_every=50, checkpoint_every=1000,
+                 read_only=False):
+        """
+        Window-title sessions with interned strings and fixed-width binary records.
+
+        App names and titles go through StringTables (title_apps.txt, titles.txt),
+        so every distinct string is held and written once; everything else uses
+        their integer ids. Title ids are scoped to their app (see title_entry),
+        which keeps them dense: dwell is a pair of arrays (sessions, total
+        milliseconds) indexed by title id, with no per-title dict. Each time the
+        title in front changes, the session that ended is appended to titles.bin
+        as a 16-byte record (see RECORD) instead of a CSV row repeating both
+        strings.
+
+        Dwell is checkpointed with the record offset it covers like
+        TransitionMatrix; on startup only the records after that offset are
+        read back.
+
+        Args:
+            state_dir: Directory for the record file, string tables and checkpoint
+            max_title_length: Titles are cut to this many characters (bounds the
+                              string table when titles embed long paths or URLs)
+            flush_every: Flush the record file after this many sessions
+            checkpoint_every: Save the dwell checkpoint after this many sessions
+            read_only: Inspect titles the tracker is recording: nothing is
+                       truncated, appended or checkpointed
+        """
+        self.state_dir = os.path.expanduser(state_dir)
+        self.read_only = read_only
+        if not read_only:
+            os.makedirs(self.state_dir, exist_ok=True)
+        self.data_path = os.path.join(self.state_dir, "titles.bin")
+        self.checkpoint_path = os.path.join(self.state_dir, "title_dwell.json")
+        self.max_title_length = max_title_length
+        self.flush_every = max(1, flush_every)
+        self.checkpoint_every = max(1, checkpoint_every)
+        self.lock = threading.RLock()
+
+        # Records are counted before the string tables load: titles are written
+        # before any record uses them, so every counted record has its strings
+        self.records = self.repair()
+        self.apps = StringTable(os.path.join(self.state_dir, "title_apps.txt"), read_only=read_only)
+        self.titles = StringTable(os.path.join(self.state_dir, "titles.txt"), read_only=read_only)
+        self.file = None
+        self.pending = 0
+        self.current = None
+        self.reset()
+        self.load_checkpoint()
+        self.catch_up()
+
+    def reset(self):
+        self.sessions = array.array('I')
+        self.total_ms = array.array('Q')
+        self.offset = 0
+        self.since_checkpoint = 0
+
+    def repair(self):
+        """Truncate a torn trailing record; returns the number of whole records"""
+        size = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+        count = size // RECORD.size
+        # A reader may see the writer mid-record; only the writer truncates
+        if size != count * RECORD.size and not self.read_only:
+            with open(self.data_path, 'ab') as f:
+                f.truncate(count * RECORD.size)
+        return count
+
+    def load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, 'r') as f:
+                state = json.load(f)
+            if state["offset"] > self.records * RECORD.size:
+                print(f"Title dwell checkpoint is ahead of {self.data_path}, rebuilding")
+                return
+            if len(state["sessions"]) != len(state["total_ms"]) or len(state["sessions"]) > len(self.titles):
+                raise ValueError("dwell does not match titles.txt")
+            self.sessions = array.array('I', state["sessions"])
+            self.total_ms = array.array('Q', state["total_ms"])
+            self.offset = state["offset"]
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, TypeError, OverflowError) as e:
+            print(f"Ignoring unreadable title dwell checkpoint {self.checkpoint_path}: {e}")
+            self.reset()
+
+    def save_checkpoint(self):
+        if self.read_only:
+            return
+        with self.lock:
+            self.flush()
+            state = {
+                "offset": self.records * RECORD.size,
+                "sessions": self.sessions.tolist(),
+                "total_ms": self.total_ms.tolist(),
+            }
+            tmp_path = self.checkpoint_path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(state, f, separators=(',', ':'))
+            os.replace(tmp_path, self.checkpoint_path)
+            self.offset = state["offset"]
+            self.since_checkpoint = 0
+
+    def read_records(self, offset=0):
+        """
+        (start_us, title_id, duration_ms) tuples from a byte offset on, up to the
+        records counted so far (a reader ignores what the writer appended since)
+        """
+        self.flush()
+        if not os.path.exists(self.data_path):
+            return
+        remaining = self.records * RECORD.size - offset
+        with open(self.data_path, 'rb') as f:
+            f.seek(offset)
+            while remaining > 0:
+                chunk = f.read(min(remaining, RECORD.size * 4096))
+                whole = len(chunk) - len(chunk) % RECORD.size
+                if not whole:
+                    return
+                remaining -= whole
+                yield from RECORD.iter_unpack(chunk[:whole])
+
+    def catch_up(self):
+        """Fold records written after the checkpoint"""
+        with self.lock:
+            for _, title_id, duration_ms in self.read_records(self.offset):
+                self.fold(title_id, duration_ms)
+            self.offset = self.records * RECORD.size
+
+    def fold(self, title_id, duration_ms):
+        if title_id >= len(self.sessions):
+            grow = title_id + 1 - len(self.sessions)
+            self.sessions.extend([0] * grow)
+            self.total_ms.extend([0] * grow)
+        self.sessions[title_id] += 1
+        self.total_ms[title_id] += duration_ms
+
+    def normalize(self, title):
+        title = " ".join((title or "").split())
+        return title[:self.max_title_length]
+
+    def observe(self, app, title, when):
+        """
+        Record the (app, title) in front at datetime when; returns True if it
+        changed, in which case the previous session is written out
+        """
+        if self.read_only:
+            raise ValueError(f"{self.state_dir} is open read-only")
+        title_id = self.titles.intern(title_entry(self.apps.intern(app), self.normalize(title)))
+        with self.lock:
+            if self.current is not None and self.current[0] == title_id:
+                return False
+            if self.current is not None:
+                self.end_session(when)
+            self.current = (title_id, when)
+            return True
+
+    def end_session(self, when):
+        title_id, started = self.current
+        duration_ms = int((when - started).total_seconds() * 1000)
+        duration_ms = min(MAX_DURATION_MS, max(0, duration_ms))
+        if self.file is None:
+            self.file = open(self.data_path, 'ab')
+        self.file.write(RECORD.pack(to_epoch_us(started), title_id, duration_ms))
+        self.records += 1
+        self.pending += 1
+        self.fold(title_id, duration_ms)
+        self.current = None
+        if self.pending >= self.flush_every:
+            self.flush()
+        self.since_checkpoint += 1
+        if self.since_checkpoint >= self.checkpoint_every:
+            self.save_checkpoint()
+
+    def flush(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.flush()
+            self.pending = 0
+
+    def top_titles(self, n=20, app=None, start=None, end=None):
+        """
+        (app, title, sessions, total seconds) for the n titles with the most
+        time, optionally in one app. Without start/end (epochs) this reads the
+        in-memory dwell; with them the records in that range are aggregated.
+        """
+        app_id = self.apps.get(app) if app is not None else None
+        if app is not None and app_id is None:
+            return []
+        with self.lock:
+            if start is None and end is None:
+                rows = [(title_id, sessions, total_ms) for title_id, (sessions, total_ms)
+                        in enumerate(zip(self.sessions, self.total_ms)) if sessions]
+            else:
+                totals = {}
+                start_us = int(start * 1000000) if start is not None else None
+                end_us = int(end * 1000000) if end is not None else None
+                for started, title_id, duration_ms in self.read_records():
+                    if (start_us is not None and started <= start_us) or (end_us is not None and started > end_us):
+                        continue
+                    total = totals.setdefault(title_id, [0, 0])
+                    total[0] += 1
+                    total[1] += duration_ms
+                rows = [(title_id, sessions, total_ms) for title_id, (sessions, total_ms) in totals.items()]
+        if app_id is not None:
+            rows = [row for row in rows if split_entry(self.titles.lookup(row[0]))[0] == app_id]
+        rows.sort(key=lambda row: (-row[2], -row[1]))
+        return [self.describe(title_id) + (sessions, total_ms / 1000) for title_id, sessions, total_ms in rows[:n]]
+
+    def describe(self, title_id):
+        """(app, title) for a title id"""
+        app_id, title = split_entry(self.titles.lookup(title_id))
+        return self.apps.lookup(app_id), title
+
+    def sessions_between(self, start=None, end=None):
+        """(start datetime, app, title, seconds) per recorded session, oldest first"""
+        for started, title_id, duration_ms in self.read_records():
+            epoch = started / 1000000
+            if (start is not None and epoch <= start) or (end is not None and epoch > end):
+                continue
+            yield (from_epoch_us(started),) + self.describe(title_id) + (duration_ms / 1000,)
+
+    def report(self):
+        """Distinct strings, sessions and bytes on disk"""
+        string_bytes = sum(os.path.getsize(table.path) for table in (self.apps, self.titles)
+                           if os.path.exists(table.path))
+        return {
+            "apps": len(self.apps),
+            "titles": len(self.titles),
+            "sessions": self.records,
+            "record_bytes": self.records * RECORD.size,
+            "string_bytes": string_bytes,
+        }
+
+    def end(self, when=None):
+        """End the session in front (at when, default now) and save the checkpoint"""
+        with self.lock:
+            if self.current is not None:
+                self.end_session(when or datetime.datetime.now())
+            self.save_checkpoint()
+
+    def close(self, when=None):
+        """end(), then release the record file (the next session reopens it)"""
+        with self.lock:
+            self.end(when)
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+TITLE_WORDS = ["Inbox", "Re: planning", "Pull request", "Design review", "Untitled", "Budget 2026",
+               "Standup notes", "issue", "Search results", "Meeting", "Dashboard", "README.md"]
+
+
+def synthetic_title(index, app):
+    """A realistic-length title, distinct per index"""
+    return f"{TITLE_WORDS[index % len(TITLE_WORDS)]} #{index} - project-{index % 97} - {app}"
+
+
+def measure(sessions=1000000, titles=50000, apps=20, seed=0):
+    """
+    Record a long synthetic session of title changes (a few popular titles,
+    a long tail of distinct ones) and measure the TitleLog against keeping
+    titles as strings: a dwell dict keyed by (app, title) in memory and a CSV
+    session log on disk. Memory is that of the log reopened from disk, i.e.
+    what a long-running tracker holds.
+    """
+    import csv
+    import shutil
+    import tempfile
+    import tracemalloc
+    rng = random.Random(seed)
+    app_names = [f"App {i}" for i in range(apps)]
+
+    def title_index():
+        # Mostly a heavy-tailed pick among popular titles, sometimes anywhere in the tail
+        if rng.random() < 0.3:
+            return rng.randrange(titles)
+        return min(titles - 1, int(rng.paretovariate(1.2)) - 1)
+
+    plan = []
+    previous = None
+    while len(plan) < sessions:
+        index = title_index()
+        if index != previous:
+            plan.append((index, int(rng.expovariate(1 / 45) * 1000) + 200))
+            previous = index
+    base = datetime.datetime(2026, 1, 5, 9, 0)
+    state_dir = tempfile.mkdtemp(prefix="title_log_")
+    results = {}
+    try:
+        log = TitleLog(state_dir, checkpoint_every=10000)
+        when = base
+        started = time.perf_counter()
+        for index, duration_ms in plan:
+            app = app_names[index % apps]
+            # A fresh string per sample, as decoded from the backend
+            log.observe(app, synthetic_title(index, app), when)
+            when += datetime.timedelta(milliseconds=duration_ms)
+        results["observe_us"] = (time.perf_counter() - started) / sessions * 1000000
+        log.close(when)
+        results.update(log.report())
+        del log
+
+        reopened = time.perf_counter()
+        TitleLog(state_dir)
+        results["reopen_s"] = time.perf_counter() - reopened
+        tracemalloc.start()
+        log = TitleLog(state_dir)
+        results["interned_memory_bytes"] = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del log
+
+        tracemalloc.start()
+        dwell = {}
+        for index, duration_ms in plan:
+            app = app_names[index % apps]
+            total = dwell.setdefault((app, synthetic_title(index, app)), [0, 0])
+            total[0] += 1
+            total[1] += duration_ms
+        results["string_keyed_memory_bytes"] = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del dwell
+
+        csv_path = os.path.join(state_dir, "titles.csv")
+        with open(csv_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["timestamp", "app", "title", "duration"])
+            when = base
+            for index, duration_ms in plan:
+                app = app_names[index % apps]
+                writer.writerow([when.isoformat(), app, synthetic_title(index, app), duration_ms / 1000])
+                when += datetime.timedelta(milliseconds=duration_ms)
+        results["csv_bytes"] = os.path.getsize(csv_path)
+        results["hours"] = (when - base).total_seconds() / 3600
+    finally:
+        shutil.rmtree(state_dir, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time spent per window title")
+    parser.add_argument("--base-dir", default="~/task_switch")
+    parser.add_argument("--app", help="Only titles of this app")
+    parser.add_argument("--from", dest="start", help="Only sessions after this date/time (or e.g. 7d, 12h ago)")
+    parser.add_argument("--to", dest="end", help="Only sessions up to this date/time")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--measure", action="store_true",
+                        help="Measure memory and disk for a long synthetic session instead")
+    parser.add_argument("--sessions", type=int, default=1000000, help="Title changes for --measure")
+    parser.add_argument("--titles", type=int, default=50000, help="Distinct titles for --measure")
+    args = parser.parse_args()
+
+    if args.measure:
+        result = measure(args.sessions, args.titles)
+        disk = result["record_bytes"] + result["string_bytes"]
+        print(f"{result['sessions']} title changes over {result['hours']:.0f}h, {result['titles']} distinct titles "
+              f"in {result['apps']} apps, {result['observe_us']:.1f}us per title change")
+        print(f"Disk:   {disk / 1e6:.1f} MB ({result['record_bytes'] / 1e6:.1f} MB records + "
+              f"{result['string_bytes'] / 1e6:.1f} MB strings), {disk / result['sessions']:.1f} bytes/session; "
+              f"CSV with titles {result['csv_bytes'] / 1e6:.1f} MB, "
+              f"{result['csv_bytes'] / result['sessions']:.1f} bytes/session")
+        print(f"Memory: {result['interned_memory_bytes'] / 1e6:.1f} MB interned "
+              f"({result['interned_memory_bytes'] / result['titles']:.0f} bytes/title); "
+              f"string-keyed dwell dict {result['string_keyed_memory_bytes'] / 1e6:.1f} MB "
+              f"({result['string_keyed_memory_bytes'] / result['titles']:.0f} bytes/title)")
+        print(f"Reopen (checkpoint + catch-up): {result['reopen_s'] * 1000:.0f} ms")
+        return
+
+    from report import parse_time, format_seconds
+    log = TitleLog(os.path.join(os.path.expanduser(args.base_dir), "data", "titles"), read_only=True)
+    rows = log.top_titles(args.top, args.app, parse_time(args.start), parse_time(args.end))
+    if not rows:
+        print("No window titles recorded (run the tracker with title tracking enabled)")
+        return
+    for app, title, sessions, total in rows:
+        print(f"{app[:20]:<20} {title[:60]:<60} {sessions:>7} {format_seconds(total):>9}")
+    print(log.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,74 @@
-import time
 import datetime
-import subprocess
-import os
 import threading
-import csv
-import pystray
-from pystray import MenuItem as item
-from PIL import Image, ImageDraw
-import pandas as pd
-import sys
+from scheduler import Scheduler
 
 class TrackingService:
-    def __init__(self, task_tracker, window_monitor, switch_analyzer, flow_launcher=None, desktop_color=None):
+    def __init__(self, task_tracker, window_monitor, switch_analyzer, flow_launcher=None, desktop_color=None,
+                 sample_interval=1.0, analysis_interval=10.0, color_interval=None, switch_writer=None,
+                 sampler=None, title_log=None):
+        """
+        Coordinates sampling, analysis and interventions on one scheduler.
+        
+        Args:
+            sample_interval: Seconds between foreground-app samples (may be below 1)
+            analysis_interval: Seconds between excessive-switching checks (Flow launch)
+            color_interval: Seconds between desktop color updates
+                            (defaults to desktop_color.update_interval)
+            switch_writer: Optional SwitchWriter; switches are queued to it instead
+                           of being written on the sampling thread
+            sampler: Optional AdaptiveSampler that sets the interval after every
+                     sample (sample_interval is then ignored)
+            title_log: Optional TitleLog; samples then also read the front window's
+                       title and title sessions are recorded there (app switches
+                       are recorded as before)
+        """
         self.task_tracker = task_tracker
         self.window_monitor = window_monitor
         self.switch_analyzer = switch_analyzer
         self.flow_launcher = flow_launcher
         self.desktop_color = desktop_color
+        self.switch_writer = switch_writer
+        self.sampler = sampler
+        self.title_log = title_log
+        self.sample_task = None
         self.running = False
         self.current_app = None
         self.last_switch_time = None
         self.tracking_thread = None
+        self.scheduler = None
+        
+        self.sample_interval = sample_interval
+        self.analysis_interval = analysis_interval
+        if color_interval is None and desktop_color is not None:
+            color_interval = desktop_color.update_interval
+        self.color_interval = color_interval
+    
+    def sample_window(self):
+        """Sample the foreground app and record a switch if it changed"""
+        if self.title_log is not None:
+            new_app, title = self.window_monitor.get_active_window_and_title()
+        else:
+            new_app = self.window_monitor.get_active_window()
+        sampled_at = datetime.datetime.now()
+        if self.title_log is not None:
+            self.title_log.observe(new_app, title, sampled_at)
+        switched = new_app != self.current_app
+        if switched:
+            if self.switch_writer:
+                self.switch_writer.submit(self.current_app, new_app, sampled_at)
+            else:
+                self.task_tracker.record_app_switch(self.current_app, new_app, sampled_at)
+            self.current_app = new_app
+        if self.sampler and self.sample_task:
+            self.sample_task.interval = self.sampler.observe(switched)
+    
+    def check_switching(self):
+        """Check for excessive switching (for Flow app)"""
+        excessive = self.switch_analyzer.check_excessive_task_switching()
         
-        # Color update counter
-        self.color_update_interval = 0
+        # Launch Flow app only in extreme cases
+        if excessive and self.flow_launcher:
+            self.flow_launcher.launch_flow_app()
     
     def tracking_loop(self):
         """Main tracking loop that runs in the background"""
@@ -31,45 +76,85 @@ class TrackingService:
         self.current_app = self.window_monitor.get_active_window()
         print(f"Starting tracking. Current app: {self.current_app}")
         
-        check_interval = 0
-        self.color_update_interval = 0
-        
-        while self.running:
-            time.sleep(1)  # Check every second
-            new_app = self.window_monitor.get_active_window()
-            if new_app != self.current_app:
-                self.task_tracker.record_app_switch(self.current_app, new_app)
-                self.current_app = new_app
-            
-            # Increment counters
-            check_interval += 1
-            self.color_update_interval += 1
-            
-            # Check for excessive switching every 10 seconds (for Flow app)
-            if check_interval >= 10:
-                excessive = self.switch_analyzer.check_excessive_task_switching()
-                
-                # Launch Flow app only in extreme cases
-                if excessive and self.flow_launcher:
-                    self.flow_launcher.launch_flow_app()
-                
-                check_interval = 0
-            
-            # Update desktop color more frequently (every 5 seconds)
-            if self.desktop_color and self.color_update_interval >= self.desktop_color.update_interval:
-                self.desktop_color.update_color_based_on_behavior()
-                self.color_update_interval = 0
+        # Each job runs on its own deadline; analysis and color run off the
+        # sampling thread so a slow check does not delay the next sample
+        sample_interval = self.sampler.interval if self.sampler else self.sample_interval
+        self.sample_task = self.scheduler.add("sample", sample_interval, self.sample_window)
+        self.scheduler.add("analysis", self.analysis_interval, self.check_switching, background=True)
+        if self.desktop_color:
+            self.scheduler.add("color", self.color_interval,
+                               self.desktop_color.update_color_based_on_behavior, background=True)
+        self.scheduler.run()
     
     def start(self):
         """Start the tracking process"""
         if not self.running:
             self.running = True
+            if self.switch_writer:
+                self.switch_writer.start()
+            # Made here rather than on the tracking thread, so a stop() that comes
+            # before the thread gets going still reaches this run's scheduler
+            self.scheduler = Scheduler()
             self.tracking_thread = threading.Thread(target=self.tracking_loop)
             self.tracking_thread.daemon = True
             self.tracking_thread.start()
             print("Task tracking started")
     
-    def stop(self):
-        """Stop the tracking process"""
+    def stop(self, timeout=5.0):
+        """
+        Stop sampling and make everything recorded so far durable. Nothing is
+        closed, so start() can resume; close() releases the logs at exit.
+
+        Args:
+            timeout: Seconds to wait for a sample and for analysis/color runs
+                     still in progress before draining the writer
+        """
         self.running = False
-        print("Task tracking stopped")
\ No newline at end of file
+        if self.scheduler:
+            self.scheduler.stop()
+            # A sample in flight may still submit a switch; wait for it so the
+            # switch is drained below rather than queued after the writer stops
+            if self.tracking_thread is not None and self.tracking_thread is not threading.current_thread():
+                self.tracking_thread.join(timeout)
+                if self.tracking_thread.is_alive():
+                    print(f"Tracking thread still sampling after {timeout}s")
+            busy = self.scheduler.join(timeout)
+            if busy:
+                print(f"Scheduled tasks still running after {timeout}s: {', '.join(busy)}")
+            print(f"Scheduler: {self.scheduler.report()}")
+        if self.sampler:
+            print(f"Adaptive sampling: {self.sampler.report()}")
+        if self.title_log is not None:
+            # Tracking is paused, so the title in front stops accruing time
+            self.title_log.end()
+            print(f"Window titles: {self.title_log.report()}")
+        if getattr(self.switch_analyzer, "snapshot", None) is not None:
+            print(f"Analysis cache: {self.switch_analyzer.snapshot.report()}")
+        if self.desktop_color:
+            print(f"Desktop color: {self.desktop_color.renderer.report()}")
+        if self.switch_writer:
+            # Drains the queue and stops the writer thread; start() starts a new one
+            self.switch_writer.close()
+            print(f"Switch writer: {self.switch_writer.report()}")
+        self.task_tracker.flush()
+        if hasattr(self.task_tracker.switch_log, "report"):
+            print(f"Switch log: {self.task_tracker.switch_log.report()}")
+        # The persistent helper is respawned by the next sample
+        self.window_monitor.close()
+        print(f"Sampling latency: {self.window_monitor.latency_report()}")
+        print("Task tracking stopped")
+    
+    def close(self):
+        """Stop tracking if it is running, then close the logs, listeners and checkpoints for exit"""
+        if self.running:
+            self.stop()
+        if self.title_log is not None:
+            self.title_log.close()
+        self.task_tracker.close()
+        if getattr(self.switch_analyzer, "baselines", None) is not None:
+            self.switch_analyzer.baselines.close()
+        if getattr(self.switch_analyzer, "sketches", None) is not None:
+            self.switch_analyzer.sketches.close()
+        if hasattr(self.switch_analyzer.stats_storage, "close"):
+            self.switch_analyzer.stats_storage.close()
+        self.window_monitor.close()
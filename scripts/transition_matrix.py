@@ -0,0 +1,225 @@
+import os
+import sys
+import json
+import heapq
+import argparse
+import threading
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from string_table import StringTable
+from switch_log import read_rows_since
+
+
+class TransitionMatrix:
+    def __init__(self, state_dir, switch_log=None, source_path=None, checkpoint_every=100, read_only=False):
+        """
+        Sparse app-to-app transition counts and per-app dwell time.
+
+        Apps are interned to small ids; successors[a][b] counts switches from a
+        to b, and predecessors[b][a] holds the same counts indexed the other way,
+        so both directions are answered without scanning. dwell[a] is
+        [sessions, total seconds] spent in a before switching away.
+
+        The matrix is checkpointed every checkpoint_every switches together with
+        the last row id and log cursor it covers; on startup only the rows after
+        that cursor are read back from the switch log.
+
+        Args:
+            state_dir: Directory for transition_matrix.json and transition_apps.txt
+            switch_log: The tracker's switch log (any storage format)
+            source_path: CSV log to catch up from when there is no switch_log
+            read_only: Inspect the matrix the tracker maintains without writing
+                       its checkpoint or app table (for the CLI)
+        """
+        self.state_dir = os.path.expanduser(state_dir)
+        self.read_only = read_only
+        if not read_only:
+            os.makedirs(self.state_dir, exist_ok=True)
+        self.checkpoint_path = os.path.join(self.state_dir, "transition_matrix.json")
+        self.switch_log = switch_log
+        self.source_path = switch_log.data_path if switch_log else source_path
+        self.checkpoint_every = max(1, checkpoint_every)
+        self.lock = threading.Lock()
+
+        self.apps = StringTable(os.path.join(self.state_dir, "transition_apps.txt"), read_only=read_only)
+        self.reset()
+        self.load_checkpoint()
+        self.catch_up()
+
+    def reset(self):
+        self.successors = {}
+        self.predecessors = {}
+        self.dwell = {}
+        self.last_id = 0
+        self.offset = 0
+        self.since_checkpoint = 0
+
+    def load_checkpoint(self):
+        """Restore the matrix saved by save_checkpoint"""
+        try:
+            with open(self.checkpoint_path, 'r') as f:
+                state = json.load(f)
+            if state.get("source", self.source_path) != self.source_path:
+                print(f"Transition matrix checkpoint is for {state['source']}, rebuilding")
+                return
+            for app_from, app_to, count in state["transitions"]:
+                self.successors.setdefault(app_from, {})[app_to] = count
+                self.predecessors.setdefault(app_to, {})[app_from] = count
+            for app, sessions, total in state["dwell"]:
+                self.dwell[app] = [sessions, total]
+            self.last_id = state["last_id"]
+            self.offset = state["offset"]
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Ignoring unreadable transition matrix checkpoint {self.checkpoint_path}: {e}")
+            self.reset()
+
+    def save_checkpoint(self):
+        """Persist the matrix with the row id and log cursor it covers"""
+        if self.read_only:
+            return
+        with self.lock:
+            # Move the cursor past rows already folded in live, so the next
+            # startup reads only what was appended after this point
+            self.catch_up_locked()
+            state = {
+                "source": self.source_path,
+                "offset": self.offset,
+                "last_id": self.last_id,
+                "transitions": [[a, b, count] for a, row in self.successors.items() for b, count in row.items()],
+                "dwell": [[app, sessions, total] for app, (sessions, total) in self.dwell.items()],
+            }
+            tmp_path = self.checkpoint_path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.checkpoint_path)
+            self.since_checkpoint = 0
+
+    def read_since(self, offset):
+        if self.switch_log is not None:
+            return self.switch_log.read_since(offset)
+        if self.source_path is None:
+            return [], offset
+        return read_rows_since(self.source_path, offset)
+
+    def catch_up(self):
+        with self.lock:
+            return self.catch_up_locked()
+
+    def catch_up_locked(self):
+        """Fold rows the log has beyond the cursor; rows already seen by id are skipped"""
+        added = 0
+        while True:
+            rows, self.offset = self.read_since(self.offset)
+            if not rows:
+                break
+            for row in rows:
+                added += self.fold(row)
+        return added
+
+    def fold(self, row):
+        try:
+            row_id = int(row[0])
+            duration = int(row[4] or 0)
+        except (ValueError, IndexError):
+            return 0
+        if row_id <= self.last_id:
+            return 0
+        self.last_id = row_id
+        app_from, app_to = row[2], row[3]
+        if app_from in (None, ""):
+            # First switch of a tracking session; nothing was left
+            return 0
+        a = self.apps.intern(app_from)
+        b = self.apps.intern(app_to)
+        successors = self.successors.setdefault(a, {})
+        successors[b] = successors.get(b, 0) + 1
+        predecessors = self.predecessors.setdefault(b, {})
+        predecessors[a] = predecessors.get(a, 0) + 1
+        dwell = self.dwell.setdefault(a, [0, 0])
+        dwell[0] += 1
+        dwell[1] += duration
+        return 1
+
+    def add(self, row):
+        """Fold one freshly recorded row [id, timestamp, app_from, app_to, duration]"""
+        with self.lock:
+            self.fold(row)
+            self.since_checkpoint += 1
+        if self.since_checkpoint >= self.checkpoint_every:
+            self.save_checkpoint()
+
+    def ranked(self, index, app, k):
+        app_id = self.apps.get(app)
+        if app_id is None:
+            return []
+        with self.lock:
+            counts = dict(index.get(app_id, {}))
+        total = sum(counts.values())
+        top = heapq.nlargest(k, counts.items(), key=lambda item: item[1])
+        return [(self.apps.lookup(other), count, count / total) for other, count in top]
+
+    def top_successors(self, app, k=5):
+        """The k apps most often switched to from app, as (app, count, share)"""
+        return self.ranked(self.successors, app, k)
+
+    def top_predecessors(self, app, k=5):
+        """The k apps most often switched from into app, as (app, count, share)"""
+        return self.ranked(self.predecessors, app, k)
+
+    def count(self, app_from, app_to):
+        """Number of switches from app_from to app_to"""
+        a, b = self.apps.get(app_from), self.apps.get(app_to)
+        if a is None or b is None:
+            return 0
+        return self.successors.get(a, {}).get(b, 0)
+
+    def mean_dwell(self, app):
+        """Mean seconds spent in app before switching away (None if never left)"""
+        app_id = self.apps.get(app)
+        sessions, total = self.dwell.get(app_id, (0, 0))
+        return total / sessions if sessions else None
+
+    def dwell_table(self):
+        """{app: (sessions, mean seconds)} for every app that was left at least once"""
+        with self.lock:
+            return {self.apps.lookup(app): (sessions, total / sessions)
+                    for app, (sessions, total) in self.dwell.items() if sessions}
+
+    def close(self):
+        self.save_checkpoint()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the app transition matrix")
+    parser.add_argument("app", nargs="?", help="App to show successors and predecessors for")
+    parser.add_argument("--top", type=int, default=5)
+    parser.add_argument("--base-dir", default="~/task_switch")
+    parser.add_argument("--log", help="Switch log the tracker writes (default: the one for --storage under --base-dir)")
+    parser.add_argument("--storage", default="text", choices=["text", "columnar", "partitioned", "sqlite"])
+    parser.add_argument("--tsv", action="store_true", help="The text log is TSV")
+    args = parser.parse_args()
+
+    from report import log_path, open_log
+    data_dir = os.path.join(os.path.expanduser(args.base_dir), "data")
+    path = os.path.expanduser(args.log) if args.log else log_path(args.base_dir, args.storage, args.tsv)
+    if not os.path.exists(path):
+        print(f"No switch log at {path}")
+        return
+    matrix = TransitionMatrix(data_dir, switch_log=open_log(path), read_only=True)
+    if args.app is None:
+        for app, (sessions, mean) in sorted(matrix.dwell_table().items(), key=lambda item: -item[1][0]):
+            print(f"{app:<40}{sessions:>8} sessions  mean dwell {mean:>8.1f}s")
+        return
+    print(f"Mean dwell in {args.app}: {matrix.mean_dwell(args.app)}")
+    print(f"\nMost often switched to from {args.app}:")
+    for app, count, share in matrix.top_successors(args.app, args.top):
+        print(f"  {app:<40}{count:>8}  {share:>6.1%}")
+    print(f"\nMost often switched from into {args.app}:")
+    for app, count, share in matrix.top_predecessors(args.app, args.top):
+        print(f"  {app:<40}{count:>8}  {share:>6.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,307 @@
 import time
-import datetime
+import bisect
 import subprocess
-import os
-import threading
-import csv
-import pystray
-from pystray import MenuItem as item
-from PIL import Image, ImageDraw
-import pandas as pd
-import sys
+import select
+from collections import deque
+import metrics
+
+FRONT_APP_APPLESCRIPT = [
+    '-e', 'tell application "System Events"',
+    '-e', 'set frontApp to name of first application process whose frontmost is true',
+    '-e', 'end tell',
+]
+
+# Same, plus the front window's title after a tab (needs Accessibility permission)
+FRONT_APP_TITLE_APPLESCRIPT = [
+    '-e', 'tell application "System Events"',
+    '-e', 'set frontProcess to first application process whose frontmost is true',
+    '-e', 'set frontApp to name of frontProcess',
+    '-e', 'set frontTitle to ""',
+    '-e', 'try',
+    '-e', 'set frontTitle to name of front window of frontProcess',
+    '-e', 'end try',
+    '-e', 'end tell',
+    '-e', 'return frontApp & tab & frontTitle',
+]
+
+# Long-lived JXA helper: answers one line with the frontmost app name for every line it
+# reads; a "t" request also gets the front window's title after a tab
+FRONT_APP_HELPER_JXA = """
+ObjC.import('Foundation');
+var stdin = $.NSFileHandle.fileHandleWithStandardInput;
+var stdout = $.NSFileHandle.fileHandleWithStandardOutput;
+var events = Application('System Events');
+while (true) {
+    var data = stdin.availableData;
+    if (data.length == 0) { break; }
+    var request = $.NSString.alloc.initWithDataEncoding(data, $.NSUTF8StringEncoding).js;
+    var name;
+    var title = '';
+    try {
+        var process = events.processes.whose({frontmost: true})[0];
+        name = process.name();
+        if (request.indexOf('t') >= 0) {
+            try { title = process.windows[0].name() || ''; } catch (e) { title = ''; }
+        }
+    }
+    catch (e) { name = 'Unknown'; }
+    var answer = request.indexOf('t') >= 0 ? name + '\\t' + title.replace(/[\\t\\n]/g, ' ') : name;
+    stdout.writeData($(answer + '\\n').dataUsingEncoding($.NSUTF8StringEncoding));
+}
+"""
+
+
+def split_title(answer):
+    """"App<tab>Title" from the helpers as (app, title)"""
+    app, _, title = answer.partition('\t')
+    return (app.strip() or "Unknown"), title.strip()
+
+
+class SampleLatency:
+    def __init__(self, window=1000):
+        """Per-sample latency bookkeeping so backends can be compared"""
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        self.recent = deque(maxlen=window)
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.last = seconds
+        self.recent.append(seconds)
+
+    def report(self):
+        """Latency summary in milliseconds"""
+        if not self.count:
+            return {"samples": 0}
+        ordered = sorted(self.recent)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        return {
+            "samples": self.count,
+            "mean_ms": self.total / self.count * 1000,
+            "p95_ms": p95 * 1000,
+            "max_ms": self.max * 1000,
+            "last_ms": self.last * 1000,
+        }
+
+
+class OneShotBackend:
+    """Spawn osascript once per sample (the original behaviour, minus the shell)"""
+    name = "oneshot"
+
+    def sample(self):
+        result = subprocess.run(["osascript"] + FRONT_APP_APPLESCRIPT, capture_output=True, text=True)
+        if result.returncode == 0 and result.stdout:
+            return result.stdout.strip()
+        return "Unknown"
+
+    def sample_with_title(self):
+        result = subprocess.run(["osascript"] + FRONT_APP_TITLE_APPLESCRIPT, capture_output=True, text=True)
+        if result.returncode == 0 and result.stdout:
+            return split_title(result.stdout.rstrip('\n'))
+        return "Unknown", ""
+
+    def close(self):
+        pass
+
+
+class PersistentHelperBackend:
+    name = "persistent"
+
+    def __init__(self, timeout=2.0):
+        """
+        Keep one osascript (JXA) helper alive and query it over stdin/stdout,
+        so a sample costs a pipe round trip instead of a process spawn.
+        """
+        self.timeout = timeout
+        self.process = None
+        self.spawns = 0
+
+    def start(self):
+        self.process = subprocess.Popen(
+            ["osascript", "-l", "JavaScript", "-e", FRONT_APP_HELPER_JXA],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        self.spawns += 1
+
+    def sample(self):
+        return self.ask(b"?\n")
+
+    def sample_with_title(self):
+        return split_title(self.ask(b"t\n"))
+
+    def ask(self, request):
+        if self.process is None or self.process.poll() is not None:
+            self.start()
+        try:
+            self.process.stdin.write(request)
+            self.process.stdin.flush()
+            ready, _, _ = select.select([self.process.stdout], [], [], self.timeout)
+            if not ready:
+                raise TimeoutError("front-app helper did not answer")
+            line = self.process.stdout.readline()
+            if not line:
+                raise EOFError("front-app helper exited")
+            return line.decode("utf-8").rstrip("\n") or "Unknown"
+        except (OSError, TimeoutError, EOFError):
+            # Helper is wedged; kill it so the next sample respawns it
+            self.close()
+            raise
+
+    def close(self):
+        if self.process is not None:
+            try:
+                self.process.kill()
+                self.process.wait(timeout=1)
+            except (OSError, subprocess.TimeoutExpired):
+                pass
+            self.process = None
+
+
+class ReplayBackend:
+    name = "replay"
+
+    def __init__(self, timeline_path, speed=1.0, loop=False, clock=time.monotonic):
+        """
+        Simulated foreground app driven by a scripted timeline, for running the
+        pipeline off macOS.
+
+        The timeline has one "<seconds>,<app>" (or tab separated) line per change,
+        where seconds is the offset from the start of the replay, optionally
+        followed by ",<window title>". Lines starting with # are ignored.
+
+        Args:
+            timeline_path: Path to the timeline file
+            speed: Playback speed multiplier (2.0 = twice as fast as real time)
+            loop: Start over after the last entry instead of staying on it
+            clock: Monotonic clock, injectable for simulated time
+        """
+        entries = self.read_timeline(timeline_path, titles=True)
+        self.timeline = [(offset, app) for offset, app, _ in entries]
+        self.titles = [title for _, _, title in entries]
+        # Searched on every sample, so a long timeline costs O(log n) per sample
+        self.offsets = [offset for offset, _ in self.timeline]
+        self.speed = speed
+        self.loop = loop
+        self.clock = clock
+        self.started_at = None
+
+    @staticmethod
+    def read_timeline(timeline_path, titles=False):
+        """(offset, app) pairs in time order, or (offset, app, title) with titles=True"""
+        timeline = []
+        with open(timeline_path, 'r', newline='') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                delimiter = '\t' if '\t' in line else ','
+                offset, app, *title = line.split(delimiter, 2)
+                entry = (float(offset), app.strip())
+                timeline.append(entry + ((title[0].strip() if title else ""),) if titles else entry)
+        # Stable, so entries at the same offset keep their file order
+        timeline.sort(key=lambda entry: entry[0])
+        if not timeline:
+            raise ValueError(f"Empty replay timeline: {timeline_path}")
+        return timeline
+
+    @property
+    def duration(self):
+        return self.timeline[-1][0]
+
+    def elapsed(self):
+        if self.started_at is None:
+            self.started_at = self.clock()
+        elapsed = (self.clock() - self.started_at) * self.speed
+        if self.loop and self.duration > 0:
+            elapsed %= self.duration
+        return elapsed
+
+    @property
+    def finished(self):
+        return not self.loop and self.started_at is not None and self.elapsed() >= self.duration
+
+    def current(self):
+        """Index of the timeline entry in front right now"""
+        # The last entry at or before now; the first one before the timeline starts
+        return max(0, bisect.bisect_right(self.offsets, self.elapsed()) - 1)
+
+    def sample(self):
+        return self.timeline[self.current()][1]
+
+    def sample_with_title(self):
+        index = self.current()
+        return self.timeline[index][1], self.titles[index]
+
+    def close(self):
+        pass
+
+
+BACKENDS = {
+    "oneshot": OneShotBackend,
+    "persistent": PersistentHelperBackend,
+    "replay": ReplayBackend,
+}
+
 
 class WindowMonitor:
-    def __init__(self):
-     """
-    Initialize window monitor for macOS.
-    """
-    pass  # No initialization needed for basic functionality
+    def __init__(self, backend="persistent", **backend_options):
+        """
+        Initialize window monitor.
+
+        Args:
+            backend: "persistent" (one long-lived osascript helper, macOS),
+                     "oneshot" (spawn osascript per sample, macOS),
+                     "replay" (scripted timeline, any platform),
+                     or an object with sample()/close() methods
+            backend_options: Passed to the backend constructor,
+                             e.g. timeline_path for "replay"
+        """
+        if isinstance(backend, str):
+            backend = BACKENDS[backend](**backend_options)
+        self.backend = backend
+        self.latency = SampleLatency()
+        self.histogram = metrics.REGISTRY.histogram(
+            "task_switch_get_active_window_seconds", "Duration of get_active_window in seconds",
+            backend=getattr(backend, "name", type(backend).__name__))
 
     def get_active_window(self):
-        """Get the currently active application on macOS using AppleScript"""
+        """Get the currently active application from the sampling backend"""
+        return self.timed_sample(self.backend.sample, "Error")
+
+    def get_active_window_and_title(self):
+        """
+        (app, window title) of the front window in one backend round trip.
+        Backends without title support report an empty title.
+        """
+        sample_with_title = getattr(self.backend, "sample_with_title", None)
+        if sample_with_title is None:
+            return self.get_active_window(), ""
+        return self.timed_sample(sample_with_title, ("Error", ""))
+
+    def timed_sample(self, sample, on_error):
+        start = time.perf_counter()
         try:
-            cmd = """osascript -e 'tell application "System Events"' -e 'set frontApp to name of first application process whose frontmost is true' -e 'end tell'"""
-            result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-            if result.returncode == 0 and result.stdout:
-                return result.stdout.strip()
-            return "Unknown"
+            return sample()
         except Exception as e:
             print(f"Error getting active window: {e}")
-            return "Error"
\ No newline at end of file
+            return on_error
+        finally:
+            elapsed = time.perf_counter() - start
+            self.latency.record(elapsed)
+            self.histogram.observe(elapsed)
+
+    def latency_report(self):
+        """Per-sample latency of the current backend, in milliseconds"""
+        report = self.latency.report()
+        report["backend"] = getattr(self.backend, "name", type(self.backend).__name__)
+        return report
+
+    def close(self):
+        """Shut down the backend (stops the persistent helper)"""
+        self.backend.close()
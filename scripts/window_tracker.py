@@ -8,6 +8,7 @@ from pystray import MenuItem as item
 import pystray
 from PIL import Image, ImageDraw
 import pandas as pd
+from switch_log import CsvSwitchLog
 
 class TaskTracker:
     def __init__(self, use_tsv=False):
@@ -29,6 +30,7 @@ class TaskTracker:
         self.current_app = None
         self.last_switch_time = None
         self.setup_datafile()
+        self.switch_log = CsvSwitchLog(self.data_path, self.delimiter)
     
     def setup_datafile(self):
         """Initialize the CSV/TSV file if it doesn't exist"""
@@ -52,27 +54,16 @@ class TaskTracker:
     
     def record_app_switch(self, app_from, app_to):
         """Record an application switch in the CSV/TSV file"""
-        now = datetime.datetime.now().isoformat()
+        now = datetime.datetime.now()
         duration = 0
         if self.last_switch_time:
-            duration = int((datetime.datetime.now() - self.last_switch_time).total_seconds())
+            # Rounded like task_tracker.py, so both trackers store the same duration
+            duration = round((now - self.last_switch_time).total_seconds())
         
-        # Get the next ID by counting existing rows
-        next_id = 1
-        try:
-            with open(self.data_path, 'r', newline='') as f:
-                reader = csv.reader(f, delimiter=self.delimiter)
-                next_id = sum(1 for _ in reader)  # Header counts as 1
-        except FileNotFoundError:
-            # File doesn't exist yet, start with ID 1
-            pass
-        
-        # Append the new record
-        with open(self.data_path, 'a', newline='') as f:
-            writer = csv.writer(f, delimiter=self.delimiter)
-            writer.writerow([next_id, now, app_from, app_to, duration])
+        # Append the new record; the id comes from the in-memory counter
+        self.switch_log.append(now, app_from, app_to, duration)
         
-        self.last_switch_time = datetime.datetime.now()
+        self.last_switch_time = now
         print(f"Switch recorded: {app_from} -> {app_to} (Duration: {duration}s)")
     
     def read_recent_switches(self, minutes=1):
@@ -160,6 +151,7 @@ class TaskTracker:
     def stop(self):
         """Stop the tracking process"""
         self.running = False
+        self.switch_log.close()
         print("Task tracking stopped")
 
 class StatsStorage:
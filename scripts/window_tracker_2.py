@@ -1,16 +1,6 @@
-import time
-import datetime
-import subprocess
 import os
-import threading
-import csv
-import pystray
-from pystray import MenuItem as item
-from PIL import Image, ImageDraw
-import pandas as pd
 import sys
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from color_change import set_desktop_color
 
 from tracking_service import TrackingService
 from task_tracker import TaskTracker
@@ -19,9 +9,17 @@ from switch_analyzer import TaskSwitchAnalyzer
 from stats_storage import StatsStorage
 from launch_flow import LaunchFlow
 from color_change import DesktopColor
+from analysis_snapshot import AnalysisSnapshot
+from baselines import HourOfWeekBaselines
+from duration_sketches import DurationSketches
+from switch_writer import SwitchWriter
+from adaptive_sampler import AdaptiveSampler
+from title_log import TitleLog
+import metrics
 
 def create_image():
     """Create a simple icon for the system tray"""
+    from PIL import Image, ImageDraw
     image = Image.new('RGB', (64, 64), color=(0, 0, 0))
     dc = ImageDraw.Draw(image)
     dc.rectangle((16, 16, 48, 48), fill=(0, 120, 212))
@@ -29,6 +27,9 @@ def create_image():
 
 def setup_tray_icon(tracking_service):
     """Set up the system tray icon and menu"""
+    # pystray is only needed here, after tracking has already started
+    import pystray
+    from pystray import MenuItem as item
     
     def on_start(icon, item):
         tracking_service.start()
@@ -39,7 +40,8 @@ def setup_tray_icon(tracking_service):
         icon.update_menu()
     
     def on_exit(icon, item):
-        tracking_service.stop()
+        # Stop only flushes so tracking can be resumed; closing happens once, here
+        tracking_service.close()
         icon.stop()
     
     # Create the menu
@@ -56,29 +58,80 @@ def setup_tray_icon(tracking_service):
 if __name__ == "__main__":
     # Set to True for TSV, False for CSV
     use_tsv = False  # Change this value based on your preference
+    # "text" (CSV/TSV as above), "columnar" (binary column files, see columnar_log.py)
+    # "partitioned" (one file per partition_period, see partitioned_log.py)
+    # or "sqlite" (task_tracker_data.db, see sqlite_log.py for importing a CSV log)
+    storage = "text"
+    partition_period = "day"
+    
+    # Foreground-app sampling: "persistent" (one long-lived helper), "oneshot",
+    # or "replay" with a scripted timeline for running off macOS
+    sampling_backend = "persistent"
+    replay_timeline = None  # e.g. "timeline.csv" with "<seconds>,<app>" lines
+    # Fixed 1s sampling by default. AdaptiveSampler(min_interval=0.25, max_interval=3.0)
+    # samples every 0.25s after a switch and backs off to 3s while the app stays
+    # in front: far fewer samples, but more missed short visits than 1s (run
+    # scripts/adaptive_sampler.py on your own history before switching)
+    sampler = None
+    # Also record time per window title (needs Accessibility permission; titles
+    # can be sensitive, so off by default). Stored in ~/task_switch/data/titles/
+    track_titles = False
+    
+    # Prometheus metrics on http://127.0.0.1:<port>/metrics (None to disable);
+    # a copy is written to ~/task_switch/metrics.prom on exit either way
+    metrics_port = 9464
+    
+    # Flow check threshold: None compares the recent mean with the historical mean;
+    # e.g. 0.25 triggers when the recent median session is below your p25
+    percentile_threshold = None
+    history_days = 28
     
     # Create all the components
-    task_tracker = TaskTracker(use_tsv=use_tsv)
-    window_monitor = WindowMonitor()
-    stats_storage = StatsStorage()
-    switch_analyzer = TaskSwitchAnalyzer(task_tracker, stats_storage)
+    if metrics_port is not None:
+        metrics.start_server(metrics_port)
+    metrics.dump_on_exit()
+    # The switch writer flushes after every batch, so the log need not flush per row
+    task_tracker = TaskTracker(use_tsv=use_tsv, storage=storage, partition_period=partition_period,
+                               flush_every=50)
+    switch_writer = SwitchWriter(task_tracker)
+    if sampling_backend == "replay":
+        window_monitor = WindowMonitor("replay", timeline_path=replay_timeline)
+    else:
+        window_monitor = WindowMonitor(sampling_backend)
+    stats_storage = StatsStorage(switch_log=task_tracker.switch_log)
+    # One cached view of the history shared by the Flow check and the desktop color
+    snapshot = AnalysisSnapshot(task_tracker, stats_storage)
+    # Compare each check with the same hour of the week instead of one global mean
+    baselines = HourOfWeekBaselines(switch_log=task_tracker.switch_log)
+    sketches = None
+    if percentile_threshold is not None:
+        sketches = DurationSketches(switch_log=task_tracker.switch_log)
+    switch_analyzer = TaskSwitchAnalyzer(task_tracker, stats_storage, snapshot=snapshot,
+                                         baselines=baselines, sketches=sketches,
+                                         percentile=percentile_threshold, history_days=history_days)
     flow_launcher = LaunchFlow()
     desktop_color = DesktopColor(switch_analyzer, stats_storage)  # Pass stats_storage
     
+    title_log = TitleLog(os.path.expanduser("~/task_switch/data/titles")) if track_titles else None
+    
     # Create the tracking service that coordinates everything
     tracking_service = TrackingService(
         task_tracker=task_tracker,
         window_monitor=window_monitor,
         switch_analyzer=switch_analyzer,
         flow_launcher=flow_launcher,
-        desktop_color=desktop_color
+        desktop_color=desktop_color,
+        switch_writer=switch_writer,
+        sampler=sampler,
+        title_log=title_log
     )
     
+    # Start tracking automatically on launch, before the slower tray and palette setup
+    tracking_service.start()
+    desktop_color.prerender_palette()  # Renders only colours missing from the cache
+    
     # Set up the system tray icon
     icon = setup_tray_icon(tracking_service)
     
-    # Start tracking automatically on launch
-    tracking_service.start()
-    
     # Run the system tray icon (this will block until you exit)
     icon.run()
\ No newline at end of file
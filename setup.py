@@ -7,7 +7,8 @@ setup(
     install_requires=[
         "pandas",
         "pystray",
-        "pillow"        # Add more dependencies
+        "pillow",
+        "numpy"         # Add more dependencies
     ],
 )
 
@@ -0,0 +1,46 @@
+import pytest
+
+from adaptive_sampler import AdaptiveSampler, FixedSampler, simulate
+
+
+def test_backs_off_while_stable_and_resets_on_a_switch():
+    sampler = AdaptiveSampler(min_interval=0.5, max_interval=3.0, backoff=2.0, burst_switches=10)
+    now = 0.0
+    intervals = []
+    for _ in range(5):
+        intervals.append(sampler.observe(False, now))
+        now += intervals[-1]
+    assert intervals == [1.0, 2.0, 3.0, 3.0, 3.0]
+    assert sampler.observe(True, now) == 0.5
+    report = sampler.report()
+    assert report["switches"] == 1
+    # The switch happened somewhere in the 3s since the previous sample
+    assert report["max_latency_bound_s"] == 3.0
+    assert report["mean_latency_s"] == 1.5
+
+
+def test_stays_fast_during_a_burst():
+    sampler = AdaptiveSampler(min_interval=0.25, max_interval=3.0, backoff=1.5,
+                              burst_switches=3, burst_seconds=30.0)
+    for now in (0.0, 1.0, 2.0):
+        sampler.observe(True, now)
+    assert sampler.observe(False, 10.0) == 0.25
+    assert sampler.report()["burst_samples"] == 1
+    # Once the burst is older than burst_seconds the interval grows again
+    assert sampler.observe(False, 40.0) == pytest.approx(0.375)
+
+
+def test_simulate_counts_samples_and_missed_visits():
+    # Long sessions with one 0.5s visit to B that a 1s poller can miss
+    changes = [(0.0, "A"), (100.3, "B"), (100.8, "A"), (300.0, "C"), (600.0, "C"), (900.0, "A")]
+    fixed = simulate(changes, FixedSampler(1.0))
+    assert fixed["samples"] == 901
+    assert fixed["visits"] == 4
+    assert fixed["missed_visits"] == 1
+    assert fixed["missed_time_s"] == pytest.approx(0.5)
+
+    adaptive = simulate(changes, AdaptiveSampler(0.25, 3.0, 1.5))
+    assert adaptive["samples"] < fixed["samples"] / 2
+    assert adaptive["detected"] + adaptive["missed_visits"] == adaptive["visits"]
+    assert adaptive["max_latency_s"] <= 3.0
+    assert simulate([], FixedSampler()) == {}
@@ -0,0 +1,56 @@
+import datetime
+
+from analysis_snapshot import AnalysisSnapshot
+from stats_storage import StatsStorage
+from task_tracker import TaskTracker
+
+
+def make(tmp_path, switches=20):
+    """Switches 30s apart from now on (the recent buffer covers what is recorded after it starts)"""
+    tracker = TaskTracker(base_dir=str(tmp_path))
+    start = datetime.datetime.now()
+    for i in range(switches):
+        tracker.record_app_switch("A", "B", start + datetime.timedelta(seconds=30 * i))
+    stats = StatsStorage(base_dir=str(tmp_path), switch_log=tracker.switch_log)
+    return start, tracker, AnalysisSnapshot(tracker, stats)
+
+
+def test_statistics_are_cached_until_a_new_switch(tmp_path):
+    start, tracker, snapshot = make(tmp_path)
+    first = snapshot.calculate_statistics()
+    assert snapshot.calculate_statistics() is first
+    assert snapshot.report()["statistics"] == {"hits": 1, "misses": 1}
+
+    tracker.record_app_switch("B", "A", start + datetime.timedelta(minutes=20))
+    assert snapshot.calculate_statistics()["count"] == first["count"] + 1
+    assert snapshot.report()["statistics"]["misses"] == 2
+    tracker.close()
+
+
+def test_recent_windows_are_cut_from_the_widest_one(tmp_path):
+    start, tracker, snapshot = make(tmp_path)
+    now = (start + datetime.timedelta(seconds=30 * 19)).timestamp()
+    wide = snapshot.read_recent_switches(minutes=10, now=now)
+    narrow = snapshot.read_recent_switches(minutes=2, now=now)
+    assert snapshot.report()["recent"] == {"hits": 1, "misses": 1}
+    assert len(wide) == 20
+    # 2 minutes back from the last switch: the switches after now - 120s
+    assert narrow == wide[-4:]
+    # A wider window than the cached one has to be loaded
+    snapshot.read_recent_switches(minutes=30, now=now)
+    assert snapshot.report()["recent"]["misses"] == 2
+    tracker.close()
+
+
+def test_range_statistics_follow_the_log_version(tmp_path):
+    start, tracker, snapshot = make(tmp_path)
+    end = start + datetime.timedelta(minutes=30)
+    since = end - datetime.timedelta(hours=1)
+    first = snapshot.statistics_between(since, end)
+    assert snapshot.statistics_between(since, end) is first
+    assert first == snapshot.stats_storage.statistics_between(since, end)
+
+    tracker.record_app_switch("B", "A", start + datetime.timedelta(minutes=25))
+    assert snapshot.statistics_between(since, end)["count"] == first["count"] + 1
+    assert snapshot.report()["range_statistics"] == {"hits": 1, "misses": 2}
+    tracker.close()
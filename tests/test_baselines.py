@@ -0,0 +1,66 @@
+import datetime
+
+from baselines import HourOfWeekBaselines, bucket_label, hour_of_week
+from task_tracker import TaskTracker
+
+# A Monday
+MONDAY = datetime.datetime(2026, 1, 5, 9, 0, 0)
+
+
+def test_hour_of_week_buckets():
+    assert hour_of_week(MONDAY.replace(hour=0)) == 0
+    assert hour_of_week(MONDAY) == 9
+    assert hour_of_week(MONDAY + datetime.timedelta(days=6, hours=14, minutes=59)) == 167
+    assert bucket_label(9) == "Mon 09:00"
+    assert bucket_label(167) == "Sun 23:00"
+
+
+def record_weeks(tracker, weeks, per_hour, seconds):
+    """per_hour switches `seconds` apart every Monday 9am and Tuesday 15:00"""
+    for week in range(weeks):
+        for day, hour in ((0, 9), (1, 15)):
+            when = MONDAY.replace(hour=hour) + datetime.timedelta(weeks=week, days=day)
+            for i in range(per_hour):
+                tracker.record_app_switch("A", "B", when + datetime.timedelta(seconds=i * seconds))
+    tracker.flush()
+
+
+def test_statistics_come_from_the_matching_bucket(tmp_path):
+    tracker = TaskTracker(base_dir=str(tmp_path))
+    record_weeks(tracker, 4, 20, 60)
+    baselines = HourOfWeekBaselines(base_dir=str(tmp_path), switch_log=tracker.switch_log, min_count=30)
+
+    stats = baselines.statistics_at(MONDAY + datetime.timedelta(weeks=5, minutes=30))
+    assert stats["bucket"] == "Mon 09:00"
+    # The first switch of each block ends the long gap since the previous block
+    assert stats["count"] == 80
+    assert stats["median"] == 60
+    # Not enough sessions yet at Monday 10:00, so callers fall back to the global mean
+    assert baselines.statistics_at(MONDAY.replace(hour=10)) == {}
+    tracker.close()
+
+
+def test_checkpoint_restores_and_catches_up(tmp_path):
+    tracker = TaskTracker(base_dir=str(tmp_path))
+    record_weeks(tracker, 2, 20, 60)
+    baselines = HourOfWeekBaselines(base_dir=str(tmp_path), switch_log=tracker.switch_log, min_count=1)
+    baselines.close()
+
+    record_weeks(tracker, 1, 20, 60)
+    restarted = HourOfWeekBaselines(base_dir=str(tmp_path), switch_log=tracker.switch_log, min_count=1)
+    assert restarted.buckets[9].count == 40
+    assert restarted.update() == 40
+    assert sum(count for _, count, _ in restarted.table()) == 120
+    tracker.close()
+
+
+def test_checkpoint_for_another_log_is_rebuilt(tmp_path):
+    tracker = TaskTracker(base_dir=str(tmp_path))
+    record_weeks(tracker, 1, 10, 60)
+    HourOfWeekBaselines(base_dir=str(tmp_path), switch_log=tracker.switch_log, min_count=1).close()
+
+    other = TaskTracker(base_dir=str(tmp_path), storage="sqlite")
+    rebuilt = HourOfWeekBaselines(base_dir=str(tmp_path), switch_log=other.switch_log, min_count=1)
+    assert sum(bucket.count for bucket in rebuilt.buckets) == 0
+    other.close()
+    tracker.close()
@@ -0,0 +1,75 @@
+import json
+import asyncio
+import datetime
+
+from collector import Collector, encode_event, merged_rows, open_connection, safe_host
+
+WHEN = datetime.datetime(2026, 1, 5, 9, 0, 0)
+
+
+async def exchange(collector, lines):
+    """Send lines to a running collector, then return its stats"""
+    reader, writer = await open_connection(collector.address)
+    writer.write("".join(lines).encode("utf-8") + b'{"stats": true}\n')
+    await writer.drain()
+    stats = json.loads(await reader.readline())
+    writer.close()
+    return stats
+
+
+def run_collector(tmp_path, lines, **options):
+    collector = Collector(str(tmp_path / "root"), "unix:" + str(tmp_path / "collector.sock"), **options)
+
+    async def scenario():
+        server = asyncio.create_task(collector.serve())
+        while collector.server is None:
+            await asyncio.sleep(0.01)
+        stats = await exchange(collector, lines)
+        server.cancel()
+        try:
+            await server
+        except asyncio.CancelledError:
+            pass
+        return stats
+
+    return collector, asyncio.run(scenario())
+
+
+def row(i, duration=5):
+    return [i, (WHEN + datetime.timedelta(seconds=i)).isoformat(), f"App{i}", f"App{i + 1}", duration]
+
+
+def test_events_are_stored_per_host_and_merged_in_time_order(tmp_path):
+    lines = [encode_event("laptop", row(i)) for i in (1, 3, 5)]
+    lines += [encode_event("desktop", row(i)) for i in (2, 4)]
+    collector, stats = run_collector(tmp_path, lines, batch_size=2)
+    assert stats["events"] == 5
+    assert stats["bad_lines"] == 0
+
+    merged = list(merged_rows(collector.root))
+    assert [host for _, host, _ in merged] == ["laptop", "desktop", "laptop", "desktop", "laptop"]
+    assert [r[2] for _, _, r in merged] == ["App1", "App2", "App3", "App4", "App5"]
+    # Each host log has its own ids
+    assert [r[0] for _, host, r in merged if host == "desktop"] == ["1", "2"]
+
+
+def test_non_object_and_malformed_lines_are_counted_not_fatal(tmp_path):
+    lines = ['[1, 2]\n', '5\n', '"text"\n', 'not json\n', '{"host": "laptop"}\n',
+             encode_event("laptop", row(1))]
+    collector, stats = run_collector(tmp_path, lines)
+    assert stats["bad_lines"] == 5
+    assert stats["events"] == 1
+
+
+def test_query_hosts_go_through_safe_host(tmp_path):
+    collector, _ = run_collector(tmp_path, [encode_event("my laptop", row(1))])
+    assert safe_host("my laptop") == "my_laptop"
+    assert len(list(merged_rows(collector.root, hosts=["my laptop"]))) == 1
+    assert list(merged_rows(collector.root, hosts=["../my laptop"])) == []
+
+
+def test_time_range_is_start_exclusive_end_inclusive(tmp_path):
+    collector, _ = run_collector(tmp_path, [encode_event("laptop", row(i)) for i in range(1, 6)])
+    start = (WHEN + datetime.timedelta(seconds=2)).timestamp()
+    end = (WHEN + datetime.timedelta(seconds=4)).timestamp()
+    assert [r[2] for _, _, r in merged_rows(collector.root, start, end)] == ["App3", "App4"]
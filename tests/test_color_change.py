@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+import color_change
+from color_change import PaletteRenderer
+
+
+@pytest.fixture
+def desktop(monkeypatch):
+    """Stands in for the OS call; set "ok" to False to make it fail"""
+    state = {"ok": True, "calls": []}
+
+    def set_desktop_color(r, g, b, image_path=None):
+        state["calls"].append(((r, g, b), image_path))
+        return state["ok"]
+
+    monkeypatch.setattr(color_change, "set_desktop_color", set_desktop_color)
+    return state
+
+
+def test_unchanged_colours_skip_the_os_call(tmp_path, desktop):
+    renderer = PaletteRenderer(cache_dir=str(tmp_path))
+    assert renderer.apply((0, 100, 255))
+    assert not renderer.apply((0, 100, 255))
+    assert renderer.apply((255, 0, 0))
+    assert len(desktop["calls"]) == 2
+    assert renderer.report() == {"applied": 2, "failed": 0, "skipped": 1, "rendered": 2, "evicted": 0}
+
+
+def test_failed_calls_are_reported_and_retried(tmp_path, desktop):
+    renderer = PaletteRenderer(cache_dir=str(tmp_path))
+    desktop["ok"] = False
+    assert not renderer.apply((0, 100, 255))
+    desktop["ok"] = True
+    assert renderer.apply((0, 100, 255))
+    assert len(desktop["calls"]) == 2
+    report = renderer.report()
+    assert (report["applied"], report["failed"], report["skipped"]) == (1, 1, 0)
+
+
+def test_images_are_cached_and_evicted_beyond_max_files(tmp_path, desktop):
+    renderer = PaletteRenderer(cache_dir=str(tmp_path), max_files=2)
+    colors = [(i, 0, 0) for i in range(4)]
+    for color in colors:
+        renderer.apply(color)
+    # Evicted as least recently used, so it is rendered again
+    renderer.apply(colors[0])
+    assert renderer.rendered == 5
+    assert len(os.listdir(str(tmp_path))) == 2
+    # The picture on the desktop is never the one evicted
+    assert os.path.exists(desktop["calls"][-1][1])
+
+
+def test_quantize_snaps_to_palette_steps(tmp_path):
+    renderer = PaletteRenderer(levels=5, cache_dir=str(tmp_path))
+    assert [renderer.quantize(x) for x in (-1, 0.1, 0.13, 0.5, 0.9, 2)] == [0.0, 0.0, 0.25, 0.5, 1.0, 1.0]
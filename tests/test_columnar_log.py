@@ -0,0 +1,104 @@
+import csv
+import time
+import datetime
+
+import pytest
+
+from columnar_log import ColumnarSwitchLog, convert_to_columnar, verify_conversion
+from switch_log import HEADER
+
+# Crosses the US spring-forward change on 2026-03-08
+START = datetime.datetime(2026, 3, 7, 22, 15, 0, 250000)
+STEP = datetime.timedelta(minutes=41, microseconds=7)
+ROWS = 120
+
+
+def when(i):
+    return START + i * STEP
+
+
+@pytest.fixture
+def new_york(monkeypatch):
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def fill(log, rows=ROWS):
+    for i in range(rows):
+        log.append(when(i), f"App{i % 5}", f"App{(i + 1) % 5}", i % 60)
+
+
+def test_round_trip(tmp_path, new_york):
+    log_dir = str(tmp_path / "log.col")
+    log = ColumnarSwitchLog(log_dir)
+    fill(log)
+    log.close()
+
+    reopened = ColumnarSwitchLog(log_dir, read_only=True)
+    rows, offset = reopened.read_since(0)
+    assert offset == ROWS
+    # Local times in the skipped hour do not exist, so compare what survives a round trip
+    expected = [datetime.datetime.fromtimestamp(when(i).timestamp()) for i in range(ROWS)]
+    assert [row[1] for row in rows] == [e.isoformat() for e in expected]
+    assert rows[3] == [4, expected[3].isoformat(), "App3", "App4", 3]
+    assert reopened.next_id == ROWS + 1
+    assert reopened.read_since(offset) == ([], ROWS)
+
+
+def test_tail_by_time(tmp_path):
+    log = ColumnarSwitchLog(str(tmp_path / "log.col"))
+    fill(log)
+    entries = log.tail(when(10).timestamp(), when(20).timestamp())
+    assert [row[0] for _, row in entries] == list(range(12, 22))
+    log.close()
+
+
+def test_dataframe_timestamps_are_local_like_the_csv_log(tmp_path, new_york):
+    pd = pytest.importorskip("pandas")
+    log = ColumnarSwitchLog(str(tmp_path / "log.col"))
+    fill(log)
+    log.flush()
+    df = log.to_dataframe()
+    rows, _ = log.read_since(0)
+    assert df["timestamp"].dt.tz is None
+    assert list(df["timestamp"]) == [pd.Timestamp(row[1]) for row in rows]
+    assert list(df["app_from"][:3]) == ["App0", "App1", "App2"]
+    assert list(df["duration"][:3]) == [0, 1, 2]
+    log.close()
+
+
+def test_read_only_sees_rows_complete_when_opened(tmp_path):
+    log_dir = str(tmp_path / "log.col")
+    writer = ColumnarSwitchLog(log_dir)
+    fill(writer, 10)
+    writer.flush()
+    reader = ColumnarSwitchLog(log_dir, read_only=True)
+    with open(reader.column_path("duration"), "ab") as f:
+        # A row torn mid-write by the tracker
+        f.write(b"\x01\x00")
+    assert reader.rows_on_disk() == 10
+    with pytest.raises(ValueError):
+        reader.append(START, "A", "B", 1)
+    writer.close()
+
+
+def test_convert_and_verify(tmp_path):
+    src = str(tmp_path / "task_tracker_data.csv")
+    with open(src, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        for i in range(ROWS):
+            writer.writerow([2 * i + 1, when(i).isoformat(), f"App{i % 5}", "Finder", i])
+        writer.writerow(["short", "row"])
+    log_dir = str(tmp_path / "log.col")
+    assert convert_to_columnar(src, log_dir) == ROWS
+    assert verify_conversion(src, log_dir)
+    with pytest.raises(ValueError):
+        convert_to_columnar(src, log_dir)
+
+    with open(src, "a", newline="") as f:
+        csv.writer(f).writerow([999, when(ROWS).isoformat(), "A", "B", 1])
+    assert not verify_conversion(src, log_dir)
@@ -0,0 +1,121 @@
+import os
+import datetime
+
+from journal_log import JournaledSwitchLog, SwitchJournal
+from switch_log import HEADER, read_rows_since
+
+WHEN = datetime.datetime(2026, 1, 5, 9, 0, 0)
+
+
+def csv_ids(path):
+    rows, _ = read_rows_since(path, 0)
+    return [int(row[0]) for row in rows]
+
+
+def journal_row(row_id, app_from="Code", app_to="Slack", duration=5):
+    when = WHEN + datetime.timedelta(seconds=row_id)
+    return [row_id, when.isoformat(), app_from, app_to, duration]
+
+
+def make_log(tmp_path, rows=3):
+    path = str(tmp_path / "task_tracker_data.csv")
+    # TaskTracker writes the header before opening the log
+    with open(path, 'w') as f:
+        f.write(",".join(HEADER) + "\n")
+    log = JournaledSwitchLog(path, fsync=False)
+    for i in range(rows):
+        log.append(WHEN + datetime.timedelta(seconds=i), "Code", "Slack", 1)
+    log.close()
+    return path
+
+
+def test_replays_journal_records_missing_from_csv(tmp_path):
+    path = make_log(tmp_path)
+    # Crash after the journal write but before the CSV write
+    with open(path + ".journal", 'wb') as f:
+        f.write(SwitchJournal.encode(journal_row(4)) + SwitchJournal.encode(journal_row(5)))
+
+    log = JournaledSwitchLog(path, fsync=False)
+    assert log.recovery["replayed"] == 2
+    assert log.next_id == 6
+    log.close()
+    assert csv_ids(path) == [1, 2, 3, 4, 5]
+    assert os.path.getsize(path + ".journal") == 0
+
+
+def test_torn_journal_tail_is_truncated(tmp_path):
+    path = make_log(tmp_path)
+    torn = SwitchJournal.encode(journal_row(5))[:-7]
+    with open(path + ".journal", 'wb') as f:
+        f.write(SwitchJournal.encode(journal_row(4)) + torn)
+
+    log = JournaledSwitchLog(path, fsync=False)
+    assert log.recovery["replayed"] == 1
+    assert log.recovery["journal_truncated_bytes"] == len(torn)
+    log.close()
+    assert csv_ids(path) == [1, 2, 3, 4]
+
+
+def test_recovery_stops_at_crc_mismatch(tmp_path):
+    path = make_log(tmp_path)
+    corrupt = bytearray(SwitchJournal.encode(journal_row(5)))
+    corrupt[-3] ^= 0x01
+    with open(path + ".journal", 'wb') as f:
+        f.write(SwitchJournal.encode(journal_row(4)) + bytes(corrupt) + SwitchJournal.encode(journal_row(6)))
+
+    log = JournaledSwitchLog(path, fsync=False)
+    # Nothing after the corrupt record is trusted
+    assert log.recovery["replayed"] == 1
+    assert log.recovery["journal_records"] == 1
+    assert log.recovery["journal_truncated_bytes"] == len(corrupt) + len(SwitchJournal.encode(journal_row(6)))
+    log.close()
+    assert csv_ids(path) == [1, 2, 3, 4]
+
+
+def test_journal_duplicates_of_csv_rows_are_skipped(tmp_path):
+    path = make_log(tmp_path)
+    # A retried commit can leave rows the CSV already has
+    with open(path + ".journal", 'wb') as f:
+        f.write(b"".join(SwitchJournal.encode(journal_row(i)) for i in (2, 3, 4, 4)))
+
+    log = JournaledSwitchLog(path, fsync=False)
+    assert log.recovery["replayed"] == 1
+    log.close()
+    assert csv_ids(path) == [1, 2, 3, 4]
+
+
+def test_torn_csv_row_is_truncated(tmp_path):
+    path = make_log(tmp_path)
+    with open(path, 'a') as f:
+        f.write("4,2026-01-05T09:00:04,Co")
+
+    log = JournaledSwitchLog(path, fsync=False)
+    assert log.next_id == 4
+    log.append(WHEN + datetime.timedelta(seconds=10), "Code", "Mail", 2)
+    log.close()
+    assert csv_ids(path) == [1, 2, 3, 4]
+
+
+class FailingWriter:
+    def writerow(self, row):
+        raise OSError("disk full")
+
+
+def test_failed_commit_keeps_the_group_and_reopens_after_close(tmp_path):
+    path = make_log(tmp_path)
+    log = JournaledSwitchLog(path, fsync=False, group_size=100)
+    log.append(WHEN, "Code", "Slack", 1)
+    log.open()
+    writer, log.writer = log.writer, FailingWriter()
+    try:
+        log.commit()
+    except OSError:
+        pass
+    assert len(log.group) == 1
+    log.writer = writer
+    log.close()
+
+    # Appending after close reopens the files
+    log.append(WHEN, "Slack", "Code", 1)
+    log.close()
+    assert csv_ids(path) == [1, 2, 3, 4, 5]
@@ -0,0 +1,158 @@
+import os
+import csv
+import json
+import datetime
+
+import pytest
+
+from partitioned_log import PartitionedSwitchLog, migrate_monolithic
+from stats_storage import StatsStorage
+from switch_analyzer import TaskSwitchAnalyzer
+from switch_log import HEADER
+from task_tracker import TaskTracker
+
+START = datetime.datetime(2026, 3, 2, 9, 0, 0)
+STEP = datetime.timedelta(minutes=53)
+ROWS = 300
+
+
+def when(i):
+    return START + i * STEP
+
+
+def fill(log, rows=ROWS):
+    for i in range(rows):
+        log.append(when(i), f"App{i % 4}", f"App{(i + 1) % 4}", 10 + i % 37)
+
+
+def scan(log, start=None, end=None):
+    durations = [int(row[4]) for _, row in log.rows_between(start, end)]
+    if not durations:
+        return {"count": 0, "sum": 0, "sumsq": 0, "min": None, "max": None}
+    return {"count": len(durations), "sum": sum(durations), "sumsq": sum(d * d for d in durations),
+            "min": min(durations), "max": max(durations)}
+
+
+def test_round_trip_across_partitions(tmp_path):
+    log_dir = str(tmp_path / "log")
+    log = PartitionedSwitchLog(log_dir, "day")
+    fill(log)
+    log.close()
+
+    days = {when(i).strftime("%Y-%m-%d") for i in range(ROWS)}
+    assert sorted(f for f in os.listdir(log_dir) if f.endswith(".csv")) == sorted(f"{d}.csv" for d in days)
+    with open(os.path.join(log_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+    assert manifest["period"] == "day"
+    assert sum(entry["rows"] for entry in manifest["partitions"].values()) == ROWS
+
+    reopened = PartitionedSwitchLog(log_dir, "day", read_only=True)
+    rows = [row for _, row in reopened.rows_between()]
+    assert [int(row[0]) for row in rows] == list(range(1, ROWS + 1))
+    assert rows[7] == ["8", when(7).isoformat(), "App3", "App0", str(10 + 7 % 37)]
+    assert reopened.next_id == ROWS + 1
+
+
+def test_read_since_walks_every_partition(tmp_path):
+    log = PartitionedSwitchLog(str(tmp_path / "log"), "day")
+    fill(log)
+    cursor, ids = 0, []
+    while True:
+        rows, cursor = log.read_since(cursor)
+        if not rows:
+            break
+        ids.extend(int(row[0]) for row in rows)
+    assert ids == list(range(1, ROWS + 1))
+    log.close()
+
+
+@pytest.mark.parametrize("first, last", [(None, None), (0, 299), (5, 40), (27, 28), (100, 101), (-3, 12), (290, 400)])
+def test_aggregate_matches_a_scan(tmp_path, first, last):
+    log = PartitionedSwitchLog(str(tmp_path / "log"), "day")
+    fill(log)
+    start = when(first).timestamp() if first is not None else None
+    end = when(last).timestamp() if last is not None else None
+    assert log.aggregate(start, end) == scan(log, start, end)
+    log.close()
+
+
+def test_overlapping_prunes_partitions(tmp_path):
+    log = PartitionedSwitchLog(str(tmp_path / "log"), "day")
+    fill(log)
+    day = datetime.datetime.combine(when(100).date(), datetime.time())
+    names = log.overlapping(day.timestamp(), (day + datetime.timedelta(hours=23)).timestamp())
+    assert names == [day.strftime("%Y-%m-%d")]
+    assert len(log.partitions) > 5
+    log.close()
+
+
+def test_reconcile_picks_up_rows_after_the_manifest(tmp_path):
+    log_dir = str(tmp_path / "log")
+    log = PartitionedSwitchLog(log_dir, "day", manifest_every=100000)
+    fill(log, 10)
+    log.close()
+    # Rows flushed to the partition but never recorded in the manifest
+    log = PartitionedSwitchLog(log_dir, "day", manifest_every=100000)
+    for i in range(10, 20):
+        log.append(when(i), "A", "B", 5)
+    log.file.flush()
+    log.file.close()
+    log.file = None
+
+    reopened = PartitionedSwitchLog(log_dir, "day", read_only=True)
+    assert reopened.aggregate()["count"] == 20
+    assert reopened.next_id == 21
+
+
+def test_read_only_missing_log_is_empty(tmp_path):
+    log_dir = str(tmp_path / "never_written")
+    log = PartitionedSwitchLog(log_dir, "day", read_only=True)
+    assert log.partitions == {}
+    assert log.read_since(0) == ([], 0)
+    assert list(log.rows_between()) == []
+    assert log.aggregate()["count"] == 0
+    assert not os.path.exists(log_dir)
+    with pytest.raises(ValueError):
+        log.append(START, "A", "B", 1)
+
+
+def test_migrate_monolithic_keeps_ids_and_rows(tmp_path):
+    src = str(tmp_path / "task_tracker_data.csv")
+    with open(src, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        for i in range(50):
+            # Ids with gaps, as left behind by hand-edited logs
+            writer.writerow([3 * i + 1, when(i).isoformat(), "A", "B", i])
+        writer.writerow(["bad", "row"])
+    log_dir = str(tmp_path / "log")
+    assert migrate_monolithic(src, log_dir, "day") == 50
+
+    log = PartitionedSwitchLog(log_dir, "day", read_only=True)
+    rows = [row for _, row in log.rows_between()]
+    assert [int(row[0]) for row in rows] == [3 * i + 1 for i in range(50)]
+    assert [row[1] for row in rows] == [when(i).isoformat() for i in range(50)]
+    assert log.next_id == 3 * 49 + 2
+    with pytest.raises(ValueError):
+        migrate_monolithic(src, log_dir, "day")
+
+
+@pytest.mark.parametrize("storage", ["text", "partitioned", "sqlite"])
+def test_statistics_between_agrees_across_storages(tmp_path, storage):
+    base_dir = str(tmp_path)
+    tracker = TaskTracker(base_dir=base_dir, storage=storage)
+    for i in range(ROWS):
+        tracker.record_app_switch(f"App{i % 3}", f"App{(i + 1) % 3}", when(i))
+    tracker.flush()
+    stats = StatsStorage(base_dir=base_dir, switch_log=tracker.switch_log)
+
+    # Every switch after the first is 53 minutes long
+    result = stats.statistics_between(when(20), when(60))
+    assert result["count"] == 40
+    assert result["mean"] == STEP.total_seconds()
+    assert stats.statistics_between(when(ROWS), when(ROWS + 10)) == {}
+
+    analyzer = TaskSwitchAnalyzer(tracker, stats, clock=lambda: when(60).timestamp(), stats_days=1)
+    # 1440 / 53 minutes: the last day holds switches 33..60
+    assert analyzer.calculate_statistics()["count"] == 28
+    tracker.close()
@@ -0,0 +1,65 @@
+import random
+
+from quantile_sketch import KllSketch
+from running_stats import DurationAggregate
+
+
+def rank_error(values, q, estimate):
+    """Distance in rank (as a fraction of the count) between the estimate and the true q-quantile"""
+    below = sum(1 for v in values if v < estimate)
+    at_or_below = sum(1 for v in values if v <= estimate)
+    target = q * len(values)
+    if below <= target <= at_or_below:
+        return 0.0
+    return min(abs(below - target), abs(at_or_below - target)) / len(values)
+
+
+def test_merged_sketch_matches_the_union():
+    rng = random.Random(7)
+    k = 200
+    parts = [[int(rng.expovariate(1 / 45)) for _ in range(20000)] for _ in range(4)]
+    # Differently shaped parts, so the merge cannot hide behind identical distributions
+    parts.append([int(rng.gauss(600, 50)) for _ in range(10000)])
+    merged = KllSketch(k, seed=1)
+    for i, part in enumerate(parts):
+        sketch = KllSketch(k, seed=i + 2)
+        for value in part:
+            sketch.add(value)
+        merged.merge(sketch)
+
+    values = sorted(v for part in parts for v in part)
+    assert merged.count == len(values)
+    assert merged.min == values[0] and merged.max == values[-1]
+    for q in (0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99):
+        # About 1.7 / k is expected; allow twice that
+        assert rank_error(values, q, merged.quantile(q)) <= 3.4 / k, q
+
+
+def test_merge_survives_a_checkpoint_round_trip():
+    rng = random.Random(3)
+    a, b = KllSketch(64, seed=1), KllSketch(64, seed=2)
+    values = []
+    for sketch in (a, b):
+        for _ in range(5000):
+            value = rng.randint(0, 1000)
+            sketch.add(value)
+            values.append(value)
+    merged = KllSketch.from_dict(a.to_dict()).merge(KllSketch.from_dict(b.to_dict()))
+    values.sort()
+    assert merged.count == len(values)
+    assert rank_error(values, 0.5, merged.quantile(0.5)) <= 3.4 / 64
+
+
+def test_duration_aggregates_merge_exactly_except_quantiles():
+    rng = random.Random(11)
+    values = [rng.randint(0, 300) for _ in range(3000)]
+    whole = DurationAggregate()
+    halves = DurationAggregate(), DurationAggregate()
+    for i, value in enumerate(values):
+        whole.add(value)
+        halves[i % 2].add(value)
+    merged = halves[0].merge(halves[1])
+    assert (merged.count, merged.total, merged.sumsq, merged.min, merged.max) == \
+        (whole.count, whole.total, whole.sumsq, whole.min, whole.max)
+    assert abs(merged.std() - whole.std()) < 1e-9
+    assert rank_error(sorted(values), 0.5, merged.quantile(0.5)) <= 3.4 / 200
@@ -0,0 +1,74 @@
+import os
+import datetime
+
+import pytest
+
+from replay import ReplayEngine, open_log_entries, parse_grid, sweep
+from synthetic_log import write_log
+from task_tracker import TaskTracker
+
+
+@pytest.fixture(scope="module")
+def entries(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("replay") / "task_tracker_data.csv")
+    write_log(path, 400, app_count=6, mean_session=30, seed=3)
+    return open_log_entries(path)
+
+
+def test_replay_is_deterministic_and_needs_no_home_directory(entries, tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    first = ReplayEngine(entries).run()
+    second = ReplayEngine(entries).run()
+    assert first == second
+    assert first["switches"] == len(entries)
+    assert first["color_changes"] > 0
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_lower_threshold_launches_flow_less_often(entries):
+    strict, lenient = sweep(entries, parse_grid(["threshold_ratio=0.2,0.8"]), workers=1)
+    assert strict["params"]["threshold_ratio"] == 0.2
+    assert strict["flow_launches"] <= lenient["flow_launches"]
+
+
+def test_baselines_and_percentile_modes_run(entries):
+    reports = sweep(entries, parse_grid(["baselines=true,false", "percentile=null,0.25"]), workers=1)
+    assert len(reports) == 4
+    assert all(report["switches"] == len(entries) for report in reports)
+
+
+def test_malformed_rows_are_skipped(tmp_path):
+    path = tmp_path / "log.csv"
+    path.write_text("id,timestamp,app_from,app_to,duration\n"
+                    "1,2026-01-05T09:00:00,Code,Slack,x\n"
+                    "2,not a date,Slack,Code,5\n"
+                    "3,2026-01-05T09:00:05,Slack,Code,5\n"
+                    "4,2026-01-05T09:00:06,Code,Slack\n")
+    entries = open_log_entries(str(path))
+    assert [row[0] for _, row in entries] == ["1", "3", "4"]
+    assert ReplayEngine(entries).run()["switches"] == 3
+
+
+def test_reads_every_storage_format_alike(tmp_path):
+    start = datetime.datetime(2026, 1, 5, 9, 0, 0)
+    paths = []
+    for storage in ("text", "columnar", "partitioned", "sqlite"):
+        tracker = TaskTracker(base_dir=str(tmp_path / storage), storage=storage)
+        for i in range(50):
+            tracker.record_app_switch(f"App{i % 4}", f"App{(i + 1) % 4}", start + datetime.timedelta(seconds=7 * i))
+        tracker.close()
+        paths.append(tracker.data_path)
+    reports = [ReplayEngine(open_log_entries(path)).run() for path in paths]
+    assert all(report == reports[0] for report in reports)
+
+
+class LiveScoringEngine(ReplayEngine):
+    """Lets DesktopColor score each tick from the recent buffer itself, as the tracker does"""
+    def color_scores(self):
+        return None
+
+
+@pytest.mark.parametrize("weighting", ["linear", "exponential"])
+def test_precomputed_tick_scores_match_live_scoring(entries, weighting):
+    params = {"color_weighting": weighting, "color_interval": 7}
+    assert ReplayEngine(entries, params).run() == LiveScoringEngine(entries, params).run()
@@ -0,0 +1,89 @@
+import os
+import sqlite3
+import datetime
+
+import pytest
+
+from report import build_report, iter_entries, log_path, report_rows
+from sqlite_log import SqliteSwitchLog
+from task_tracker import TaskTracker
+
+START = datetime.datetime(2026, 1, 5, 9, 0, 0)
+STEP = datetime.timedelta(minutes=17)
+ROWS = 400
+STORAGES = [("text", False), ("text", True), ("columnar", False), ("partitioned", False), ("sqlite", False)]
+
+
+def write_history(base_dir, storage, use_tsv):
+    """ROWS switches 17 minutes apart (a bit under five days), cycling through three apps"""
+    tracker = TaskTracker(base_dir=base_dir, storage=storage, use_tsv=use_tsv)
+    for i in range(ROWS):
+        tracker.record_app_switch(f"App{i % 3}", f"App{(i + 1) % 3}", START + i * STEP)
+    tracker.close()
+    return log_path(base_dir, storage, use_tsv)
+
+
+@pytest.fixture(params=STORAGES, ids=lambda p: p[0] + ("-tsv" if p[1] else ""))
+def history(request, tmp_path):
+    return write_history(str(tmp_path), *request.param)
+
+
+def epoch(i):
+    return (START + i * STEP).timestamp()
+
+
+def test_all_rows_in_time_order(history):
+    entries = list(iter_entries(history))
+    assert [int(row[0]) for _, row in entries] == list(range(1, ROWS + 1))
+    assert [e for e, _ in entries] == [epoch(i) for i in range(ROWS)]
+
+
+@pytest.mark.parametrize("first, last", [(0, 10), (37, 38), (100, 355), (398, 399), (-5, 3)])
+def test_range_is_start_exclusive_end_inclusive(history, first, last):
+    start = (START + first * STEP).timestamp()
+    end = (START + last * STEP).timestamp()
+    ids = [int(row[0]) for _, row in iter_entries(history, start, end)]
+    # Row i (id i + 1) is at START + i * STEP
+    assert ids == [i + 1 for i in range(max(first + 1, 0), min(last, ROWS - 1) + 1)]
+
+
+def test_range_between_rows_and_outside_the_log(history):
+    half = STEP / 2
+    start = (START + 10 * STEP + half).timestamp()
+    end = (START + 12 * STEP + half).timestamp()
+    assert [int(row[0]) for _, row in iter_entries(history, start, end)] == [12, 13]
+    after = (START + ROWS * STEP).timestamp()
+    assert list(iter_entries(history, after)) == []
+    assert list(iter_entries(history, None, START.timestamp() - 1)) == []
+
+
+def test_report_groups_by_app_and_day(history):
+    groups, summary = build_report(iter_entries(history), "app")
+    assert summary["switches"] == ROWS
+    assert sorted(groups) == ["App0", "App1", "App2"]
+    # The first switch has no previous one to measure
+    assert summary["total_s"] == (ROWS - 1) * STEP.total_seconds()
+
+    groups, _ = build_report(iter_entries(history), "day")
+    rows = report_rows(groups, "day")
+    assert [row["day"] for row in rows] == sorted({(START + i * STEP).date().isoformat() for i in range(ROWS)})
+    assert sum(row["switches"] for row in rows) == ROWS
+
+
+def test_sqlite_reader_never_creates_a_database(tmp_path):
+    path = str(tmp_path / "missing.db")
+    with pytest.raises(sqlite3.OperationalError):
+        list(iter_entries(path))
+    assert not os.path.exists(path)
+
+
+def test_sqlite_reader_works_while_the_tracker_holds_a_write_transaction(tmp_path):
+    path = write_history(str(tmp_path), "sqlite", False)
+    writer = SqliteSwitchLog(path, flush_every=1000)
+    writer.append(START + ROWS * STEP, "App0", "App1", 5)
+    assert writer.connection.in_transaction
+    # Only committed rows are visible, and reading does not block the writer
+    assert len(list(iter_entries(path))) == ROWS
+    writer.append(START + (ROWS + 1) * STEP, "App1", "App2", 5)
+    writer.close()
+    assert len(list(iter_entries(path))) == ROWS + 2
@@ -0,0 +1,69 @@
+import time
+import threading
+
+from scheduler import Scheduler
+
+
+def test_stop_before_run_returns_at_once():
+    scheduler = Scheduler()
+    scheduler.add("sample", 0.01, lambda: None)
+    scheduler.stop()
+    thread = threading.Thread(target=scheduler.run)
+    thread.start()
+    thread.join(1.0)
+    assert not thread.is_alive()
+    assert scheduler.tasks["sample"].runs == 0
+
+
+def test_deadlines_do_not_drift_with_a_slow_task():
+    clock = [0.0]
+    scheduler = Scheduler(clock=lambda: clock[0])
+    scheduler.stop_event.wait = lambda delay: clock.__setitem__(0, clock[0] + delay)
+    ran = []
+
+    def slow():
+        ran.append(clock[0])
+        clock[0] += 0.3
+        if len(ran) == 4:
+            scheduler.stop()
+
+    scheduler.add("slow", 1.0, slow)
+    scheduler.run()
+    assert ran == [1.0, 2.0, 3.0, 4.0]
+
+
+def test_overrun_counts_missed_runs_instead_of_bursting():
+    clock = [0.0]
+    scheduler = Scheduler(clock=lambda: clock[0])
+    scheduler.stop_event.wait = lambda delay: clock.__setitem__(0, clock[0] + delay)
+    ran = []
+
+    def task():
+        ran.append(clock[0])
+        if len(ran) == 1:
+            clock[0] += 2.5
+        elif len(ran) == 2:
+            scheduler.stop()
+
+    scheduler.add("task", 1.0, task)
+    scheduler.run()
+    assert ran == [1.0, 4.0]
+    assert scheduler.tasks["task"].missed == 2
+
+
+def test_join_waits_for_background_runs():
+    scheduler = Scheduler()
+    finished = threading.Event()
+
+    def background():
+        time.sleep(0.2)
+        finished.set()
+
+    scheduler.add("analysis", 0.01, background, background=True)
+    thread = threading.Thread(target=scheduler.run)
+    thread.start()
+    time.sleep(0.05)
+    scheduler.stop()
+    thread.join()
+    assert scheduler.join(2.0) == []
+    assert finished.is_set()
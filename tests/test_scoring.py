@@ -0,0 +1,62 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+import scoring
+from scoring import durations_array, entries_to_arrays, recency_scores, rows_to_arrays, score_windows
+
+
+def test_recency_scores_weightings():
+    scores = recency_scores([10, 20, 30, 40])
+    assert scores["mean"] == 25
+    assert scores["median"] == 25
+    # Weights 1, 2, 3, 4: the newest session counts most
+    assert scores["linear"] == pytest.approx((10 + 40 + 90 + 160) / 10)
+    # With times, a session half_life seconds older weighs half as much
+    scores = recency_scores([10, 40], times=[0, 60], half_life=60)
+    assert scores["exponential"] == pytest.approx((10 * 0.5 + 40) / 1.5)
+    assert recency_scores([])["count"] == 0
+
+
+def test_malformed_durations_are_skipped():
+    rows = [["1", "2026-01-05T09:00:00", "A", "B", "5"], ["2", "2026-01-05T09:00:07", "B", "A", ""],
+            ["3", "not a date", "A", "B", "7"], ["4", "2026-01-05T09:00:09", "B", "A", "x"], ["5"]]
+    assert list(durations_array(rows)) == [5.0, 7.0]
+    times, durations = rows_to_arrays(rows)
+    assert list(durations) == [5.0]
+    assert len(times) == 1
+
+
+@pytest.mark.parametrize("chunk_cells", [scoring.MAX_CHUNK_CELLS, 7])
+def test_score_windows_matches_recency_scores_at_every_tick(monkeypatch, chunk_cells):
+    monkeypatch.setattr(scoring, "MAX_CHUNK_CELLS", chunk_cells)
+    rng = random.Random(5)
+    times, now = [], 1_700_000_000.0
+    for _ in range(300):
+        # Bursts and long gaps, so some windows are empty
+        now += rng.choice([rng.uniform(1, 30), rng.uniform(600, 3000)])
+        times.append(now)
+    durations = [rng.randint(0, 120) for _ in times]
+    ticks = np.arange(times[0] - 50, times[-1] + 700, 37.0)
+    window = 600
+
+    result = score_windows(times, durations, ticks, window, half_life=90)
+    for i, tick in enumerate(ticks):
+        inside = [j for j, t in enumerate(times) if tick - window < t <= tick]
+        assert result["count"][i] == len(inside)
+        if not inside:
+            assert math.isnan(result["mean"][i]) and math.isnan(result["linear"][i])
+            continue
+        expected = recency_scores([durations[j] for j in inside], [times[j] for j in inside],
+                                  half_life=90, now=tick)
+        for name in ("mean", "linear", "exponential"):
+            assert result[name][i] == pytest.approx(expected[name]), (name, tick)
+
+
+def test_entries_to_arrays_keeps_times_aligned():
+    entries = [(1.0, ["1", "t", "A", "B", "3"]), (2.0, ["2", "t", "B", "A", ""]), (3.0, ["3", "t", "A", "B", "4"])]
+    times, durations = entries_to_arrays(entries)
+    assert list(times) == [1.0, 3.0]
+    assert list(durations) == [3.0, 4.0]
@@ -0,0 +1,108 @@
+import csv
+import sqlite3
+import datetime
+
+import pytest
+
+from sqlite_log import SqliteSwitchLog, import_csv
+from switch_log import HEADER
+
+START = datetime.datetime(2026, 4, 13, 7, 30, 0, 500)
+STEP = datetime.timedelta(minutes=9, seconds=4)
+ROWS = 200
+
+
+def when(i):
+    return START + i * STEP
+
+
+def fill(log, first=0, rows=ROWS):
+    for i in range(first, first + rows):
+        log.append(when(i), f"App{i % 4}", f"App{(i + 1) % 4}", i % 45)
+
+
+def test_round_trip_and_reopen(tmp_path):
+    db_path = str(tmp_path / "log.db")
+    log = SqliteSwitchLog(db_path, flush_every=25)
+    fill(log)
+    log.close()
+
+    log = SqliteSwitchLog(db_path)
+    assert log.next_id == ROWS + 1
+    rows, cursor = log.read_since(0)
+    assert cursor == ROWS
+    assert rows[5] == [6, when(5).isoformat(), "App1", "App2", 5]
+    assert [row[0] for row in rows] == list(range(1, ROWS + 1))
+    # Appends continue the id sequence after a reopen
+    assert log.append(when(ROWS), "A", "B", 1)[0] == ROWS + 1
+    assert log.read_since(cursor) == ([[ROWS + 1, when(ROWS).isoformat(), "A", "B", 1]], ROWS + 1)
+    log.close()
+
+
+def test_reconnects_after_close(tmp_path):
+    log = SqliteSwitchLog(str(tmp_path / "log.db"))
+    fill(log, rows=3)
+    log.close()
+    fill(log, 3, 2)
+    assert [row[0] for row in log.read_since(0)[0]] == [1, 2, 3, 4, 5]
+    log.close()
+
+
+def test_uncommitted_batch_is_invisible_to_readers(tmp_path):
+    db_path = str(tmp_path / "log.db")
+    writer = SqliteSwitchLog(db_path, flush_every=100)
+    fill(writer, rows=10)
+    writer.flush()
+    fill(writer, 10, 5)
+    reader = SqliteSwitchLog(db_path, read_only=True)
+    assert len(reader.read_since(0)[0]) == 10
+    writer.flush()
+    assert len(reader.read_since(0)[0]) == 15
+    with pytest.raises(ValueError):
+        reader.append(START, "A", "B", 1)
+    reader.close()
+    writer.close()
+
+
+def test_read_only_never_creates_a_database(tmp_path):
+    with pytest.raises(sqlite3.OperationalError):
+        SqliteSwitchLog(str(tmp_path / "missing.db"), read_only=True)
+    assert not (tmp_path / "missing.db").exists()
+
+
+@pytest.mark.parametrize("first, last", [(0, 199), (10, 20), (57, 58), (-4, 3), (190, 250)])
+def test_tail_and_aggregate_use_the_same_range(tmp_path, first, last):
+    log = SqliteSwitchLog(str(tmp_path / "log.db"))
+    fill(log)
+    start, end = when(first).timestamp(), when(last).timestamp()
+    entries = log.tail(start, end)
+    durations = [row[4] for _, row in entries]
+    assert [row[0] for _, row in entries] == [i + 1 for i in range(max(first + 1, 0), min(last, ROWS - 1) + 1)]
+    totals = log.aggregate(start, end)
+    assert totals["count"] == len(durations)
+    assert totals["sum"] == sum(durations)
+    assert totals["sumsq"] == sum(d * d for d in durations)
+    assert totals["min"] == (min(durations) if durations else None)
+    assert totals["max"] == (max(durations) if durations else None)
+    log.close()
+
+
+def test_import_csv_keeps_ids(tmp_path):
+    src = str(tmp_path / "task_tracker_data.tsv")
+    with open(src, "w", newline="") as f:
+        writer = csv.writer(f, delimiter="\t")
+        writer.writerow(HEADER)
+        for i in range(ROWS):
+            writer.writerow([2 * i + 1, when(i).isoformat(), "Mail, Inc", "Safari", i])
+        writer.writerow(["oops"])
+    db_path = str(tmp_path / "log.db")
+    assert import_csv(src, db_path, "\t") == ROWS
+
+    log = SqliteSwitchLog(db_path)
+    rows, _ = log.read_since(0)
+    assert [row[0] for row in rows] == [2 * i + 1 for i in range(ROWS)]
+    assert rows[-1] == [2 * ROWS - 1, when(ROWS - 1).isoformat(), "Mail, Inc", "Safari", ROWS - 1]
+    assert log.next_id == 2 * ROWS
+    log.close()
+    with pytest.raises(ValueError):
+        import_csv(src, db_path, "\t")
@@ -0,0 +1,78 @@
+import os
+import datetime
+
+from stats_storage import StatsStorage
+from task_tracker import TaskTracker
+
+START = datetime.datetime(2026, 2, 9, 8, 0, 0)
+LEGACY = "timestamp,count,mean,median,std,min,max\n2025-12-01 10:00:00,12,30.5,20,4.1,1,90\n"
+
+
+def write_switches(tracker, first, count):
+    for i in range(first, first + count):
+        tracker.record_app_switch("A", "B", START + datetime.timedelta(seconds=10 * i + i % 7))
+    tracker.flush()
+
+
+def stats_path(base_dir):
+    return os.path.join(base_dir, "data", "duration_stats.csv")
+
+
+def test_checkpoint_restores_and_catches_up(tmp_path):
+    base_dir = str(tmp_path)
+    tracker = TaskTracker(base_dir=base_dir)
+    write_switches(tracker, 0, 250)
+    stats = StatsStorage(base_dir=base_dir, switch_log=tracker.switch_log, checkpoint_every=100)
+    stats.calculate_statistics()
+    assert os.path.exists(stats_path(base_dir))
+
+    write_switches(tracker, 250, 30)
+    expected = stats.calculate_statistics()
+    restarted = StatsStorage(base_dir=base_dir, switch_log=tracker.switch_log, checkpoint_every=100)
+    # Restored from the snapshot taken at row 250; only the 30 rows after it are read
+    assert restarted.last_id == 250
+    result = restarted.calculate_statistics()
+    for key in ("count", "mean", "std", "min", "max"):
+        assert result[key] == expected[key]
+    tracker.close()
+
+
+def test_torn_last_snapshot_falls_back_to_the_previous_one(tmp_path):
+    base_dir = str(tmp_path)
+    tracker = TaskTracker(base_dir=base_dir)
+    write_switches(tracker, 0, 250)
+    StatsStorage(base_dir=base_dir, switch_log=tracker.switch_log, checkpoint_every=100).calculate_statistics()
+    with open(stats_path(base_dir), "a") as f:
+        f.write("2026-02-09 09:00:00,300,12.0,10")
+    restarted = StatsStorage(base_dir=base_dir, switch_log=tracker.switch_log, checkpoint_every=100)
+    assert restarted.last_id == 250
+    tracker.close()
+
+
+def test_reading_leaves_a_legacy_file_alone(tmp_path):
+    base_dir = str(tmp_path)
+    os.makedirs(os.path.join(base_dir, "data"))
+    with open(stats_path(base_dir), "w") as f:
+        f.write(LEGACY)
+    stats = StatsStorage(base_dir=base_dir)
+    assert stats.last_id == 0
+    assert stats.read_last_snapshot() is None
+    with open(stats_path(base_dir)) as f:
+        assert f.read() == LEGACY
+
+
+def test_first_checkpoint_moves_a_legacy_file_aside(tmp_path, capsys):
+    base_dir = str(tmp_path)
+    tracker = TaskTracker(base_dir=base_dir)
+    with open(stats_path(base_dir), "w") as f:
+        f.write(LEGACY)
+    write_switches(tracker, 0, 120)
+    stats = StatsStorage(base_dir=base_dir, switch_log=tracker.switch_log, checkpoint_every=100)
+    stats.calculate_statistics()
+
+    assert "Moved old-format statistics" in capsys.readouterr().out
+    with open(os.path.join(base_dir, "data", "duration_stats.legacy.csv")) as f:
+        assert f.read() == LEGACY
+    restarted = StatsStorage(base_dir=base_dir, switch_log=tracker.switch_log, checkpoint_every=100)
+    assert restarted.last_id == 120
+    tracker.close()
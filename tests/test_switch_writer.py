@@ -0,0 +1,54 @@
+import time
+import threading
+
+from switch_writer import SwitchWriter
+
+
+class SlowTracker:
+    """Records switches slowly and notes how many writers ran at once"""
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.rows = []
+        self.active = 0
+        self.most_active = 0
+        self.lock = threading.Lock()
+
+    def record_app_switch(self, app_from, app_to, timestamp=None):
+        with self.lock:
+            self.active += 1
+            self.most_active = max(self.most_active, self.active)
+        time.sleep(self.delay)
+        self.rows.append((app_from, app_to))
+        with self.lock:
+            self.active -= 1
+
+    def flush(self):
+        pass
+
+
+def test_close_writes_everything_queued():
+    tracker = SlowTracker(delay=0)
+    writer = SwitchWriter(tracker, batch_size=4)
+    writer.start()
+    for i in range(50):
+        writer.submit(f"App{i}", f"App{i + 1}", None)
+    writer.close()
+    assert len(tracker.rows) == 50
+    assert writer.report()["written"] == 50
+
+
+def test_restart_after_a_timed_out_close_never_runs_two_writers():
+    tracker = SlowTracker()
+    writer = SwitchWriter(tracker, batch_size=1)
+    writer.start()
+    for i in range(10):
+        writer.submit(f"App{i}", f"App{i + 1}", None)
+    writer.close(timeout=0.01)
+    assert writer.thread is not None
+
+    writer.start()
+    writer.submit("Code", "Slack", None)
+    writer.close()
+    assert tracker.most_active == 1
+    assert len(tracker.rows) == 11
+    assert tracker.rows[-1] == ("Code", "Slack")
@@ -0,0 +1,27 @@
+import datetime
+
+from task_tracker import TaskTracker
+from switch_log import read_rows_since
+
+START = datetime.datetime(2026, 1, 5, 9, 0, 0)
+
+
+def durations_for(tmp_path, gaps):
+    tracker = TaskTracker(base_dir=str(tmp_path))
+    when = START
+    tracker.record_app_switch(None, "App0", when)
+    for i, gap in enumerate(gaps):
+        when += datetime.timedelta(seconds=gap)
+        tracker.record_app_switch(f"App{i}", f"App{i + 1}", when)
+    tracker.close()
+    rows, _ = read_rows_since(tracker.data_path, 0)
+    return [int(row[4]) for row in rows]
+
+
+def test_durations_are_rounded_not_truncated(tmp_path):
+    # Samples land a hair either side of the second
+    assert durations_for(tmp_path, [0.999, 1.001, 1.499, 1.5001, 2.6]) == [0, 1, 1, 1, 2, 3]
+
+
+def test_sub_second_visits_round_to_zero(tmp_path):
+    assert durations_for(tmp_path, [0.2, 0.49]) == [0, 0, 0]
@@ -0,0 +1,87 @@
+import os
+import json
+import datetime
+
+import pytest
+
+from title_log import RECORD, TitleLog
+
+START = datetime.datetime(2026, 6, 1, 9, 0, 0)
+
+
+def play(log, sessions):
+    """Observe (app, title, seconds) sessions back to back; returns when the last one ends"""
+    when = START
+    for app, title, seconds in sessions:
+        log.observe(app, title, when)
+        when += datetime.timedelta(seconds=seconds)
+    return when
+
+
+SESSIONS = [
+    ("Mail", "Inbox", 30),
+    ("Safari", "Docs  -  Python\n", 120),
+    ("Mail", "Inbox", 15),
+    ("Notes", "Untitled", 5),
+    ("Mail", "Untitled", 40),
+    ("Safari", "Docs - Python", 60),
+]
+
+
+def test_dwell_per_app_and_title(tmp_path):
+    log = TitleLog(str(tmp_path))
+    end = play(log, SESSIONS)
+    # The same title again is not a new session
+    assert log.observe("Safari", "Docs - Python", end - datetime.timedelta(seconds=1)) is False
+    log.close(end)
+
+    top = log.top_titles()
+    # Whitespace is normalized, and "Untitled" stays two titles in two apps
+    assert top[0] == ("Safari", "Docs - Python", 2, 180.0)
+    assert ("Mail", "Inbox", 2, 45.0) in top
+    assert ("Mail", "Untitled", 1, 40.0) in top
+    assert ("Notes", "Untitled", 1, 5.0) in top
+    assert log.top_titles(app="Mail")[0] == ("Mail", "Inbox", 2, 45.0)
+    assert log.top_titles(app="Finder") == []
+    assert log.report()["sessions"] == len(SESSIONS)
+
+
+def test_reopen_restores_dwell_from_checkpoint_and_records(tmp_path):
+    log = TitleLog(str(tmp_path), checkpoint_every=4)
+    end = play(log, SESSIONS)
+    log.flush()
+    # Five sessions ended: a checkpoint after four, the fifth only in titles.bin
+    with open(log.checkpoint_path) as f:
+        assert json.load(f)["offset"] == 4 * RECORD.size
+    reopened = TitleLog(str(tmp_path), read_only=True)
+    assert reopened.top_titles() == log.top_titles()
+    assert reopened.offset == 5 * RECORD.size
+    log.close(end)
+
+
+def test_range_queries_read_the_records(tmp_path):
+    log = TitleLog(str(tmp_path))
+    log.close(play(log, SESSIONS))
+    start = (START + datetime.timedelta(seconds=100)).timestamp()
+    end = (START + datetime.timedelta(seconds=169)).timestamp()
+    sessions = list(log.sessions_between(start, end))
+    assert [(app, title, seconds) for _, app, title, seconds in sessions] == [
+        ("Mail", "Inbox", 15.0), ("Notes", "Untitled", 5.0)]
+    assert sessions[0][0] == START + datetime.timedelta(seconds=150)
+    assert log.top_titles(start=start, end=end) == [("Mail", "Inbox", 1, 15.0), ("Notes", "Untitled", 1, 5.0)]
+
+
+def test_torn_record_is_truncated_by_the_writer_only(tmp_path):
+    log = TitleLog(str(tmp_path))
+    log.close(play(log, SESSIONS))
+    with open(log.data_path, "ab") as f:
+        f.write(b"\x00" * 7)
+    reader = TitleLog(str(tmp_path), read_only=True)
+    assert reader.records == len(SESSIONS)
+    assert os.path.getsize(log.data_path) == len(SESSIONS) * RECORD.size + 7
+    with pytest.raises(ValueError):
+        reader.observe("Mail", "Inbox", START)
+
+    writer = TitleLog(str(tmp_path))
+    assert os.path.getsize(log.data_path) == len(SESSIONS) * RECORD.size
+    assert writer.report()["sessions"] == len(SESSIONS)
@@ -0,0 +1,90 @@
+import time
+import threading
+
+import pytest
+
+import cli
+from report import iter_entries
+from switch_log import read_rows_since
+from switch_writer import SwitchWriter
+from task_tracker import TaskTracker
+from tracking_service import TrackingService
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.02)
+
+
+@pytest.mark.parametrize("storage, extra", [
+    ("text", []),
+    ("text", ["--tsv"]),
+    ("text", ["--journal"]),
+    ("columnar", []),
+    ("partitioned", []),
+    ("sqlite", []),
+])
+def test_stop_then_start_keeps_recording(tmp_path, storage, extra):
+    timeline = tmp_path / "timeline.csv"
+    timeline.write_text("".join(f"{i * 0.1:.1f},App{i % 3}\n" for i in range(600)))
+    args = cli.parse_args(["run", "--base-dir", str(tmp_path), "--backend", "replay",
+                           "--timeline", str(timeline), "--no-color", "--no-flow",
+                           "--storage", storage, "--sample-interval", "0.02"] + extra)
+    service = cli.build_service(args)
+    switch_log = service.task_tracker.switch_log
+    try:
+        service.start()
+        wait_for(lambda: switch_log.next_id > 3)
+        service.stop()
+        stopped_at = switch_log.next_id
+
+        service.start()
+        wait_for(lambda: switch_log.next_id > stopped_at + 2)
+    finally:
+        service.close()
+
+    ids = [int(row[0]) for _, row in iter_entries(service.task_tracker.data_path)]
+    assert ids == list(range(1, switch_log.next_id))
+
+
+class SlowMonitor:
+    """Each sample takes a while and returns a new app"""
+    def __init__(self):
+        self.samples = 0
+        self.sampling = threading.Event()
+
+    def get_active_window(self):
+        self.samples += 1
+        self.sampling.set()
+        time.sleep(0.2)
+        return f"App{self.samples}"
+
+    def close(self):
+        pass
+
+    def latency_report(self):
+        return {}
+
+
+class QuietAnalyzer:
+    def check_excessive_task_switching(self):
+        return False
+
+
+def test_stop_waits_for_the_sample_in_flight(tmp_path):
+    tracker = TaskTracker(base_dir=str(tmp_path))
+    monitor = SlowMonitor()
+    service = TrackingService(tracker, monitor, QuietAnalyzer(), sample_interval=0.01,
+                              switch_writer=SwitchWriter(tracker))
+    service.start()
+    wait_for(lambda: monitor.samples >= 3)
+    monitor.sampling.clear()
+    monitor.sampling.wait(5)
+    # The sample that started above is still running; its switch must be written
+    service.stop()
+    tracker.close()
+    rows, _ = read_rows_since(tracker.data_path, 0)
+    assert [row[3] for row in rows] == [f"App{i}" for i in range(2, monitor.samples + 1)]
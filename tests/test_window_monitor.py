@@ -0,0 +1,49 @@
+import pytest
+
+from window_monitor import ReplayBackend, WindowMonitor
+
+
+@pytest.fixture
+def timeline(tmp_path):
+    path = tmp_path / "timeline.csv"
+    path.write_text("# offset,app,title\n1.0,Code,main.py\n0,Finder\n1.0,Slack\n5\tMail\tInbox\n")
+    return str(path)
+
+
+def replay_at(timeline, *times, **options):
+    clock = [0.0]
+    backend = ReplayBackend(timeline, clock=lambda: clock[0], **options)
+    samples = []
+    for now in times:
+        clock[0] = now
+        samples.append(backend.sample_with_title())
+    return samples
+
+
+def test_entries_switch_at_their_offsets(timeline):
+    # Equal offsets keep file order, so Slack (the later line) wins at 1.0
+    assert replay_at(timeline, 0.0, 0.99, 1.0, 4.99, 5.0, 100.0) == [
+        ("Finder", ""), ("Finder", ""), ("Slack", ""), ("Slack", ""), ("Mail", "Inbox"), ("Mail", "Inbox")]
+
+
+def test_speed_and_loop(timeline):
+    # Twice as fast, starting over at the last offset (5s of timeline)
+    assert [app for app, _ in replay_at(timeline, 0.0, 0.5, 2.4, 2.5, 3.0, speed=2.0, loop=True)] == \
+        ["Finder", "Slack", "Slack", "Finder", "Slack"]
+
+
+def test_long_timeline_matches_a_linear_scan(tmp_path):
+    path = tmp_path / "timeline.csv"
+    path.write_text("".join(f"{i * 0.5},App{i}\n" for i in range(20000)))
+    clock = [0.0]
+    backend = ReplayBackend(str(path), clock=lambda: clock[0])
+    for now in (0.0, 0.25, 0.5, 4321.7, 9999.5, 20000.0):
+        clock[0] = now
+        expected = max(i for i, (offset, _) in enumerate(backend.timeline) if offset <= now)
+        assert backend.current() == expected
+
+
+def test_window_monitor_reports_replayed_apps(timeline):
+    monitor = WindowMonitor("replay", timeline_path=timeline)
+    assert monitor.get_active_window() == "Finder"
+    monitor.close()